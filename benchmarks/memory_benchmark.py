@@ -0,0 +1,138 @@
+# MIT License
+#
+# Copyright (c) 2019 Wayne C. Gramlich
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+# Measure how much memory the component records of the readers take.  For example:
+#
+#        python -m benchmarks.memory_benchmark --scales 10000,1000000 --boards 4
+#
+# For each reader, *boards* synthetic files (with different seeds) are read and all of
+# their records are kept, the way a multi-board import keeps them until they are stuffed
+# into the projects.  *tracemalloc* reports the memory that is still held by the records
+# afterwards, the peak memory along the way, and the number of memory blocks that are
+# still allocated.
+
+import argparse
+from benchmarks import synthetic
+from bom_kicad_plugin import readers
+import gc
+import json
+import os
+import shutil
+import sys
+import tempfile
+import tracemalloc
+from typing import Any, Callable, Dict, List, TextIO
+
+DEFAULT_SCALES: List[int] = [10000, 100000]
+
+# BENCHMARKS:
+# (name, file suffix, generator, records reader)
+BENCHMARKS: List[Any] = [
+    ("net_file_read", ".net", synthetic.net_file_write, readers.net_file_records_read),
+    ("altium_csv_read", ".csv", synthetic.altium_csv_write, readers.altium_csv_records_read),
+    ("bom_csv_grouped_by_value_with_fp_read", ".csv",
+     synthetic.bom_csv_grouped_by_value_with_fp_write,
+     readers.bom_csv_grouped_by_value_with_fp_records_read),
+]
+
+
+# memory_measure():
+def memory_measure(name: str, records_read: Callable[[str], Any], file_names: List[str],
+                   scale: int) -> Dict[str, Any]:
+    """ Read all of *file_names* with *records_read* and return the memory result row. """
+    gc.collect()
+    tracemalloc.start()
+    base_bytes: int = tracemalloc.get_traced_memory()[0]
+    base_blocks: int = sum(statistic.count for statistic in
+                           tracemalloc.take_snapshot().statistics("filename"))
+    records: List[Any] = list()
+    file_name: str
+    for file_name in file_names:
+        records.extend(records_read(file_name))
+    gc.collect()
+    retained_bytes: int
+    peak_bytes: int
+    retained_bytes, peak_bytes = tracemalloc.get_traced_memory()
+    blocks: int = sum(statistic.count for statistic in
+                      tracemalloc.take_snapshot().statistics("filename"))
+    tracemalloc.stop()
+    return {
+        "benchmark": name,
+        "scale": scale,
+        "boards": len(file_names),
+        "components": len(records),
+        "retained_bytes": retained_bytes - base_bytes,
+        "peak_bytes": peak_bytes - base_bytes,
+        "blocks": blocks - base_blocks,
+        "bytes_per_component": (retained_bytes - base_bytes) / max(1, len(records)),
+    }
+
+
+# main():
+def main() -> int:
+    parser: argparse.ArgumentParser = argparse.ArgumentParser(
+        description="Measure the memory used by the bom_kicad_plugin component records.")
+    parser.add_argument("--scales", default=",".join(str(scale) for scale in DEFAULT_SCALES),
+                        help="Comma separated component counts per board")
+    parser.add_argument("--boards", type=int, default=4, help="Boards read per measurement")
+    parser.add_argument("--benchmarks", default="",
+                        help="Comma separated benchmark names (default is all of them)")
+    parser.add_argument("--output", default="", help="Write the JSON results to this file")
+    arguments: argparse.Namespace = parser.parse_args()
+
+    scales: List[int] = [int(scale) for scale in arguments.scales.split(",")]
+    names: List[str] = [name for name in arguments.benchmarks.split(",") if name]
+    directory: str = tempfile.mkdtemp(prefix="bom_kicad_memory_")
+    results: List[Dict[str, Any]] = list()
+    try:
+        print(f"{'benchmark':<40} {'scale':>8} {'retained MB':>12} {'peak MB':>9} "
+              f"{'blocks':>10} {'bytes/comp':>11}")
+        scale: int
+        for scale in scales:
+            for name, suffix, generate, records_read in BENCHMARKS:
+                if names and name not in names:
+                    continue
+                file_names: List[str] = list()
+                board: int
+                for board in range(arguments.boards):
+                    file_name: str = os.path.join(directory, f"{name}_{scale}_{board}{suffix}")
+                    generate(file_name, scale, board + 1)
+                    file_names.append(file_name)
+                result: Dict[str, Any] = memory_measure(name, records_read, file_names, scale)
+                results.append(result)
+                print(f"{name:<40} {scale:>8} {result['retained_bytes'] / 1e6:>12.2f} "
+                      f"{result['peak_bytes'] / 1e6:>9.2f} {result['blocks']:>10} "
+                      f"{result['bytes_per_component']:>11.1f}")
+                for file_name in file_names:
+                    os.remove(file_name)
+    finally:
+        shutil.rmtree(directory, ignore_errors=True)
+
+    if arguments.output:
+        output_file: TextIO
+        with open(arguments.output, "w") as output_file:
+            json.dump({"python": sys.version, "results": results}, output_file, indent=2)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,218 @@
+# MIT License
+#
+# Copyright (c) 2019 Wayne C. Gramlich
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+# Benchmark the KiCad readers against synthetic files.  For example:
+#
+#        python -m benchmarks.readers_benchmark --scales 100,10000,1000000 --output results.json
+#
+# Each file is read into a new *bom.Project* through *Kicad.file_read*() (i.e. the same
+# path that *bom_manager* uses), then read a second time with *tracemalloc* enabled to
+# measure the peak memory.  The results are printed as a table and optionally written out
+# as JSON (along with the git commit) so that runs can be compared across commits.
+
+import argparse
+from benchmarks import synthetic
+from bom_manager import bom
+from bom_kicad_plugin import sexpression
+from bom_kicad_plugin.kicad import Kicad
+import json
+import os
+import platform
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+from typing import Any, Callable, Dict, List, TextIO
+
+DEFAULT_SCALES: List[int] = [100, 1000, 10000, 100000]
+
+
+# kicad_file_read():
+def kicad_file_read(configure: Callable[[Kicad], None]) -> Callable[[str], int]:
+    """ Return a function that reads a file into a new project and counts its pose parts.
+
+    Each read gets a new *Kicad* which is set up by *configure* first.
+    """
+
+    # file_read():
+    def file_read(file_name: str) -> int:
+        kicad: Kicad = Kicad()
+        configure(kicad)
+        project: bom.Project = bom.Project()
+        assert kicad.file_read(file_name, project), f"Could not read '{file_name}'"
+        return len(project.all_pose_parts)
+    return file_read
+
+
+# kicad_default():
+def kicad_default(kicad: Kicad) -> None:
+    """ Leave *kicad* the way *cad_get*() makes it. """
+    pass
+
+
+# kicad_chunked():
+def kicad_chunked(kicad: Kicad) -> None:
+    """ Have *kicad* split each `.net` file up among one worker process per CPU. """
+    kicad.net_workers = os.cpu_count() or 1
+
+
+# footprints_write_back():
+def footprints_write_back(net_file_name: str) -> int:
+    """ Parse *net_file_name* into a tree and write it back the way footprint updating does. """
+    net_file: TextIO
+    with open(net_file_name) as net_file:
+        net_se: sexpression.SENode = sexpression.tree_read(net_file)
+    components_se = net_se.find("components")
+    assert components_se is not None
+    sexpression.tree_file_write(net_se, net_file_name, sexpression.KICAD_NET_INDENTS)
+    return sum(1 for component_se in components_se.children("comp"))
+
+
+# nodes_count():
+def nodes_count(net_file_name: str) -> int:
+    """ Extract the connectivity of *net_file_name* and return the number of nodes. """
+    return len(Kicad().net_file_connectivity_read(net_file_name).node_references)
+
+
+# BENCHMARKS:
+# (name, file suffix, generator, function to time)
+BENCHMARKS: List[Any] = [
+    ("net_file_read", ".net", synthetic.net_file_write, kicad_file_read(kicad_default)),
+    ("net_file_chunked_read", ".net", synthetic.net_file_write, kicad_file_read(kicad_chunked)),
+    ("altium_csv_read", ".csv", synthetic.altium_csv_write, kicad_file_read(kicad_default)),
+    ("bom_csv_grouped_by_value_with_fp_read", ".csv",
+     synthetic.bom_csv_grouped_by_value_with_fp_write, kicad_file_read(kicad_default)),
+    ("footprints_write_back", ".net", synthetic.net_file_write, footprints_write_back),
+    ("connectivity_read", ".net", synthetic.net_file_write, nodes_count),
+]
+
+
+# git_commit_get():
+def git_commit_get() -> str:
+    """ Return the git commit of the benchmarked code (with `+dirty` if it has changes.)
+
+    An empty string is returned if the code is not in a git repository.
+    """
+    directory: str = os.path.dirname(os.path.abspath(__file__))
+    try:
+        commit: str = subprocess.check_output(["git", "rev-parse", "HEAD"], cwd=directory,
+                                              stderr=subprocess.DEVNULL,
+                                              universal_newlines=True).strip()
+        changes: str = subprocess.check_output(["git", "status", "--porcelain",
+                                                "--untracked-files=no"], cwd=directory,
+                                               stderr=subprocess.DEVNULL,
+                                               universal_newlines=True)
+    except (OSError, subprocess.CalledProcessError):
+        return ""
+    return commit + ("+dirty" if changes.strip() else "")
+
+
+# benchmark_run():
+def benchmark_run(name: str, function: Callable[[str], int], file_name: str,
+                  scale: int, repeats: int) -> Dict[str, Any]:
+    """ Time *function* on *file_name* and return the result row. """
+    # Take the best of *repeats* timings:
+    seconds: float = float("inf")
+    components: int = 0
+    repeat: int
+    for repeat in range(repeats):
+        start: float = time.perf_counter()
+        components = function(file_name)
+        seconds = min(seconds, time.perf_counter() - start)
+
+    # Measure peak memory separately, since *tracemalloc* slows everything down:
+    tracemalloc.start()
+    function(file_name)
+    peak_bytes: int = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+
+    return {
+        "benchmark": name,
+        "scale": scale,
+        "components": components,
+        "file_bytes": os.path.getsize(file_name),
+        "seconds": seconds,
+        "components_per_second": components / seconds if seconds > 0.0 else 0.0,
+        "peak_bytes": peak_bytes,
+    }
+
+
+# main():
+def main() -> int:
+    parser: argparse.ArgumentParser = argparse.ArgumentParser(
+        description="Benchmark the bom_kicad_plugin readers on synthetic files.")
+    parser.add_argument("--scales", default=",".join(str(scale) for scale in DEFAULT_SCALES),
+                        help="Comma separated component counts (e.g. 100,1000000)")
+    parser.add_argument("--benchmarks", default="",
+                        help="Comma separated benchmark names (default is all of them)")
+    parser.add_argument("--repeats", type=int, default=3, help="Timings per benchmark")
+    parser.add_argument("--seed", type=int, default=1, help="Synthetic file seed")
+    parser.add_argument("--output", default="", help="Write the JSON results to this file")
+    parser.add_argument("--directory", default="",
+                        help="Where to put the synthetic files (a temporary directory)")
+    arguments: argparse.Namespace = parser.parse_args()
+
+    scales: List[int] = [int(scale) for scale in arguments.scales.split(",")]
+    names: List[str] = [name for name in arguments.benchmarks.split(",") if name]
+    directory: str = arguments.directory or tempfile.mkdtemp(prefix="bom_kicad_benchmark_")
+    os.makedirs(directory, exist_ok=True)
+
+    results: List[Dict[str, Any]] = list()
+    try:
+        print(f"{'benchmark':<40} {'scale':>8} {'seconds':>10} {'comps/sec':>12} "
+              f"{'peak MB':>9}")
+        scale: int
+        for scale in scales:
+            for name, suffix, generate, function in BENCHMARKS:
+                if names and name not in names:
+                    continue
+                file_name: str = os.path.join(directory, f"{name}_{scale}{suffix}")
+                generate(file_name, scale, arguments.seed)
+                result: Dict[str, Any] = benchmark_run(name, function, file_name,
+                                                       scale, arguments.repeats)
+                results.append(result)
+                print(f"{name:<40} {scale:>8} {result['seconds']:>10.4f} "
+                      f"{result['components_per_second']:>12.0f} "
+                      f"{result['peak_bytes'] / 1e6:>9.2f}")
+                os.remove(file_name)
+    finally:
+        if not arguments.directory:
+            shutil.rmtree(directory, ignore_errors=True)
+
+    if arguments.output:
+        output_file: TextIO
+        with open(arguments.output, "w") as output_file:
+            json.dump({
+                "commit": git_commit_get(),
+                "python": sys.version,
+                "platform": platform.platform(),
+                "cpus": os.cpu_count(),
+                "time": time.strftime("%Y-%m-%dT%H:%M:%S"),
+                "results": results,
+            }, output_file, indent=2)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,99 @@
+# MIT License
+#
+# Copyright (c) 2019 Wayne C. Gramlich
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+# Benchmark how long it takes to import the plugin the way *bom_manager* plugin discovery
+# does it (i.e. import `bom_kicad_plugin.kicad` and call *cad_get*()).  For example:
+#
+#        python -m benchmarks.startup_benchmark --budget 30
+#
+# Each measurement is done in a fresh Python process.  *bom_manager* (and *typing*, which
+# it uses too) is imported before the clock starts, so only the plugin is timed.  The run
+# fails (exit code 1) if the best time is over the budget or if the import pulled in any
+# of the modules that should only be loaded when a file is actually read.
+
+import argparse
+import json
+import subprocess
+import sys
+from typing import Any, Dict, List
+
+# The default budget in milliseconds:
+DEFAULT_BUDGET: float = 30.0
+
+# Modules that must not be loaded just by importing the plugin (unless something else
+# loaded them first):
+LAZY_MODULES: List[str] = [
+    "bom_kicad_plugin.altium_csv", "bom_kicad_plugin.cache", "bom_kicad_plugin.columnar",
+    "bom_kicad_plugin.connectivity",
+    "bom_kicad_plugin.kicad_csv", "bom_kicad_plugin.netlist", "bom_kicad_plugin.netscan",
+    "bom_kicad_plugin.schematic", "bom_kicad_plugin.sexpression",
+    "concurrent.futures", "csv", "hashlib", "mmap", "multiprocessing", "re", "sexpdata"]
+
+# The program that is run in each fresh process:
+MEASURE_PROGRAM: str = """
+import json, sys, time, typing
+import bom_manager.bom, bom_manager.tracing
+before = set(sys.modules)
+start = time.perf_counter()
+import bom_kicad_plugin.kicad
+bom_kicad_plugin.kicad.cad_get()
+end = time.perf_counter()
+print(json.dumps({"seconds": end - start, "modules": sorted(set(sys.modules) - before)}))
+"""
+
+
+# startup_measure():
+def startup_measure() -> Dict[str, Any]:
+    """ Import the plugin in a fresh process and return its time and new modules. """
+    output: str = subprocess.check_output([sys.executable, "-c", MEASURE_PROGRAM],
+                                          universal_newlines=True)
+    measurement: Dict[str, Any] = json.loads(output.strip().splitlines()[-1])
+    return measurement
+
+
+# main():
+def main() -> int:
+    parser: argparse.ArgumentParser = argparse.ArgumentParser(
+        description="Check that importing the bom_kicad_plugin stays cheap.")
+    parser.add_argument("--budget", type=float, default=DEFAULT_BUDGET,
+                        help="Maximum milliseconds for importing the plugin")
+    parser.add_argument("--repeats", type=int, default=5, help="Fresh processes to time")
+    arguments: argparse.Namespace = parser.parse_args()
+
+    # Keep the best time; the modules are the same every time:
+    measurements: List[Dict[str, Any]] = [startup_measure()
+                                          for repeat in range(arguments.repeats)]
+    milliseconds: float = min(measurement["seconds"] for measurement in measurements) * 1000.0
+    modules: List[str] = measurements[0]["modules"]
+    eager_modules: List[str] = [module for module in LAZY_MODULES if module in modules]
+
+    print(f"Plugin import: {milliseconds:.2f} ms (budget {arguments.budget:.2f} ms), "
+          f"{len(modules)} new modules")
+    if eager_modules:
+        print(f"Modules that should have been loaded lazily: {', '.join(eager_modules)}")
+    within_budget: bool = milliseconds <= arguments.budget and not eager_modules
+    print("OK" if within_budget else "FAILED")
+    return 0 if within_budget else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,206 @@
+# MIT License
+#
+# Copyright (c) 2019 Wayne C. Gramlich
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+# Deterministic generators for synthetic KiCad files.  The same *count* and *seed*
+# always produce byte for byte the same file, so benchmark results can be compared
+# across releases.  Everything is written a line at a time, so files with a million
+# components can be generated without holding them in memory.
+
+import csv
+import random
+from typing import Dict, List, TextIO, Tuple
+
+# (reference prefix, value, footprint) triples that components are drawn from:
+PARTS: List[Tuple[str, str, str]] = [
+    ("C", "0.1uF", "Capacitor_SMD:C_0603_1608Metric"),
+    ("C", "10uF:X5R 10V", "Capacitor_SMD:C_0805_2012Metric"),
+    ("C", "22pF", "Capacitor_SMD:C_0402_1005Metric"),
+    ("R", "10K", "Resistor_SMD:R_0603_1608Metric"),
+    ("R", "4.7K:1%", "Resistor_SMD:R_0603_1608Metric"),
+    ("R", "100", "Resistor_SMD:R_0402_1005Metric"),
+    ("D", "LED_RED", "LED_SMD:LED_0603_1608Metric"),
+    ("U", "LM358", "Package_SO:SOIC-8_3.9x4.9mm_P1.27mm"),
+    ("U", "STM32F103C8Tx", "Package_QFP:LQFP-48_7x7mm_P0.5mm"),
+    ("J", "Conn_01x04", "Connector_PinHeader_2.54mm:PinHeader_1x04_P2.54mm_Vertical"),
+]
+
+# The average number of components in each (value, footprint) group once there are more
+# components than *PARTS* can spread that thin.  (Real boards use more distinct values as
+# they grow, so the CSV files must not be limited to one row per entry in *PARTS*):
+GROUP_SIZE: int = 20
+
+# The number of nets generated per component:
+NETS_PER_COMPONENT: float = 0.5
+
+
+# components_generate():
+def components_generate(count: int, seed: int) -> List[Tuple[str, str, str]]:
+    """ Return *count* (reference, value, footprint) triples.
+
+    Each entry in *PARTS* is split into *variants* values (e.g. `10K`, `10K_1`, ...) so
+    that the number of distinct (value, footprint) groups grows with *count*.
+    """
+    generator: random.Random = random.Random(seed)
+    variants: int = max(1, count // (len(PARTS) * GROUP_SIZE))
+    counters: Dict[str, int] = dict()
+    components: List[Tuple[str, str, str]] = list()
+    index: int
+    for index in range(count):
+        prefix: str
+        value: str
+        footprint: str
+        prefix, value, footprint = PARTS[generator.randrange(len(PARTS))]
+        if variants > 1:
+            # The variant goes on the part name (i.e. in front of any `:` comment):
+            variant: int = generator.randrange(variants)
+            if variant > 0:
+                part_name: str
+                colon: str
+                comment: str
+                part_name, colon, comment = value.partition(":")
+                value = f"{part_name}_{variant}{colon}{comment}"
+        counters[prefix] = counters.get(prefix, 0) + 1
+        components.append((f"{prefix}{counters[prefix]}", value, footprint))
+    return components
+
+
+# net_file_write():
+def net_file_write(net_file_name: str, count: int, seed: int = 1) -> None:
+    """ Write a KiCad 5 style `.net` file with *count* components to *net_file_name*. """
+    components: List[Tuple[str, str, str]] = components_generate(count, seed)
+    generator: random.Random = random.Random(seed + 1)
+    net_file: TextIO
+    with open(net_file_name, "w") as net_file:
+        write = net_file.write
+        write('(export (version D)\n'
+              '  (design\n'
+              '    (source /home/user/board/board.sch)\n'
+              '    (date "Mon 01 Jan 2024 12:00:00 PM PST")\n'
+              '    (tool "Eeschema 5.1.5")\n'
+              '    (sheet (number 1) (name /) (tstamps /)\n'
+              '      (title_block\n'
+              '        (title "Synthetic Board")\n'
+              '        (company)\n'
+              '        (rev A)\n'
+              '        (date)\n'
+              '        (source board.sch)\n'
+              '        (comment (number 1) (value ""))\n'
+              '        (comment (number 2) (value "")))))\n'
+              '  (components')
+        index: int
+        reference: str
+        value: str
+        footprint: str
+        for index, (reference, value, footprint) in enumerate(components):
+            quoted_value: str = f'"{value}"' if " " in value else value
+            write(f'\n    (comp (ref {reference})\n'
+                  f'      (value {quoted_value})\n'
+                  f'      (footprint {footprint})\n'
+                  f'      (datasheet ~)\n'
+                  f'      (libsource (lib Device) (part {reference.rstrip("0123456789")}) '
+                  f'(description "Synthetic part (generated)"))\n'
+                  f'      (sheetpath (names /) (tstamps /))\n'
+                  f'      (tstamp {index:08X}))')
+        write(')\n  (libparts')
+        prefix: str
+        for prefix in sorted({part[0] for part in PARTS}):
+            write(f'\n    (libpart (lib Device) (part {prefix})\n'
+                  f'      (description "Synthetic part")\n'
+                  f'      (fields\n'
+                  f'        (field (name Reference) {prefix})\n'
+                  f'        (field (name Value) {prefix}))\n'
+                  f'      (pins\n'
+                  f'        (pin (num 1) (name ~) (type passive))\n'
+                  f'        (pin (num 2) (name ~) (type passive))))')
+        write(')\n  (nets')
+        net_count: int = max(1, int(count * NETS_PER_COMPONENT))
+        net_index: int
+        for net_index in range(net_count):
+            name: str = "GND" if net_index == 0 else f"Net-(N{net_index})"
+            write(f'\n    (net (code {net_index + 1}) (name "{name}")')
+            node_index: int
+            for node_index in range(2 + generator.randrange(3)):
+                reference = components[generator.randrange(count)][0] if count else "X1"
+                write(f'\n      (node (ref {reference}) (pin {node_index + 1}))')
+            write(')')
+        write('))\n')
+
+
+# groups_generate():
+def groups_generate(count: int, seed: int) -> List[Tuple[str, str, List[str]]]:
+    """ Return the components grouped by (value, footprint) in first seen order. """
+    groups: Dict[Tuple[str, str], List[str]] = dict()
+    reference: str
+    value: str
+    footprint: str
+    for reference, value, footprint in components_generate(count, seed):
+        groups.setdefault((value, footprint), list()).append(reference)
+    return [(value, footprint, references)
+            for (value, footprint), references in groups.items()]
+
+
+# bom_csv_grouped_by_value_with_fp_write():
+def bom_csv_grouped_by_value_with_fp_write(csv_file_name: str, count: int,
+                                           seed: int = 1) -> None:
+    """ Write a `bom_csv_grouped_by_value_with_fp.py` style BOM with *count* components. """
+    groups: List[Tuple[str, str, List[str]]] = groups_generate(count, seed)
+    csv_file: TextIO
+    with open(csv_file_name, "w", newline="") as csv_file:
+        writer = csv.writer(csv_file, delimiter=",", quotechar='"', quoting=csv.QUOTE_ALL)
+        writer.writerow(["Source:", "/home/user/board/board.sch"])
+        writer.writerow(["Date:", "Mon 01 Jan 2024 12:00:00 PM PST"])
+        writer.writerow(["Tool:", "Eeschema 5.1.5"])
+        writer.writerow(["Generator:",
+                         "/usr/share/kicad/plugins/bom_csv_grouped_by_value_with_fp.py"])
+        writer.writerow(["Component Count:", str(count)])
+        writer.writerow(["Ref", "Qnty", "Value", "Cmp name", "Footprint", "Description",
+                         "Vendor"])
+        value: str
+        footprint: str
+        references: List[str]
+        for value, footprint, references in groups:
+            writer.writerow([", ".join(references), str(len(references)), value,
+                             references[0].rstrip("0123456789"), footprint, "", ""])
+
+
+# altium_csv_write():
+def altium_csv_write(csv_file_name: str, count: int, seed: int = 1) -> None:
+    """ Write an Altium style BOM `.csv` file with *count* components. """
+    groups: List[Tuple[str, str, List[str]]] = groups_generate(count, seed)
+    csv_file: TextIO
+    with open(csv_file_name, "w", encoding="iso-8859-1", newline="") as csv_file:
+        writer = csv.writer(csv_file, delimiter=",", quotechar='"')
+        writer.writerow([
+            "Line #", "Name", "Description", "Designator", "Quantity", "TargetPrice",
+            "Manufacturer 1", "Manufacturer Part Number 1", "Manufacturer Lifecycle 1",
+            "Supplier 1", "Supplier Part Number 1", "Supplier Unit Price 1",
+            "Supplier Subtotal 1"])
+        writer.writerow([""] * 13)
+        index: int
+        value: str
+        footprint: str
+        references: List[str]
+        for index, (value, footprint, references) in enumerate(groups):
+            writer.writerow([str(index + 1), value.split(":")[0], footprint,
+                             ",".join(references), str(len(references)), "",
+                             "Acme", f"ACME-{index}", "Volume Production",
+                             "Digi-Key", f"DK-{index}", "0.01", ""])
@@ -0,0 +1,92 @@
+# MIT License
+#
+# Copyright (c) 2019 Wayne C. Gramlich
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+# The reader for the BOM `.csv` files that Altium generates.  It is only imported (by
+# *readers.altium_csv_records_read*()) the first time such a file is read.
+
+from bom_manager.tracing import tracing_get
+from bom_kicad_plugin.records import ComponentRecord, Interner
+import csv
+from typing import Iterator, List, TextIO
+
+
+# altium_csv_records_read():
+def altium_csv_records_read(csv_file_name: str) -> Iterator[ComponentRecord]:
+    """ Return an iterator over the component records of an Altium BOM `.csv` file.
+
+    The headers are checked before this function returns, so a file in the wrong format
+    fails right away.  The remaining rows are read one at a time as the returned
+    iterator is advanced.
+    """
+    csv_file: TextIO = open(csv_file_name, encoding="iso-8859-1")
+    try:
+        csv_rows: Iterator[List[str]] = csv.reader(csv_file, delimiter=",", quotechar='"')
+        actual_headers: List[str] = next(csv_rows, [])
+        desired_headers: List[str] = [
+            "Line #", "Name", "Description", "Designator", "Quantity", "TargetPrice",
+            "Manufacturer 1", "Manufacturer Part Number 1", "Manufacturer Lifecycle 1",
+            "Supplier 1", "Supplier Part Number 1", "Supplier Unit Price 1",
+            "Supplier Subtotal 1"]
+        index: int
+        for index, desired_header in enumerate(desired_headers):
+            assert desired_header == actual_headers[index], f"index={index}"
+        assert (actual_headers == desired_headers), (f"Got {actual_headers} "
+                                                     f"instead of {desired_headers}")
+
+        # The row after the headers is not used:
+        next(csv_rows, None)
+    except BaseException:
+        csv_file.close()
+        raise
+    return altium_csv_rows_records(csv_file, csv_rows)
+
+
+# altium_csv_rows_records():
+def altium_csv_rows_records(csv_file: TextIO,
+                            csv_rows: Iterator[List[str]]) -> Iterator[ComponentRecord]:
+    """ Return an iterator over the component records of the Altium *csv_rows*.
+
+    *csv_file* is closed when *csv_rows* runs out.
+    """
+    tracing: str = tracing_get()
+    interner: Interner = Interner()
+    with csv_file:
+        index: int
+        row: List[str]
+        for index, row in enumerate(csv_rows):
+            # Unpack *row*:
+            line_number: str
+            name: str
+            description: str
+            designators_text: str
+            quantity: str
+            line_number, name, description, designators_text, quantity = row[:5]
+            name = interner[name]
+            if tracing:
+                print(f"{tracing}Row[{index}]: "
+                      f"{quantity}\t'{name}'\t{designators_text}")
+
+            # Create one record for each (stripped) designator in *designators_text*.
+            # Ignore footprints for now:
+            designator: str
+            for designator in designators_text.split(","):
+                yield ComponentRecord(designator.strip(), name, "", "")
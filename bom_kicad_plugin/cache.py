@@ -0,0 +1,181 @@
+# MIT License
+#
+# Copyright (c) 2019 Wayne C. Gramlich
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+# The *ComponentCache* remembers the *ComponentRecord*'s extracted from a file so that
+# reading the same unchanged file again does not need to parse it.  Each cache entry
+# is a small file in the cache directory whose name is computed from the path, size,
+# modification time and content hash of the original file.  Entries are marshaled tuples
+# of strings that are compressed with *zlib*.  The modification time of an entry is
+# bumped on every hit, so the least recently used entries are evicted first whenever
+# the cache directory grows beyond its maximum size.
+
+from bom_kicad_plugin import files
+from bom_kicad_plugin.records import ComponentRecord
+import hashlib
+import marshal
+import os
+from typing import BinaryIO, Dict, List, Optional, Tuple
+import zlib
+
+
+# ComponentCache:
+class ComponentCache:
+
+    # Bump *VERSION* whenever the records or the entry format change:
+    VERSION: int = 1
+    MAGIC: bytes = b"BKCC"
+    SUFFIX: str = ".bkc"
+
+    # ComponentCache.__init__():
+    def __init__(self, directory: str, maximum_size: int = 256 * 1024 * 1024) -> None:
+        """ Initialize the cache to store at most *maximum_size* bytes in *directory*. """
+        # Create *directory* if it does not already exist:
+        os.makedirs(directory, exist_ok=True)
+
+        # Load up *component_cache* (i.e. *self*):
+        self.directory: str = directory
+        self.maximum_size: int = maximum_size
+        self.hits: int = 0
+        self.misses: int = 0
+        # Content digests keyed by (path, size, mtime) so unchanged files are hashed once:
+        self.digests: Dict[Tuple[str, int, int], str] = dict()
+
+    # ComponentCache.__str__():
+    def __str__(self) -> str:
+        component_cache: ComponentCache = self
+        return (f"ComponentCache('{component_cache.directory}', "
+                f"hits={component_cache.hits}, misses={component_cache.misses})")
+
+    # ComponentCache.entry_path():
+    def entry_path(self, file_name: str) -> str:
+        """ Return the cache entry path for the current contents of *file_name*. """
+        # Grab the file identity of *file_name*:
+        component_cache: ComponentCache = self
+        path: str = os.path.abspath(file_name)
+        status: os.stat_result = os.stat(path)
+        identity: Tuple[str, int, int] = (path, status.st_size, status.st_mtime_ns)
+
+        # Compute the content digest of *file_name* unless we already have it:
+        digests: Dict[Tuple[str, int, int], str] = component_cache.digests
+        if identity not in digests:
+            content_hash = hashlib.blake2b(digest_size=16)
+            data_file: BinaryIO
+            with open(path, "rb") as data_file:
+                data: bytes
+                for data in iter(lambda: data_file.read(1 << 20), b""):
+                    content_hash.update(data)
+            digests[identity] = content_hash.hexdigest()
+        digest: str = digests[identity]
+
+        # Combine everything into the entry name:
+        key_text: str = (f"{ComponentCache.VERSION}\0{path}\0{status.st_size}\0"
+                         f"{status.st_mtime_ns}\0{digest}")
+        key: str = hashlib.blake2b(key_text.encode("utf-8"), digest_size=16).hexdigest()
+        return os.path.join(component_cache.directory, key + ComponentCache.SUFFIX)
+
+    # ComponentCache.lookup():
+    def lookup(self, file_name: str) -> Optional[List[ComponentRecord]]:
+        """ Return the cached records for *file_name* or *None* if there are none. """
+        component_cache: ComponentCache = self
+        records: Optional[List[ComponentRecord]] = None
+        entry_path: str = component_cache.entry_path(file_name)
+        try:
+            entry_file: BinaryIO
+            with open(entry_path, "rb") as entry_file:
+                entry: bytes = entry_file.read()
+            if entry.startswith(ComponentCache.MAGIC):
+                rows: Tuple[Tuple[str, str, str, str], ...] = marshal.loads(
+                    zlib.decompress(entry[len(ComponentCache.MAGIC):]))
+                records = [ComponentRecord(*row) for row in rows]
+                # Mark the entry as recently used:
+                os.utime(entry_path)
+        except FileNotFoundError:
+            pass
+        except (OSError, EOFError, ValueError, TypeError, zlib.error):
+            # A damaged entry is just a miss; get rid of it:
+            component_cache.entry_remove(entry_path)
+            records = None
+
+        if records is None:
+            component_cache.misses += 1
+        else:
+            component_cache.hits += 1
+        return records
+
+    # ComponentCache.store():
+    def store(self, file_name: str, records: List[ComponentRecord]) -> None:
+        """ Store *records* as the cached records for *file_name*. """
+        component_cache: ComponentCache = self
+        entry_path: str = component_cache.entry_path(file_name)
+        # *marshal* only writes each (shared) string once:
+        rows: Tuple[Tuple[str, ...], ...] = tuple(
+            (record.reference, record.part_name, record.comment, record.footprint)
+            for record in records)
+        entry: bytes = ComponentCache.MAGIC + zlib.compress(marshal.dumps(rows), 1)
+
+        # Replace the entry atomically so readers never see a partial entry:
+        try:
+            temporary_handle: int
+            entry_file: BinaryIO
+            with files.file_replace(entry_path) as temporary_handle, \
+                    os.fdopen(temporary_handle, "wb") as entry_file:
+                entry_file.write(entry)
+        except OSError:
+            # The cache is only an optimization, so failing to store is not fatal:
+            return
+        component_cache.evict()
+
+    # ComponentCache.evict():
+    def evict(self) -> None:
+        """ Remove the least recently used entries until the cache fits its maximum size. """
+        component_cache: ComponentCache = self
+        directory: str = component_cache.directory
+        entries: List[Tuple[int, int, str]] = list()
+        total_size: int = 0
+        directory_entry: os.DirEntry
+        for directory_entry in os.scandir(directory):
+            if directory_entry.name.endswith(ComponentCache.SUFFIX):
+                try:
+                    status: os.stat_result = directory_entry.stat()
+                except OSError:
+                    continue
+                entries.append((status.st_mtime_ns, status.st_size, directory_entry.path))
+                total_size += status.st_size
+
+        # Oldest entries are removed first:
+        entries.sort()
+        modification_time: int
+        size: int
+        entry_path: str
+        for modification_time, size, entry_path in entries:
+            if total_size <= component_cache.maximum_size:
+                break
+            component_cache.entry_remove(entry_path)
+            total_size -= size
+
+    # ComponentCache.entry_remove():
+    def entry_remove(self, entry_path: str) -> None:
+        """ Remove *entry_path* from the cache, ignoring any errors. """
+        try:
+            os.remove(entry_path)
+        except OSError:
+            pass
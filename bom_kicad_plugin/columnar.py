@@ -0,0 +1,302 @@
+# MIT License
+#
+# Copyright (c) 2019 Wayne C. Gramlich
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+# A *ComponentTable* holds the components of one or more files column by column rather
+# than as one object per component.  Every string (references, part names, comments,
+# footprints and file names) is interned into a single *strings* table and the columns
+# are arrays of 32-bit string indices (plus a column of file indices.)  Downstream jobs
+# can aggregate over the integer columns without building any per-component objects.
+#
+# *ComponentTable.write*() saves a table to a compact binary file and *table_load*()
+# memory maps it back.  Only the (interned) strings are decoded on load; the columns are
+# used straight out of the memory map.  The file layout (all integers are unsigned,
+# 32-bit and little endian) is:
+#
+#        MAGIC, VERSION, rows, strings, files, strings size     (the header)
+#        string offsets                                         (strings + 1)
+#        file name string indices                               (files)
+#        reference, part name, comment, footprint, file columns (rows each)
+#        strings                                                (UTF-8, strings size)
+
+from bom_kicad_plugin import files
+from bom_kicad_plugin.connectivity import INDEX_TYPE
+from bom_kicad_plugin.records import ComponentRecord
+import array
+import collections
+import mmap
+import os
+import struct
+import sys
+from typing import (BinaryIO, Callable, Dict, Iterable, Iterator, List, Optional, Tuple,
+                    Union)
+
+# The columns in the order they are stored:
+STRING_COLUMNS: Tuple[str, ...] = ("references", "part_names", "comments", "footprints")
+COLUMNS: Tuple[str, ...] = STRING_COLUMNS + ("files",)
+
+# The file header:
+MAGIC: bytes = b"BKCT"
+VERSION: int = 1
+HEADER: struct.Struct = struct.Struct("<4sIIIII")
+
+# A column is an *array.array* while it is being built and a *memoryview* once loaded:
+Column = Union[array.array, memoryview]
+
+
+# ComponentTable:
+class ComponentTable:
+    """ Components stored as interned string columns. """
+
+    __slots__ = ("strings", "string_indices", "file_names", "file_indices",
+                 "references", "part_names", "comments", "footprints", "files", "mapping")
+
+    # ComponentTable.__init__():
+    def __init__(self) -> None:
+        # The interned strings and file names with their lookup tables:
+        self.strings: List[str] = list()
+        self.string_indices: Dict[str, int] = dict()
+        self.file_names: List[str] = list()
+        self.file_indices: Dict[str, int] = dict()
+
+        # The columns (one entry per component):
+        self.references: Column = array.array(INDEX_TYPE)
+        self.part_names: Column = array.array(INDEX_TYPE)
+        self.comments: Column = array.array(INDEX_TYPE)
+        self.footprints: Column = array.array(INDEX_TYPE)
+        self.files: Column = array.array(INDEX_TYPE)
+
+        # The memory map that the columns come from (loaded tables only):
+        self.mapping: Optional[mmap.mmap] = None
+
+    # ComponentTable.__getitem__():
+    def __getitem__(self, index: int) -> ComponentRecord:
+        component_table: ComponentTable = self
+        strings: List[str] = component_table.strings
+        return ComponentRecord(strings[component_table.references[index]],
+                               strings[component_table.part_names[index]],
+                               strings[component_table.comments[index]],
+                               strings[component_table.footprints[index]])
+
+    # ComponentTable.__len__():
+    def __len__(self) -> int:
+        component_table: ComponentTable = self
+        return len(component_table.references)
+
+    # ComponentTable.__str__():
+    def __str__(self) -> str:
+        component_table: ComponentTable = self
+        return (f"ComponentTable(rows={len(component_table)}, "
+                f"strings={len(component_table.strings)}, "
+                f"files={len(component_table.file_names)})")
+
+    # ComponentTable.close():
+    def close(self) -> None:
+        """ Release the memory map of a loaded table (the columns are unusable after.) """
+        component_table: ComponentTable = self
+        mapping: Optional[mmap.mmap] = component_table.mapping
+        if mapping is not None:
+            name: str
+            for name in COLUMNS:
+                column: Column = getattr(component_table, name)
+                if isinstance(column, memoryview):
+                    column.release()
+                setattr(component_table, name, array.array(INDEX_TYPE))
+            component_table.mapping = None
+            mapping.close()
+
+    # ComponentTable.column_strings():
+    def column_strings(self, name: str) -> List[str]:
+        """ Return the strings of the *name* column (e.g. "part_names") in row order. """
+        component_table: ComponentTable = self
+        assert name in STRING_COLUMNS, f"'{name}' is not one of {STRING_COLUMNS}"
+        strings: List[str] = component_table.strings
+        return [strings[index] for index in getattr(component_table, name)]
+
+    # ComponentTable.counts():
+    def counts(self, name: str) -> Dict[str, int]:
+        """ Return the number of rows for each distinct string of the *name* column. """
+        component_table: ComponentTable = self
+        assert name in STRING_COLUMNS, f"'{name}' is not one of {STRING_COLUMNS}"
+        strings: List[str] = component_table.strings
+        counter: collections.Counter = collections.Counter(getattr(component_table, name))
+        return {strings[index]: count for index, count in counter.items()}
+
+    # ComponentTable.file_index():
+    def file_index(self, file_name: str) -> int:
+        """ Return the file index of *file_name*, adding it to the table if needed. """
+        component_table: ComponentTable = self
+        file_indices: Dict[str, int] = component_table.file_indices
+        index: Optional[int] = file_indices.get(file_name)
+        if index is None:
+            index = len(component_table.file_names)
+            component_table.intern(file_name)
+            component_table.file_names.append(file_name)
+            file_indices[file_name] = index
+        return index
+
+    # ComponentTable.intern():
+    def intern(self, text: str) -> int:
+        """ Return the string index of *text*, adding it to *strings* if needed. """
+        component_table: ComponentTable = self
+        string_indices: Dict[str, int] = component_table.string_indices
+        index: Optional[int] = string_indices.get(text)
+        if index is None:
+            index = len(component_table.strings)
+            component_table.strings.append(text)
+            string_indices[text] = index
+        return index
+
+    # ComponentTable.records_append():
+    def records_append(self, records: Iterable[ComponentRecord],
+                       file_name: str) -> Iterator[ComponentRecord]:
+        """ Return an iterator over *records* that appends each one to the table.
+
+        The records are appended (under *file_name*) as they pass through, so the table
+        can be filled while the records are streamed somewhere else.
+        """
+        component_table: ComponentTable = self
+        assert component_table.mapping is None, "A loaded table can not be appended to"
+        file_index: int = component_table.file_index(file_name)
+        intern: Callable[[str], int] = component_table.intern
+        references_append: Callable[[int], None] = column_append_get(
+            component_table.references)
+        part_names_append: Callable[[int], None] = column_append_get(
+            component_table.part_names)
+        comments_append: Callable[[int], None] = column_append_get(component_table.comments)
+        footprints_append: Callable[[int], None] = column_append_get(
+            component_table.footprints)
+        files_append: Callable[[int], None] = column_append_get(component_table.files)
+        record: ComponentRecord
+        for record in records:
+            references_append(intern(record.reference))
+            part_names_append(intern(record.part_name))
+            comments_append(intern(record.comment))
+            footprints_append(intern(record.footprint))
+            files_append(file_index)
+            yield record
+
+    # ComponentTable.records_extend():
+    def records_extend(self, records: Iterable[ComponentRecord], file_name: str) -> int:
+        """ Append all of *records* (read from *file_name*) and return how many there were. """
+        component_table: ComponentTable = self
+        return sum(1 for record in component_table.records_append(records, file_name))
+
+    # ComponentTable.write():
+    def write(self, file_name: str) -> None:
+        """ Write the table to *file_name* (atomically) in the binary table format. """
+        component_table: ComponentTable = self
+        encoded_strings: List[bytes] = [text.encode("utf-8")
+                                        for text in component_table.strings]
+        offsets: array.array = array.array(INDEX_TYPE, [0])
+        offset: int = 0
+        encoded_string: bytes
+        for encoded_string in encoded_strings:
+            offset += len(encoded_string)
+            offsets.append(offset)
+        file_strings: array.array = array.array(
+            INDEX_TYPE, [component_table.string_indices[file_name]
+                         for file_name in component_table.file_names])
+        chunks: List[array.array] = [offsets, file_strings] + [
+            array.array(INDEX_TYPE, getattr(component_table, name)) for name in COLUMNS]
+
+        # Replace *file_name* atomically so readers never see a partial table:
+        temporary_handle: int
+        table_file: BinaryIO
+        with files.file_replace(file_name) as temporary_handle, \
+                os.fdopen(temporary_handle, "wb") as table_file:
+            table_file.write(HEADER.pack(MAGIC, VERSION, len(component_table),
+                                         len(encoded_strings),
+                                         len(component_table.file_names), offset))
+            chunk: array.array
+            for chunk in chunks:
+                if sys.byteorder != "little":
+                    chunk.byteswap()
+                chunk.tofile(table_file)
+            table_file.write(b"".join(encoded_strings))
+
+
+# column_append_get():
+def column_append_get(column: Column) -> Callable[[int], None]:
+    """ Return the *append* method of *column* (which must not come from a loaded table.) """
+    assert isinstance(column, array.array), "A loaded table can not be appended to"
+    return column.append
+
+
+# table_load():
+def table_load(file_name: str) -> ComponentTable:
+    """ Memory map the table file *file_name* and return it as a *ComponentTable*.
+
+    Call *ComponentTable.close*() to release the memory map when done.
+    """
+    table_file: BinaryIO
+    with open(file_name, "rb") as table_file:
+        assert os.fstat(table_file.fileno()).st_size >= HEADER.size, (
+            f"'{file_name}' is too short")
+        mapping: mmap.mmap = mmap.mmap(table_file.fileno(), 0, access=mmap.ACCESS_READ)
+    try:
+        magic: bytes
+        version: int
+        rows: int
+        strings_count: int
+        files_count: int
+        strings_size: int
+        magic, version, rows, strings_count, files_count, strings_size = HEADER.unpack_from(
+            mapping)
+        assert magic == MAGIC and version == VERSION, (
+            f"'{file_name}' is not a version {VERSION} component table")
+        integers_count: int = (strings_count + 1) + files_count + len(COLUMNS) * rows
+        strings_start: int = HEADER.size + 4 * integers_count
+        assert len(mapping) == strings_start + strings_size, f"'{file_name}' is truncated"
+
+        # The integers are used in place unless the byte order has to be swapped:
+        integers_view: memoryview = memoryview(mapping)[HEADER.size:strings_start]
+        integers: Column = (integers_view.cast("L") if INDEX_TYPE == "L" else
+                            integers_view.cast("I"))
+        if sys.byteorder != "little":
+            integers = array.array(INDEX_TYPE, integers)
+            integers.byteswap()
+        offsets: Column = integers[:strings_count + 1]
+        start: int = strings_count + 1
+
+        # Decode the interned strings:
+        blob: bytes = mapping[strings_start:]
+        component_table: ComponentTable = ComponentTable()
+        strings: List[str] = [blob[offsets[index]:offsets[index + 1]].decode("utf-8")
+                              for index in range(strings_count)]
+        component_table.strings = strings
+        component_table.string_indices = {text: index for index, text in enumerate(strings)}
+        component_table.file_names = [strings[index]
+                                      for index in integers[start:start + files_count]]
+        component_table.file_indices = {file_name: index for index, file_name
+                                         in enumerate(component_table.file_names)}
+        start += files_count
+
+        # Hook up the columns:
+        name: str
+        for name in COLUMNS:
+            setattr(component_table, name, integers[start:start + rows])
+            start += rows
+        component_table.mapping = mapping
+    except BaseException:
+        mapping.close()
+        raise
+    return component_table
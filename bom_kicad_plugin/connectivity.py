@@ -0,0 +1,410 @@
+# MIT License
+#
+# Copyright (c) 2019 Wayne C. Gramlich
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+# This module extracts the connectivity (i.e. which pins are on which nets) from the
+# `(nets ...)` section of a KiCad `.net` file.  References, net names and pin names are
+# interned into tables and the nodes are stored in compressed sparse row (CSR) form:
+#
+#        net_offsets[net_index] .. net_offsets[net_index + 1]
+#
+# is the range of *node_references* / *node_pins* that are on *net_index*.  The inverse
+# (the nets of each reference) is stored the same way in *reference_offsets* and
+# *reference_nets*.  All of the arrays are *array.array*'s of 32-bit unsigned integers,
+# so a query just slices a *memoryview* (i.e. no copying) and the arrays can be handed
+# to NumPy without copying via *Connectivity.numpy_arrays*().
+
+from bom_kicad_plugin.netscan import (ATOM_PATTERN, CLOSE, ENCODING, NAME, NAME_VALUE,
+                                      STRING_PATTERN, UNTERMINATED, Buffer,
+                                      token_pattern_compile)
+from bom_kicad_plugin.sexpression import atom_text
+import array
+import mmap
+import os
+import re
+from typing import (Any, BinaryIO, Dict, Iterable, Iterator, List, Match, Optional, Pattern,
+                    Tuple)
+
+# The array type code for 32-bit unsigned integers:
+INDEX_TYPE: str = "I" if array.array("I").itemsize == 4 else "L"
+
+# KiCad always starts the `(nets` list on its own line (and strings never contain a raw
+# new-line), so the start of the nets section can usually be found without scanning
+# everything in front of it.  It is the last section of the file, so the search starts
+# from the end:
+NETS_START: bytes = b"(nets"
+
+# In the usual KiCad order, the `(net (code 1) (name "GND")` head of each net and each whole
+# `(node (ref R1) (pin 1) ...)` are matched by *NETS_FAST_PATTERN* (with the net name in
+# group 1 or the node reference and pin in groups 2 and 3.)  Everything in between is
+# skipped over by the regular expression engine:
+TOKEN_PATTERN: bytes = STRING_PATTERN + rb"|" + ATOM_PATTERN
+NETS_FAST_PATTERN: Pattern = re.compile(
+    rb"\((?:\s*net\s+\(\s*code\s+(?:" + TOKEN_PATTERN + rb")\s*\)\s*\(\s*name\s+(" +
+    TOKEN_PATTERN + rb")\s*\)|\s*node\s+\(\s*ref\s+(" + TOKEN_PATTERN +
+    rb")\s*\)\s*\(\s*pin\s+(" + TOKEN_PATTERN + rb")\s*\)(?:\s*\(\s*(?:pinfunction|pintype)\s+(?:" +
+    TOKEN_PATTERN + rb")\s*\))*\s*\))", re.DOTALL)
+
+# When a net file is not in the usual order, *NETS_TOKEN_PATTERN* is used to go through
+# the nets section one list at a time (see *netscan* for the groups of a match):
+NAMES_PATTERN: bytes = rb"nets|net|name|node|ref|pin"
+NETS_TOKEN_PATTERN: Pattern = token_pattern_compile(NAMES_PATTERN)
+
+# The nets section is counted this many bytes at a time (see *bytes_count*()):
+COUNT_WINDOW_SIZE: int = 1 << 20
+
+# A net event is `(net_name, None, None)` and a node event is `(None, reference, pin)`
+# where each one is the raw bytes from the file:
+NetEvent = Tuple[Optional[bytes], Optional[bytes], Optional[bytes]]
+
+
+# Connectivity:
+class Connectivity:
+    """ The nets of a netlist with their nodes stored in compressed sparse row arrays. """
+
+    __slots__ = ("references", "reference_indices", "net_names", "net_indices", "pins",
+                 "net_offsets", "node_references", "node_pins",
+                 "reference_offsets", "reference_nets")
+
+    # Connectivity.__init__():
+    def __init__(self) -> None:
+        # Interned references, net names and pin names (with lookup tables):
+        self.references: List[str] = list()
+        self.reference_indices: Dict[str, int] = dict()
+        self.net_names: List[str] = list()
+        self.net_indices: Dict[str, int] = dict()
+        self.pins: List[str] = list()
+
+        # Net => nodes:
+        self.net_offsets: array.array = array.array(INDEX_TYPE, [0])
+        self.node_references: array.array = array.array(INDEX_TYPE)
+        self.node_pins: array.array = array.array(INDEX_TYPE)
+
+        # Reference => nets (filled in by *Connectivity.inverse_build*()):
+        self.reference_offsets: array.array = array.array(INDEX_TYPE, [0])
+        self.reference_nets: array.array = array.array(INDEX_TYPE)
+
+    # Connectivity.__str__():
+    def __str__(self) -> str:
+        connectivity: Connectivity = self
+        return (f"Connectivity(nets={len(connectivity.net_names)}, "
+                f"references={len(connectivity.references)}, "
+                f"nodes={len(connectivity.node_references)})")
+
+    # Connectivity.inverse_build():
+    def inverse_build(self) -> None:
+        """ Fill in the reference => nets arrays from the net => nodes arrays. """
+        # This is a counting sort of the nodes by reference.  The nets of each reference
+        # end up in net order:
+        connectivity: Connectivity = self
+        node_references: array.array = connectivity.node_references
+        net_offsets: array.array = connectivity.net_offsets
+        counts: List[int] = [0] * (len(connectivity.references) + 1)
+        reference_index: int
+        for reference_index in node_references:
+            counts[reference_index + 1] += 1
+        index: int
+        for index in range(1, len(counts)):
+            counts[index] += counts[index - 1]
+        reference_offsets: array.array = array.array(INDEX_TYPE, counts)
+        reference_nets: array.array = array.array(INDEX_TYPE, bytes(len(node_references) *
+                                                                    reference_offsets.itemsize))
+        net_index: int
+        for net_index in range(len(connectivity.net_names)):
+            node_index: int
+            for node_index in range(net_offsets[net_index], net_offsets[net_index + 1]):
+                reference_index = node_references[node_index]
+                reference_nets[counts[reference_index]] = net_index
+                counts[reference_index] += 1
+        connectivity.reference_offsets = reference_offsets
+        connectivity.reference_nets = reference_nets
+
+    # Connectivity.net_nodes():
+    def net_nodes(self, net_name: str) -> List[List[str]]:
+        """ Return the [reference, pin] pairs on the *net_name* net. """
+        connectivity: Connectivity = self
+        net_index: int = connectivity.net_indices[net_name]
+        start: int = connectivity.net_offsets[net_index]
+        end: int = connectivity.net_offsets[net_index + 1]
+        references: List[str] = connectivity.references
+        pins: List[str] = connectivity.pins
+        return [[references[reference_index], pins[pin_index]]
+                for reference_index, pin_index in zip(connectivity.node_references[start:end],
+                                                      connectivity.node_pins[start:end])]
+
+    # Connectivity.net_reference_indices():
+    def net_reference_indices(self, net_index: int) -> memoryview:
+        """ Return the reference index of each node on *net_index* (without copying.) """
+        connectivity: Connectivity = self
+        net_offsets: array.array = connectivity.net_offsets
+        return memoryview(connectivity.node_references)[
+            net_offsets[net_index]:net_offsets[net_index + 1]]
+
+    # Connectivity.net_references():
+    def net_references(self, net_name: str) -> List[str]:
+        """ Return the distinct references with a pin on the *net_name* net. """
+        connectivity: Connectivity = self
+        references: List[str] = connectivity.references
+        reference_indices: memoryview = connectivity.net_reference_indices(
+            connectivity.net_indices[net_name])
+        return [references[reference_index]
+                for reference_index in dict.fromkeys(reference_indices)]
+
+    # Connectivity.numpy_arrays():
+    def numpy_arrays(self) -> Dict[str, Any]:
+        """ Return all of the arrays as NumPy arrays keyed by attribute name.
+
+        The NumPy arrays share memory with the *array.array*'s (i.e. nothing is copied.)
+        NumPy is only needed when this method is called.
+        """
+        connectivity: Connectivity = self
+        try:
+            import numpy  # type: ignore
+        except ImportError:
+            assert False, "NumPy is not installed"
+        return {name: numpy.frombuffer(getattr(connectivity, name), dtype=numpy.uint32)
+                for name in ("net_offsets", "node_references", "node_pins",
+                             "reference_offsets", "reference_nets")}
+
+    # Connectivity.reference_net_indices():
+    def reference_net_indices(self, reference_index: int) -> memoryview:
+        """ Return the net index of each pin of *reference_index* (without copying.) """
+        connectivity: Connectivity = self
+        reference_offsets: array.array = connectivity.reference_offsets
+        return memoryview(connectivity.reference_nets)[
+            reference_offsets[reference_index]:reference_offsets[reference_index + 1]]
+
+    # Connectivity.reference_nets_names():
+    def reference_nets_names(self, reference: str) -> List[str]:
+        """ Return the distinct names of the nets that *reference* has a pin on. """
+        connectivity: Connectivity = self
+        net_names: List[str] = connectivity.net_names
+        reference_index: Optional[int] = connectivity.reference_indices.get(reference)
+        return ([] if reference_index is None else
+                [net_names[net_index] for net_index in
+                 dict.fromkeys(connectivity.reference_net_indices(reference_index))])
+
+
+# connectivity_read():
+def connectivity_read(net_file_name: str) -> Connectivity:
+    """ Return the *Connectivity* of the nets section of the *net_file_name* `.net` file. """
+    net_file: BinaryIO
+    with open(net_file_name, "rb") as net_file:
+        assert os.fstat(net_file.fileno()).st_size > 0, f"'{net_file_name}' is empty"
+        data: mmap.mmap
+        with mmap.mmap(net_file.fileno(), 0, access=mmap.ACCESS_READ) as data:
+            return connectivity_bytes_scan(data)
+
+
+# nets_start_find():
+def nets_start_find(data: Buffer) -> int:
+    """ Return the offset of the `(nets` list of *data* (or -1 if there is none.)
+
+    The last `(nets` that starts a line is used.  If there is none (e.g. the whole file
+    is on one line), the lists of *data* are scanned to find it.
+    """
+    end: int = len(data)
+    while True:
+        start: int = data.rfind(NETS_START, 0, end)
+        if start < 0:
+            break
+        line_start: int = data.rfind(b"\n", 0, start) + 1
+        if not data[line_start:start].strip() and data[start + len(NETS_START):
+                                                      start + len(NETS_START) + 1].isspace():
+            return start
+        end = start
+    return nets_start_scan(data) if data.find(NETS_START) >= 0 else -1
+
+
+# nets_start_scan():
+def nets_start_scan(data: Buffer) -> int:
+    """ Return the offset of the `(nets` list of *data* found by scanning every list. """
+    # *depth* is the list nesting; the nets section is at depth 2 (i.e. in `(export`):
+    depth: int = 0
+    match: Match
+    for match in NETS_TOKEN_PATTERN.finditer(data):
+        kind: Optional[int] = match.lastindex
+        if kind is None or kind <= NAME_VALUE:
+            depth += 1
+            if depth == 2 and kind is not None and match.group(NAME) == b"nets":
+                return match.start()
+        elif kind == CLOSE:
+            depth -= 1
+        elif kind == UNTERMINATED:
+            assert False, "Unterminated string in S-expression"
+    return -1
+
+
+# bytes_count():
+def bytes_count(data: Buffer, pattern: bytes, start: int) -> int:
+    """ Return the number of times that *pattern* occurs in *data* from *start* on.
+
+    *data* is counted a window at a time, so only one window of a memory map is ever
+    copied onto the heap.  Each window overlaps the next by one byte less than
+    *pattern*, so every occurrence is counted in exactly one window.
+    """
+    count: int = 0
+    size: int = len(data)
+    overlap: int = len(pattern) - 1
+    window_start: int
+    for window_start in range(start, size, COUNT_WINDOW_SIZE):
+        count += data[window_start:min(window_start + COUNT_WINDOW_SIZE + overlap,
+                                       size)].count(pattern)
+    return count
+
+
+# connectivity_bytes_scan():
+def connectivity_bytes_scan(data: Buffer) -> Connectivity:
+    """ Return the *Connectivity* of the `(nets ...)` section of the net file bytes *data*.
+
+    A net file without a nets section has no nets.
+    """
+    nets_start: int = nets_start_find(data)
+    if nets_start < 0:
+        return Connectivity()
+
+    # Try the fast scan first.  If it did not see every net and node (i.e. the file is
+    # not in the usual order), start over with the full scan:
+    connectivity: Connectivity = connectivity_build(nets_events_fast_scan(data, nets_start))
+    nets_count: int = (bytes_count(data, b"(net", nets_start) -
+                       bytes_count(data, b"(nets", nets_start))
+    nodes_count: int = bytes_count(data, b"(node", nets_start)
+    if len(connectivity.net_names) != nets_count or \
+       len(connectivity.node_references) != nodes_count:
+        connectivity = connectivity_build(nets_events_scan(data, nets_start))
+    return connectivity
+
+
+# nets_events_fast_scan():
+def nets_events_fast_scan(data: Buffer, nets_start: int) -> Iterator[NetEvent]:
+    """ Return an iterator over the net and node events that *NETS_FAST_PATTERN* finds. """
+    match: Match
+    for match in NETS_FAST_PATTERN.finditer(data, nets_start):
+        net_name: Optional[bytes]
+        reference: Optional[bytes]
+        pin: Optional[bytes]
+        net_name, reference, pin = match.group(1, 2, 3)
+        yield net_name, reference, pin
+
+
+# nets_events_scan():
+def nets_events_scan(data: Buffer, nets_start: int) -> Iterator[NetEvent]:
+    """ Return an iterator over the net and node events of the nets section of *data*. """
+    # *depth* is the list nesting below the start of the nets section.  Depth 1 is `(nets`,
+    # depth 2 is `(net`, depth 3 is `(name` or `(node` and depth 4 is `(ref` or `(pin`:
+    depth: int = 0
+    in_net: bool = False
+    in_node: bool = False
+    net_name: Optional[bytes] = None  # Not sent yet
+    fields: Dict[bytes, bytes] = dict()
+    match: Match
+    for match in NETS_TOKEN_PATTERN.finditer(data, nets_start):
+        kind: Optional[int] = match.lastindex
+        if kind is None or kind <= NAME_VALUE:
+            # An opening parenthesis:
+            depth += 1
+            name: bytes = b"" if kind is None else match.group(NAME)
+            if depth == 1:
+                assert name == b"nets", "Nets section does not start with '(nets'"
+            elif depth == 2:
+                in_net = name == b"net"
+                net_name = b'""'
+            elif depth == 3 and in_net:
+                in_node = name == b"node"
+                fields = dict()
+                if name == b"name" and kind == NAME_VALUE:
+                    net_name = match.group(NAME_VALUE)
+            elif depth == 4 and in_node and kind == NAME_VALUE:
+                fields.setdefault(name, match.group(NAME_VALUE))
+        elif kind == CLOSE:
+            # The net event is sent just before the first node of the net:
+            if depth == 3 and in_node:
+                in_node = False
+                assert b"ref" in fields and b"pin" in fields, "Node without (ref ...)/(pin ...)"
+                if net_name is not None:
+                    yield net_name, None, None
+                    net_name = None
+                yield None, fields[b"ref"], fields[b"pin"]
+            elif depth == 2 and in_net:
+                # A net without any nodes:
+                in_net = False
+                if net_name is not None:
+                    yield net_name, None, None
+            depth -= 1
+            if depth == 0:
+                return
+        elif kind == UNTERMINATED:
+            assert False, "Unterminated string in S-expression"
+    assert False, "Unexpected end of S-expression"
+
+
+# connectivity_build():
+def connectivity_build(events: Iterable[NetEvent]) -> Connectivity:
+    """ Return the *Connectivity* for the net and node *events*. """
+    connectivity: Connectivity = Connectivity()
+
+    # The tables are keyed by the raw bytes of each token, so each distinct token is
+    # only decoded once:
+    references: List[str] = connectivity.references
+    reference_indices: Dict[bytes, int] = dict()
+    pins: List[str] = connectivity.pins
+    pin_indices: Dict[bytes, int] = dict()
+    net_names: List[str] = connectivity.net_names
+    net_offsets: array.array = connectivity.net_offsets
+    node_references: array.array = connectivity.node_references
+    node_pins: array.array = connectivity.node_pins
+    net_name: Optional[bytes]
+    reference: Optional[bytes]
+    pin: Optional[bytes]
+    for net_name, reference, pin in events:
+        if net_name is not None:
+            # End the previous net (if any) and start a new one:
+            if net_names:
+                net_offsets.append(len(node_references))
+            net_names.append(atom_text(net_name.decode(ENCODING)))
+            continue
+        assert reference is not None and pin is not None
+
+        # Intern the *reference* and *pin* and append the node:
+        index: Optional[int] = reference_indices.get(reference)
+        if index is None:
+            index = len(references)
+            reference_indices[reference] = index
+            references.append(atom_text(reference.decode(ENCODING)))
+        node_references.append(index)
+        index = pin_indices.get(pin)
+        if index is None:
+            index = len(pins)
+            pin_indices[pin] = index
+            pins.append(atom_text(pin.decode(ENCODING)))
+        node_pins.append(index)
+    if net_names:
+        net_offsets.append(len(node_references))
+
+    # Fill in the lookup tables and the reference => nets arrays:
+    connectivity.reference_indices = {reference: index
+                                      for index, reference in enumerate(references)}
+    net_index: int
+    name: str
+    for net_index, name in enumerate(net_names):
+        connectivity.net_indices.setdefault(name, net_index)
+    connectivity.inverse_build()
+    return connectivity
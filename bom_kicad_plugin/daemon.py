@@ -0,0 +1,432 @@
+# MIT License
+#
+# Copyright (c) 2019 Wayne C. Gramlich
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+# The watch daemon keeps the component records of a set of KiCad files in memory and
+# answers queries about them over a local Unix socket.  The files are polled for changes
+# (by size and modification time) and only the files that changed are parsed again, so
+# a query never pays for Python start up, plugin discovery or parsing.  For example:
+#
+#        python -m bom_kicad_plugin.daemon --socket /tmp/bom.sock board.net power.net
+#
+# The protocol is one JSON object per line in each direction.  A request has a "command"
+# and any arguments; the response has "ok" and then either the results or an "error":
+#
+#        {"command": "status"}
+#        {"command": "components", "file": "board.net"}
+#        {"command": "reference", "reference": "R12"}
+#        {"command": "part", "part_name": "10K"}
+#        {"command": "parts", "file": "board.net"}
+#        {"command": "refresh"}
+#
+# *daemon_query*() sends one request and returns the response.
+
+import argparse
+from bom_manager.tracing import tracing_get
+from bom_kicad_plugin.cache import ComponentCache
+from bom_kicad_plugin.kicad import Kicad, cad_get
+from bom_kicad_plugin.records import ComponentRecord
+import json
+import os
+import signal
+import socket
+import socketserver
+import stat
+import sys
+import threading
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+# The default number of seconds between polls of the watched files:
+POLL_INTERVAL: float = 1.0
+
+
+# WatchedFile:
+class WatchedFile:
+    """ The component records of one watched file as of its last successful parse. """
+
+    __slots__ = ("file_name", "signature", "records", "references", "parts",
+                 "components_json", "reads", "error")
+
+    # WatchedFile.__init__():
+    def __init__(self, file_name: str) -> None:
+        # Load up *watched_file* (i.e. *self*).  *signature* is (size, mtime) when parsed:
+        self.file_name: str = file_name
+        self.signature: Optional[Tuple[int, int]] = None
+        self.records: List[ComponentRecord] = list()
+        self.references: Dict[str, ComponentRecord] = dict()
+        self.parts: Dict[str, List[str]] = dict()
+        self.components_json: str = "[]"
+        self.reads: int = 0
+        self.error: str = ""
+
+    # WatchedFile.records_set():
+    def records_set(self, records: List[ComponentRecord]) -> None:
+        """ Replace the records of *watched_file* and rebuild the query tables. """
+        watched_file: WatchedFile = self
+        references: Dict[str, ComponentRecord] = dict()
+        parts: Dict[str, List[str]] = dict()
+        record: ComponentRecord
+        for record in records:
+            references.setdefault(record.reference, record)
+            parts.setdefault(record.part_name, list()).append(record.reference)
+        watched_file.records = records
+        watched_file.references = references
+        watched_file.parts = parts
+        # The (possibly large) component list is only encoded once per parse:
+        watched_file.components_json = json.dumps([list(record) for record in records])
+
+    # WatchedFile.status():
+    def status(self) -> Dict[str, Any]:
+        """ Return the status of *watched_file* as a JSON compatible table. """
+        watched_file: WatchedFile = self
+        signature: Optional[Tuple[int, int]] = watched_file.signature
+        return {"file": watched_file.file_name,
+                "size": None if signature is None else signature[0],
+                "mtime_ns": None if signature is None else signature[1],
+                "components": len(watched_file.records),
+                "reads": watched_file.reads,
+                "error": watched_file.error}
+
+
+# WatchDaemon:
+class WatchDaemon:
+    """ Keep the records of *file_names* up to date and answer queries about them. """
+
+    # WatchDaemon.__init__():
+    def __init__(self, file_names: List[str], kicad: Optional[Kicad] = None,
+                 interval: float = POLL_INTERVAL) -> None:
+        # Load up *watch_daemon* (i.e. *self*).  *kicad* supplies the cache (if any):
+        self.kicad: Kicad = cad_get() if kicad is None else kicad
+        self.interval: float = interval
+        self.watched_files: Dict[str, WatchedFile] = {
+            file_name: WatchedFile(file_name) for file_name in file_names}
+        # *lock* guards swapping in refreshed files and *refresh_lock* makes sure that only
+        # one *poll*() (from the poller or a "refresh" request) parses files at a time:
+        self.lock: threading.Lock = threading.Lock()
+        self.refresh_lock: threading.Lock = threading.Lock()
+        self.stopped: threading.Event = threading.Event()
+        self.server: Optional[WatchServer] = None
+        self.commands: Dict[str, Callable[[Dict[str, Any]], Dict[str, Any]]] = {
+            "components": self.components_command,
+            "part": self.part_command,
+            "parts": self.parts_command,
+            "reference": self.reference_command,
+            "refresh": self.refresh_command,
+            "status": self.status_command,
+        }
+
+    # WatchDaemon.__str__():
+    def __str__(self) -> str:
+        watch_daemon: WatchDaemon = self
+        return f"WatchDaemon({len(watch_daemon.watched_files)} files)"
+
+    # WatchDaemon.components_command():
+    def components_command(self, request: Dict[str, Any]) -> Dict[str, Any]:
+        """ Return the [reference, part_name, comment, footprint] lists of a file. """
+        watch_daemon: WatchDaemon = self
+        watched_file: WatchedFile = watch_daemon.watched_file_get(request)
+        # Splice the pre-encoded component list into the response:
+        return {"file": watched_file.file_name, "components": RawJSON(watched_file.components_json)}
+
+    # WatchDaemon.file_refresh():
+    def file_refresh(self, watched_file: WatchedFile) -> bool:
+        """ Parse *watched_file* again if it changed and return *True* if it did. """
+        # Compare the file signature with the one from the last parse:
+        watch_daemon: WatchDaemon = self
+        file_name: str = watched_file.file_name
+        try:
+            status: os.stat_result = os.stat(file_name)
+        except OSError as error:
+            watched_file.error = str(error)
+            return False
+        signature: Tuple[int, int] = (status.st_size, status.st_mtime_ns)
+        if signature == watched_file.signature:
+            return False
+
+        # Parse the file outside of *lock*; queries keep getting the old records meanwhile.
+        # When the parse fails (for any reason; a malformed file can raise just about
+        # anything), the old records are kept and the error is reported:
+        tracing: str = tracing_get()
+        if tracing:
+            print(f"{tracing}Refreshing '{file_name}'")
+        refreshed: WatchedFile = WatchedFile(file_name)
+        refreshed.signature = signature
+        refreshed.reads = watched_file.reads + 1
+        try:
+            records: Optional[List[ComponentRecord]] = watch_daemon.kicad.file_records_get(
+                file_name)
+            assert records is not None, f"File '{file_name}' is not in a readable format"
+            refreshed.records_set(records)
+        except Exception as error:
+            with watch_daemon.lock:
+                watched_file.signature = signature
+                watched_file.error = str(error) or type(error).__name__
+            return False
+        with watch_daemon.lock:
+            watch_daemon.watched_files[file_name] = refreshed
+        return True
+
+    # WatchDaemon.part_command():
+    def part_command(self, request: Dict[str, Any]) -> Dict[str, Any]:
+        """ Return the references of a part name in each file that uses it. """
+        watch_daemon: WatchDaemon = self
+        part_name: str = str(request.get("part_name", ""))
+        files: Dict[str, List[str]] = dict()
+        watched_file: WatchedFile
+        for watched_file in list(watch_daemon.watched_files.values()):
+            references: Optional[List[str]] = watched_file.parts.get(part_name)
+            if references is not None:
+                files[watched_file.file_name] = references
+        return {"part_name": part_name, "files": files}
+
+    # WatchDaemon.parts_command():
+    def parts_command(self, request: Dict[str, Any]) -> Dict[str, Any]:
+        """ Return the number of references of each part name in a file. """
+        watch_daemon: WatchDaemon = self
+        watched_file: WatchedFile = watch_daemon.watched_file_get(request)
+        return {"file": watched_file.file_name,
+                "parts": {part_name: len(references)
+                          for part_name, references in watched_file.parts.items()}}
+
+    # WatchDaemon.poll():
+    def poll(self) -> List[str]:
+        """ Refresh every watched file that changed and return their file names. """
+        # A poll that has to wait for another one to finish then finds the files unchanged:
+        watch_daemon: WatchDaemon = self
+        with watch_daemon.refresh_lock:
+            return [watched_file.file_name
+                    for watched_file in list(watch_daemon.watched_files.values())
+                    if watch_daemon.file_refresh(watched_file)]
+
+    # WatchDaemon.poll_loop():
+    def poll_loop(self) -> None:
+        """ Poll the watched files every *interval* seconds until stopped. """
+        watch_daemon: WatchDaemon = self
+        while not watch_daemon.stopped.wait(watch_daemon.interval):
+            # Keep on polling no matter what, since queries would otherwise silently get
+            # stale records from then on:
+            try:
+                watch_daemon.poll()
+            except Exception as error:
+                print(f"Polling failed: {error}", file=sys.stderr)
+
+    # WatchDaemon.reference_command():
+    def reference_command(self, request: Dict[str, Any]) -> Dict[str, Any]:
+        """ Return the record of a reference in each file that has it. """
+        watch_daemon: WatchDaemon = self
+        reference: str = str(request.get("reference", ""))
+        files: Dict[str, List[str]] = dict()
+        watched_file: WatchedFile
+        for watched_file in list(watch_daemon.watched_files.values()):
+            record: Optional[ComponentRecord] = watched_file.references.get(reference)
+            if record is not None:
+                files[watched_file.file_name] = list(record)
+        return {"reference": reference, "files": files}
+
+    # WatchDaemon.refresh_command():
+    def refresh_command(self, request: Dict[str, Any]) -> Dict[str, Any]:
+        """ Poll the watched files right now rather than waiting for the next poll. """
+        watch_daemon: WatchDaemon = self
+        return {"refreshed": watch_daemon.poll()}
+
+    # WatchDaemon.request_handle():
+    def request_handle(self, request_text: str) -> str:
+        """ Return the JSON response line for the JSON *request_text* line. """
+        watch_daemon: WatchDaemon = self
+        response: Dict[str, Any]
+        try:
+            request: Any = json.loads(request_text)
+            assert isinstance(request, dict), "Request is not a JSON object"
+            command: str = str(request.get("command", ""))
+            assert command in watch_daemon.commands, f"Unknown command '{command}'"
+            response = {"ok": True}
+            response.update(watch_daemon.commands[command](request))
+        except (AssertionError, ValueError) as error:
+            response = {"ok": False, "error": str(error)}
+        return response_encode(response)
+
+    # WatchDaemon.serve():
+    def serve(self, socket_name: str) -> None:
+        """ Answer requests on the *socket_name* Unix socket until *shutdown*() is called. """
+        # Do the first full read before accepting any queries:
+        watch_daemon: WatchDaemon = self
+        watch_daemon.poll()
+
+        # Clear out a stale socket from a previous run (but nothing else):
+        if os.path.exists(socket_name):
+            assert stat.S_ISSOCK(os.stat(socket_name).st_mode), (
+                f"'{socket_name}' exists and is not a socket")
+            os.remove(socket_name)
+
+        server: WatchServer = WatchServer(socket_name, WatchRequestHandler)
+        server.watch_daemon = watch_daemon
+        watch_daemon.server = server
+        poller: threading.Thread = threading.Thread(target=watch_daemon.poll_loop, daemon=True)
+        poller.start()
+        try:
+            server.serve_forever()
+        finally:
+            watch_daemon.stopped.set()
+            server.server_close()
+            if os.path.exists(socket_name):
+                os.remove(socket_name)
+
+    # WatchDaemon.shutdown():
+    def shutdown(self) -> None:
+        """ Stop polling and serving (*serve*() then returns.) """
+        watch_daemon: WatchDaemon = self
+        watch_daemon.stopped.set()
+        if watch_daemon.server is not None:
+            watch_daemon.server.shutdown()
+
+    # WatchDaemon.status_command():
+    def status_command(self, request: Dict[str, Any]) -> Dict[str, Any]:
+        """ Return the status of every watched file. """
+        watch_daemon: WatchDaemon = self
+        return {"files": [watched_file.status()
+                          for watched_file in list(watch_daemon.watched_files.values())]}
+
+    # WatchDaemon.watched_file_get():
+    def watched_file_get(self, request: Dict[str, Any]) -> WatchedFile:
+        """ Return the *WatchedFile* named by the "file" of *request*.
+
+        The "file" can be left out when only one file is watched.
+        """
+        watch_daemon: WatchDaemon = self
+        watched_files: Dict[str, WatchedFile] = watch_daemon.watched_files
+        file_name: str = str(request.get("file", ""))
+        if not file_name:
+            assert len(watched_files) == 1, (
+                "Request needs a 'file' when several files are watched")
+            file_name = next(iter(watched_files))
+        elif file_name not in watched_files:
+            file_name = os.path.abspath(file_name)
+        assert file_name in watched_files, f"File '{file_name}' is not being watched"
+        return watched_files[file_name]
+
+
+# RawJSON:
+class RawJSON(str):
+    """ Text that is already JSON and is copied into a response as is. """
+
+
+# response_encode():
+def response_encode(response: Dict[str, Any]) -> str:
+    """ Return *response* as a single JSON line with any *RawJSON* values spliced in. """
+    raws: List[str] = list()
+    key: str
+    value: Any
+    for key, value in list(response.items()):
+        if isinstance(value, RawJSON):
+            raws.append(f"{json.dumps(key)}: {value}")
+            del response[key]
+    text: str = json.dumps(response)
+    if raws:
+        text = text[:-1] + (", " if response else "") + ", ".join(raws) + "}"
+    return text + "\n"
+
+
+# WatchServer:
+class WatchServer(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    """ The Unix socket server of a *WatchDaemon*. """
+
+    daemon_threads: bool = True
+    watch_daemon: WatchDaemon
+
+
+# WatchRequestHandler:
+class WatchRequestHandler(socketserver.StreamRequestHandler):
+    """ Answer each JSON request line of one connection with a JSON response line. """
+
+    # WatchRequestHandler.handle():
+    def handle(self) -> None:
+        watch_request_handler: WatchRequestHandler = self
+        server: Any = watch_request_handler.server
+        watch_daemon: WatchDaemon = server.watch_daemon
+        line: bytes
+        for line in watch_request_handler.rfile:
+            if line.strip():
+                response: str = watch_daemon.request_handle(line.decode("utf-8"))
+                watch_request_handler.wfile.write(response.encode("utf-8"))
+                watch_request_handler.wfile.flush()
+
+
+# daemon_query():
+def daemon_query(socket_name: str, request: Dict[str, Any],
+                 timeout: float = 10.0) -> Dict[str, Any]:
+    """ Send *request* to the daemon listening on *socket_name* and return its response. """
+    client: socket.socket
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as client:
+        client.settimeout(timeout)
+        client.connect(socket_name)
+        client.sendall((json.dumps(request) + "\n").encode("utf-8"))
+        chunks: List[bytes] = list()
+        while not chunks or not chunks[-1].endswith(b"\n"):
+            chunk: bytes = client.recv(1 << 16)
+            assert chunk, "Daemon closed the connection without a response"
+            chunks.append(chunk)
+    response: Dict[str, Any] = json.loads(b"".join(chunks).decode("utf-8"))
+    return response
+
+
+# main():
+def main() -> int:
+    parser: argparse.ArgumentParser = argparse.ArgumentParser(
+        description="Keep KiCad files parsed and answer BOM queries over a Unix socket.")
+    parser.add_argument("--socket", required=True, help="The Unix socket to listen on")
+    parser.add_argument("--interval", type=float, default=POLL_INTERVAL,
+                        help="Seconds between polls of the files")
+    parser.add_argument("--cache", default="",
+                        help="Also keep the parsed records in this cache directory")
+    parser.add_argument("--query", default="",
+                        help="Send this JSON request to a running daemon instead")
+    parser.add_argument("file_names", nargs="*", help="The KiCad files to watch")
+    arguments: argparse.Namespace = parser.parse_args()
+
+    # Act as a client if there is a *query*:
+    if arguments.query:
+        try:
+            request: Any = json.loads(arguments.query)
+        except ValueError as error:
+            parser.error(f"--query is not valid JSON: {error}")
+        print(json.dumps(daemon_query(arguments.socket, request)))
+        return 0
+
+    assert arguments.file_names, "No files to watch"
+    kicad: Kicad = cad_get()
+    if arguments.cache:
+        kicad.cache = ComponentCache(arguments.cache)
+    watch_daemon: WatchDaemon = WatchDaemon(
+        [os.path.abspath(file_name) for file_name in arguments.file_names],
+        kicad, arguments.interval)
+    # Make sure that the socket is removed on a plain `kill`:
+    signal.signal(signal.SIGTERM, lambda signal_number, frame: sys.exit(0))
+    try:
+        print(f"Watching {len(arguments.file_names)} files on '{arguments.socket}'",
+              file=sys.stderr)
+        watch_daemon.serve(arguments.socket)
+    except KeyboardInterrupt:
+        pass
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,74 @@
+# MIT License
+#
+# Copyright (c) 2019 Wayne C. Gramlich
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+# Files that are written by the plugin (net files with updated footprints, cache entries
+# and component tables) are written to a temporary file in the same directory which
+# then replaces the original.  Anything reading the file sees either the old contents or
+# the new contents, but never a partially written file.
+
+import contextlib
+import os
+import shutil
+import tempfile
+from typing import Iterator
+
+
+# umask_get():
+def umask_get() -> int:
+    """ Return the current umask of the process. """
+    umask: int = os.umask(0)
+    os.umask(umask)
+    return umask
+
+
+# The permissions of a new file (i.e. the ones that `open(file_name, "w")` would give it).
+# The umask can only be read by changing it, so it is only read once:
+NEW_FILE_MODE: int = 0o666 & ~umask_get()
+
+
+# file_replace():
+@contextlib.contextmanager
+def file_replace(file_name: str) -> Iterator[int]:
+    """ Return a context manager that atomically replaces *file_name*.
+
+    The context value is the file descriptor of a new temporary file in the same directory
+    as *file_name*.  It must be written and closed (e.g. with *os.fdopen*() in the same
+    `with` statement) before the context exits.  The temporary file then replaces
+    *file_name* with the permissions of the file it replaces (or those of a new file.)
+    If the context exits with an exception, the temporary file is removed instead.
+    """
+    directory: str = os.path.dirname(os.path.abspath(file_name))
+    temporary_handle: int
+    temporary_path: str
+    temporary_handle, temporary_path = tempfile.mkstemp(dir=directory, suffix=".tmp")
+    try:
+        yield temporary_handle
+        # *mkstemp*() creates the file readable by its owner only:
+        if os.path.exists(file_name):
+            shutil.copymode(file_name, temporary_path)
+        else:
+            os.chmod(temporary_path, NEW_FILE_MODE)
+        os.replace(temporary_path, file_name)
+    except BaseException:
+        with contextlib.suppress(OSError):
+            os.remove(temporary_path)
+        raise
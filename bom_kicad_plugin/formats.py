@@ -0,0 +1,182 @@
+# MIT License
+#
+# Copyright (c) 2019 Wayne C. Gramlich
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+# Each file format that can be read is described by a *FileFormat* in the *FORMATS*
+# registry.  A format lists the file name suffixes it applies to and provides a cheap
+# signature check that is run on the first few KB of the file.  *file_format_find*()
+# reads that head once and picks the first registered format that matches, so each
+# file is only parsed by exactly one reader.  The formats for the suffix of the file are
+# tried first, but the contents win, so a netlist that was saved as `.csv` is still read
+# as a netlist.  Other formats can be added with *format_register*().
+
+from bom_kicad_plugin import readers
+from bom_kicad_plugin.records import ComponentRecord
+from typing import BinaryIO, Callable, Iterator, List, NamedTuple, Optional, Tuple
+
+# The number of bytes at the front of a file that the signature checks get to look at:
+HEAD_SIZE: int = 4096
+
+
+# FileFormat:
+class FileFormat(NamedTuple):
+    """ A file format that can be read into component records. """
+
+    name: str
+    suffixes: Tuple[str, ...]
+    signature_match: Callable[[str], bool]  # Called with the head of the file
+    records_read: Callable[[str], Iterator[ComponentRecord]]  # Called with the file name
+    cacheable: bool = True  # *False* if the records depend on more than the one file
+    # Called with the file name and a number of worker processes to split the parsing of
+    # one (large) file up among (*None* if the format can not do that):
+    chunked_read: Optional[Callable[[str, int], Iterator[ComponentRecord]]] = None
+
+
+# head_rows():
+def head_rows(head: str, count: int) -> List[List[str]]:
+    """ Return the first *count* comma separated rows of *head* with quotes removed.
+
+    This is nowhere near a real CSV parser, but it is good enough to recognize the
+    header rows of a file without pulling in the *csv* module.
+    """
+    rows: List[List[str]] = list()
+    line: str
+    for line in head.splitlines()[:count]:
+        rows.append([cell.strip().strip('"') for cell in line.split(",")])
+    return rows
+
+
+# altium_csv_signature_match():
+def altium_csv_signature_match(head: str) -> bool:
+    """ Return *True* if *head* starts with an Altium BOM header row. """
+    rows: List[List[str]] = head_rows(head, 1)
+    return len(rows) == 1 and rows[0][:4] == ["Line #", "Name", "Description", "Designator"]
+
+
+# bom_csv_grouped_by_value_with_fp_signature_match():
+def bom_csv_grouped_by_value_with_fp_signature_match(head: str) -> bool:
+    """ Return *True* if *head* starts with a KiCad BOM generator preamble. """
+    rows: List[List[str]] = head_rows(head, 4)
+    return [row[0] for row in rows] == ["Source:", "Date:", "Tool:", "Generator:"]
+
+
+# net_file_signature_match():
+def net_file_signature_match(head: str) -> bool:
+    """ Return *True* if *head* starts with a KiCad netlist `(export` list. """
+    return head.lstrip().startswith("(export")
+
+
+# schematic_signature_match():
+def schematic_signature_match(head: str) -> bool:
+    """ Return *True* if *head* starts with a KiCad 6+ `(kicad_sch` list. """
+    return head.lstrip().startswith("(kicad_sch")
+
+
+FORMATS: List[FileFormat] = [
+    FileFormat("Altium BOM CSV", (".csv",),
+               altium_csv_signature_match, readers.altium_csv_records_read),
+    FileFormat("KiCad bom_csv_grouped_by_value_with_fp CSV", (".csv",),
+               bom_csv_grouped_by_value_with_fp_signature_match,
+               readers.bom_csv_grouped_by_value_with_fp_records_read),
+    FileFormat("KiCad netlist", (".net",),
+               net_file_signature_match, readers.net_file_records_read,
+               chunked_read=readers.net_file_records_read),
+    # A schematic also reads all of its sheet files, so it can not be cached by file:
+    FileFormat("KiCad schematic", (".kicad_sch",),
+               schematic_signature_match, readers.schematic_records_read, False),
+]
+
+
+# format_register():
+def format_register(file_format: FileFormat) -> None:
+    """ Add *file_format* to the *FORMATS* registry. """
+    FORMATS.append(file_format)
+
+
+# file_cacheable():
+def file_cacheable(file_name: str) -> bool:
+    """ Return *True* if the records of *file_name* only depend upon *file_name* itself. """
+    return all(file_format.cacheable for file_format in FORMATS
+               if file_name.endswith(file_format.suffixes))
+
+
+# file_format_find():
+def file_format_find(file_name: str) -> Optional[FileFormat]:
+    """ Return the *FileFormat* for the contents of *file_name*.
+
+    The formats for the suffix of *file_name* are tried first and then all of the others.
+    If none of them recognize the contents, *None* is returned for a suffix that no format
+    knows about and an *AssertionError* is raised for one that a format does know about.
+    """
+    # Read the *head* of *file_name* once.  ISO-8859-1 decodes any byte sequence:
+    head_file: BinaryIO
+    with open(file_name, "rb") as head_file:
+        head: str = head_file.read(HEAD_SIZE).decode("iso-8859-1")
+
+    # Try the formats that handle the *file_name* suffix before the rest:
+    candidates: List[FileFormat] = [file_format for file_format in FORMATS
+                                    if file_name.endswith(file_format.suffixes)]
+    file_format: FileFormat
+    for file_format in candidates + [file_format for file_format in FORMATS
+                                     if file_format not in candidates]:
+        if file_format.signature_match(head):
+            return file_format
+    names: str = ", ".join(f"'{file_format.name}'" for file_format in candidates)
+    assert not candidates, f"File '{file_name}' is not in any of the known formats ({names})"
+    return None
+
+
+# file_format_records_read():
+def file_format_records_read(file_format: FileFormat, file_name: str,
+                             workers: int = 1) -> Iterator[ComponentRecord]:
+    """ Return an iterator over the component records that *file_format* reads from *file_name*.
+
+    When *workers* is more than 1 and *file_format* supports it, *file_name* is parsed in
+    chunks by that many worker processes.
+    """
+    chunked_read: Optional[Callable[[str, int], Iterator[ComponentRecord]]] = (
+        file_format.chunked_read)
+    if chunked_read is not None and workers > 1:
+        return chunked_read(file_name, workers)
+    return file_format.records_read(file_name)
+
+
+# file_records_iterate():
+def file_records_iterate(file_name: str, workers: int = 1) -> Optional[Iterator[ComponentRecord]]:
+    """ Return an iterator over the component records for *file_name*.
+
+    *None* is returned if *file_name* is not in a format that can be read.  See
+    *file_format_records_read*() for *workers*.
+    """
+    file_format: Optional[FileFormat] = file_format_find(file_name)
+    return (None if file_format is None
+            else file_format_records_read(file_format, file_name, workers))
+
+
+# file_records_read():
+def file_records_read(file_name: str, workers: int = 1) -> Optional[List[ComponentRecord]]:
+    """ Return the component records for *file_name* as a list.
+
+    *None* is returned if *file_name* is not in a format that can be read.  See
+    *file_format_records_read*() for *workers*.
+    """
+    records: Optional[Iterator[ComponentRecord]] = file_records_iterate(file_name, workers)
+    return None if records is None else list(records)
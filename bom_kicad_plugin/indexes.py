@@ -0,0 +1,171 @@
+# MIT License
+#
+# Copyright (c) 2019 Wayne C. Gramlich
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+# A *PosePartIndex* answers lookups over the pose parts of one project (i.e. one or more
+# imports into it) without scanning *bom.Project.all_pose_parts*.  It maps each reference
+# to its pose part and each part name and footprint to its references.  Range (e.g. `C1`
+# through `C999`) and prefix queries use two sorted lists of the references: one sorted
+# naturally (see *records.reference_key*()) and one sorted as plain text.  The sorted
+# lists are only rebuilt by the first query after pose parts are added, so an import pays
+# nothing for them.
+
+from bom_manager import bom
+from bom_kicad_plugin.records import ComponentRecord, reference_key
+import bisect
+import weakref
+from typing import Dict, Iterable, List, Optional, Tuple
+
+# A natural sort key as returned by *reference_key*():
+ReferenceKey = Tuple[Tuple[str, int], ...]
+
+
+# PosePartIndex:
+class PosePartIndex:
+    """ Lookup tables over pose parts keyed by reference, part name and footprint. """
+
+    # PosePartIndex.__init__():
+    def __init__(self) -> None:
+        # The pose part and record of each reference.  The pose parts are only held weakly
+        # (their project holds them), so that the index does not keep the project alive:
+        self.pose_parts: weakref.WeakValueDictionary[str, bom.PosePart] = (
+            weakref.WeakValueDictionary())
+        self.records: Dict[str, ComponentRecord] = dict()
+        # The references of each part name and footprint (in the order they were added):
+        self.part_references: Dict[str, List[str]] = dict()
+        self.footprint_references: Dict[str, List[str]] = dict()
+        # The sorted references (only valid when *sorted* is *True*):
+        self.sorted: bool = True
+        self.natural_keys: List[ReferenceKey] = list()
+        self.natural_references: List[str] = list()
+        self.text_references: List[str] = list()
+
+    # PosePartIndex.__len__():
+    def __len__(self) -> int:
+        pose_part_index: PosePartIndex = self
+        return len(pose_part_index.records)
+
+    # PosePartIndex.clear():
+    def clear(self) -> None:
+        """ Remove everything from *pose_part_index* (i.e. *self*.) """
+        pose_part_index: PosePartIndex = self
+        pose_part_index.pose_parts.clear()
+        pose_part_index.records.clear()
+        pose_part_index.part_references.clear()
+        pose_part_index.footprint_references.clear()
+        pose_part_index.sorted = False
+
+    # PosePartIndex.pose_parts_add():
+    def pose_parts_add(self, records: Iterable[ComponentRecord],
+                       pose_parts: Iterable[bom.PosePart]) -> None:
+        """ Add each of *pose_parts* along with the record that it was created from.
+
+        A reference that is already in the index is replaced (i.e. the last one wins.)
+        """
+        pose_part_index: PosePartIndex = self
+        pose_parts_table: weakref.WeakValueDictionary[str, bom.PosePart] = (
+            pose_part_index.pose_parts)
+        records_table: Dict[str, ComponentRecord] = pose_part_index.records
+        part_references: Dict[str, List[str]] = pose_part_index.part_references
+        footprint_references: Dict[str, List[str]] = pose_part_index.footprint_references
+        record: ComponentRecord
+        pose_part: bom.PosePart
+        for record, pose_part in zip(records, pose_parts):
+            reference: str = record.reference
+            previous_record: Optional[ComponentRecord] = records_table.get(reference)
+            if previous_record is not None:
+                part_references[previous_record.part_name].remove(reference)
+                footprint_references[previous_record.footprint].remove(reference)
+            pose_parts_table[reference] = pose_part
+            records_table[reference] = record
+            part_references.setdefault(record.part_name, []).append(reference)
+            footprint_references.setdefault(record.footprint, []).append(reference)
+        pose_part_index.sorted = False
+
+    # PosePartIndex.pose_part_find():
+    def pose_part_find(self, reference: str) -> Optional[bom.PosePart]:
+        """ Return the pose part for *reference* (or *None* if there is none.) """
+        pose_part_index: PosePartIndex = self
+        return pose_part_index.pose_parts.get(reference)
+
+    # PosePartIndex.record_find():
+    def record_find(self, reference: str) -> Optional[ComponentRecord]:
+        """ Return the record that the *reference* pose part was created from (or *None*.) """
+        pose_part_index: PosePartIndex = self
+        return pose_part_index.records.get(reference)
+
+    # PosePartIndex.part_references_find():
+    def part_references_find(self, part_name: str) -> List[str]:
+        """ Return the references that use *part_name*. """
+        pose_part_index: PosePartIndex = self
+        return list(pose_part_index.part_references.get(part_name, ()))
+
+    # PosePartIndex.footprint_references_find():
+    def footprint_references_find(self, footprint: str) -> List[str]:
+        """ Return the references that use *footprint* (`""` finds the unassigned ones.) """
+        pose_part_index: PosePartIndex = self
+        return list(pose_part_index.footprint_references.get(footprint, ()))
+
+    # PosePartIndex.references_range():
+    def references_range(self, first: str, last: str) -> List[str]:
+        """ Return the references from *first* through *last* in natural order.
+
+        The range is inclusive and compares references naturally, so `C1` through `C999`
+        includes `C10` but not `C1000` or `D1`.  Neither end has to be in the index.
+        """
+        pose_part_index: PosePartIndex = self
+        pose_part_index.sort()
+        natural_keys: List[ReferenceKey] = pose_part_index.natural_keys
+        start: int = bisect.bisect_left(natural_keys, reference_key(first))
+        end: int = bisect.bisect_right(natural_keys, reference_key(last))
+        return pose_part_index.natural_references[start:end]
+
+    # PosePartIndex.references_prefix():
+    def references_prefix(self, prefix: str) -> List[str]:
+        """ Return the references that start with *prefix* in natural order. """
+        pose_part_index: PosePartIndex = self
+        pose_part_index.sort()
+        # The references with *prefix* are next to each other when sorted as plain text:
+        text_references: List[str] = pose_part_index.text_references
+        start: int = bisect.bisect_left(text_references, prefix)
+        end: int = start
+        while end < len(text_references) and text_references[end].startswith(prefix):
+            end += 1
+        return sorted(text_references[start:end], key=reference_key)
+
+    # PosePartIndex.references_sorted():
+    def references_sorted(self) -> List[str]:
+        """ Return all of the references in natural order. """
+        pose_part_index: PosePartIndex = self
+        pose_part_index.sort()
+        return list(pose_part_index.natural_references)
+
+    # PosePartIndex.sort():
+    def sort(self) -> None:
+        """ Rebuild the sorted references if any pose parts were added since the last sort. """
+        pose_part_index: PosePartIndex = self
+        if not pose_part_index.sorted:
+            keyed: List[Tuple[ReferenceKey, str]] = sorted(
+                (reference_key(reference), reference) for reference in pose_part_index.records)
+            pose_part_index.natural_keys = [key for key, reference in keyed]
+            pose_part_index.natural_references = [reference for key, reference in keyed]
+            pose_part_index.text_references = sorted(pose_part_index.records)
+            pose_part_index.sorted = True
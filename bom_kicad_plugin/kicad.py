@@ -22,12 +22,26 @@
 
 from bom_manager import bom
 from bom_manager.tracing import trace, tracing_get
-import csv
+from bom_kicad_plugin import formats, readers
+from bom_kicad_plugin.records import ComponentRecord, part_name_split
+from bom_kicad_plugin.stats import (COMPONENT_WALK, FILE_IO, PARSE, POSE_PART_APPEND,
+                                    POSE_PART_CONSTRUCT, PROJECT_PART_FIND, ReadStats)
+import functools
 import os
-import re
-import sexpdata                 # type: ignore  # (LISP)S-EXPression DATA package
-from sexpdata import Symbol     # (LISP) S-expression Symobl
-from typing import Any, List, TextIO
+import time
+import weakref
+from typing import (TYPE_CHECKING, Callable, Dict, Iterable, Iterator, List, NamedTuple,
+                    Optional, Set, TextIO, Tuple, Union)
+
+# The rest of the plugin is imported the first time it is needed, so that *bom_manager*
+# plugin discovery (i.e. *cad_get*()) only pays for this module:
+if TYPE_CHECKING:  # pragma: no cover
+    import concurrent.futures
+    from bom_kicad_plugin import sexpression
+    from bom_kicad_plugin.cache import ComponentCache
+    from bom_kicad_plugin.columnar import ComponentTable
+    from bom_kicad_plugin.connectivity import Connectivity
+    from bom_kicad_plugin.indexes import PosePartIndex
 
 # cad_get():
 @trace(1)
@@ -37,6 +51,15 @@ def cad_get() -> "Kicad":
     return kicad
 
 
+# NetSnapshot:
+class NetSnapshot(NamedTuple):
+    """ The components of a net file as of the last time it was read into *project*. """
+
+    project: bom.Project
+    # Each component and its pose part keyed by component time stamp:
+    entries: Dict[str, Tuple["sexpression.NetComponent", bom.PosePart]]
+
+
 # Kicad:
 class Kicad(bom.Cad):
 
@@ -46,6 +69,51 @@ class Kicad(bom.Cad):
         # Initialize the super class of the *Kicad* object (i.e. *self*):
         super().__init__("Kicad")
 
+        # Footprint updating is currently disabled:
+        self.footprints_update: bool = False
+
+        # Set *footprints_patch* (along with *footprints_update*) to only splice the changed
+        # footprints into a net file rather than writing the whole file back out:
+        self.footprints_patch: bool = False
+
+        # Set *cache* to a *ComponentCache* to skip parsing of files that have not changed:
+        self.cache: Optional[ComponentCache] = None
+
+        # Set *stats_enabled* to collect a *ReadStats* for each read.  The last one is left
+        # in *read_stats* and each one is passed to *stats_hook* (if set) for exporting:
+        self.stats_enabled: bool = False
+        self.read_stats: Optional[ReadStats] = None
+        self.stats_hook: Optional[Callable[[ReadStats], None]] = None
+
+        # *files_read*() keeps going when a file can not be read.  The error of each such
+        # file (from the last call) is left in *read_errors* keyed by file name:
+        self.read_errors: Dict[str, str] = dict()
+
+        # Set *net_incremental* to only apply the changes when a net file is read again:
+        self.net_incremental: bool = False
+        self.net_snapshots: Dict[str, NetSnapshot] = dict()
+
+        # Set *net_workers* above 1 to have the reads split a large net file into chunks
+        # that are parsed by that many worker processes:
+        self.net_workers: int = 1
+
+        # Set *connectivity_enabled* to also extract the nets of each net file that is read.
+        # Each *Connectivity* is left in *connectivities* keyed by file name:
+        self.connectivity_enabled: bool = False
+        self.connectivities: Dict[str, Connectivity] = dict()
+
+        # Set *table* to a *ComponentTable* to also collect the records of each read in
+        # columnar form (footprint updating and incremental reads are not collected):
+        self.table: Optional[ComponentTable] = None
+
+        # Set *index_enabled* to index the pose parts of each read by reference, part name
+        # and footprint (footprint updating is not indexed).  Each project gets its own
+        # *PosePartIndex* in *indexes* (see *Kicad.index_get*()), which does not keep the
+        # project alive:
+        self.index_enabled: bool = False
+        self.indexes: weakref.WeakKeyDictionary[bom.Project, PosePartIndex] = (
+            weakref.WeakKeyDictionary())
+
     # Kicad.__str__():
     def __str__(self) -> str:
         return "Kicad('Kicad')"
@@ -53,386 +121,706 @@ class Kicad(bom.Cad):
     # Kicad.altium_csv_read():
     @trace(1)
     def altium_csv_read(self, csv_file_name: str, project: bom.Project) -> bool:
-        # ...
-        success: bool = False
-        csv_file: TextIO
-        tracing: str = tracing_get()
-        with open(csv_file_name, encoding="iso-8859-1") as csv_file:
-            csv_rows: List[List[str]] = list(csv.reader(csv_file, delimiter=",", quotechar='"'))
-            actual_headers: List[str] = csv_rows[0]
-            if True:
-                desired_headers: List[str] = [
-                    "Line #", "Name", "Description", "Designator", "Quantity", "TargetPrice",
-                    "Manufacturer 1", "Manufacturer Part Number 1", "Manufacturer Lifecycle 1",
-                    "Supplier 1", "Supplier Part Number 1", "Supplier Unit Price 1",
-                    "Supplier Subtotal 1"]
-                index: int
-                for index, desired_header in enumerate(desired_headers):
-                    assert desired_header == actual_headers[index], f"index={index}"
-                assert (actual_headers == desired_headers), (f"Got {actual_headers} "
-                                                             f"instead of {desired_headers}")
-                # project_parts = list()
-                row: List[str]
-                for index, row in enumerate(csv_rows[2:]):
-                    # Unpack *row* and further split and strip *refs_text* into *refs*:
-                    line_number: str
-                    name: str
-                    description: str
-                    designators_text: str
-                    quantity: str
-                    line_number, name, description, designators_text, quantity = row[:5]
-                    designators: List[str] = designators_text.split(",")
-                    designators = [designator.strip() for designator in designators]
-                    if tracing:
-                        print(f"{tracing}Row[{index}]: "
-                              f"{quantity}\t'{name}'\t{designators_text}")
-
-                    # Lookup/create the *project_part* associated with *value*:
-                    project_part: bom.ProjectPart = project.project_part_find(name)
-
-                    # Create one *pose_part* for each *reference* in *references*:
-                    for designator in designators:
-                        pose_part: bom.PosePart = bom.PosePart(project,
-                                                               project_part, designator, "")
-                        project.pose_part_append(pose_part)
-
-                    # Ignore footprints for now:
-                    success = True
-            else:
-                assert False, (f"Could not succesfully read '{csv_file_name}'")
+        # Read the records from *csv_file_name* and stuff them into *project*:
+        kicad: Kicad = self
+        stats: Optional[ReadStats] = kicad.stats_begin(csv_file_name)
+        count: int = kicad.records_apply(
+            kicad.table_records(readers.altium_csv_records_read(csv_file_name), csv_file_name),
+            project, stats)
+        kicad.stats_end(stats)
+        success: bool = count > 0
         return success
 
     # Kicad.csv_file_read():
     @trace(1)
     def bom_csv_grouped_by_value_with_fp_read(self, csv_file_name: str,
                                               project: bom.Project) -> bool:
-        # ...
-        success: bool = False
-        csv_file: TextIO
-        tracing: str = tracing_get()
-        with open(csv_file_name) as csv_file:
-            csv_rows = list(csv.reader(csv_file, delimiter=",", quotechar='"'))
-            assert csv_rows[0][0] == "Source:"
-            # source = csv_rows[0][1]
-            assert csv_rows[1][0] == "Date:"
-            # date = csv_rows[1],[1]
-            assert csv_rows[2][0] == "Tool:"
-            # tool = csv_rows[2][1]
-            assert csv_rows[3][0] == "Generator:"
-            generator = csv_rows[3][1]
-            assert csv_rows[4][0] == "Component Count:"
-            component_count = int(csv_rows[4][1])
-            headers = tuple(csv_rows[5])
-            if generator.endswith("bom_csv_grouped_by_value_with_fp.py"):
-                actual_headers = headers[0:7]
-                desired_headers = (
-                    "Ref", "Qnty", "Value", "Cmp name", "Footprint", "Description", "Vendor")
-                for index, desired_header in enumerate(desired_headers):
-                    assert desired_header == actual_headers[index], f"index={index}"
-                assert (actual_headers == desired_headers), (f"Got {actual_headers} "
-                                                             f"instead of {desired_headers}")
-                # project_parts = list()
-                for index, row in enumerate(csv_rows[6:6+component_count]):
-                    # Unpack *row* and further split and strip *refs_text* into *refs*:
-                    references_text, quantity, part_name, component_name, footprint = row[:5]
-                    references = references_text.split(",")
-                    references = [reference.strip() for reference in references]
-                    if tracing:
-                        print(f"{tracing}Row[{index}]: "
-                              f"{quantity}\t'{part_name}'\t{references_text}")
-
-                    # Strip *comment* out of *part_name* if it exists:
-                    comment = ""
-                    colon_index = part_name.find(':')
-                    if colon_index >= 0:
-                        comment = part_name[colon_index + 1:]
-                        part_name = part_name[0:colon_index]
-
-                    # Lookup/create the *project_part* associated with *value*:
-                    project_part = project.project_part_find(part_name)
-
-                    # Create one *pose_part* for each *reference* in *references*:
-                    for reference in references:
-                        pose_part = bom.PosePart(project, project_part, reference, comment)
-                        project.pose_part_append(pose_part)
-
-                    # Ignore footprints for now:
-                    success = True
-            else:
-                assert False, (f"File '{csv_file_name}' was generated using '{generator}' "
-                               "which is not supported yet.  Use "
-                               "'bom_csv_grouped_by_value_with_fp' generator instead.")
-
+        # Read the records from *csv_file_name* and stuff them into *project*:
+        kicad: Kicad = self
+        stats: Optional[ReadStats] = kicad.stats_begin(csv_file_name)
+        count: int = kicad.records_apply(
+            kicad.table_records(
+                readers.bom_csv_grouped_by_value_with_fp_records_read(csv_file_name),
+                csv_file_name),
+            project, stats)
+        kicad.stats_end(stats)
+        success: bool = count > 0
         return success
 
     # Kicad.file_read():
     @trace(1)
     def file_read(self, file_name: str, project: bom.Project) -> bool:
-        # Dispatach on the *file_name* suffix:
+        # Dispatch on the format of *file_name*:
         kicad: Kicad = self
         success: bool = False
         assert os.path.isfile(file_name), f"File '{file_name}' does not exist"
+        if kicad.connectivity_enabled and file_name.endswith(".net"):
+            kicad.net_file_connectivity_read(file_name)
         if file_name.endswith(".cmp"):
             # success = kicad.cmp_file_read(file_name, project)
             assert False, ".cmp files are no longer supported."
-        elif file_name.endswith(".csv"):
-            try:
-                success = kicad.altium_csv_read(file_name, project)
-            except AssertionError:
-                try:
-                    success = kicad.bom_csv_grouped_by_value_with_fp_read(file_name, project)
-                except AssertionError:
-                    success = False
-        elif file_name.endswith(".net"):
+        elif kicad.file_read_direct(file_name):
+            # Footprint updating rewrites *file_name* and incremental reading keeps its own
+            # state, so neither of them goes through the cache:
             success = kicad.net_file_read(file_name, project)
+        else:
+            # Try to get the records from *cache* first; otherwise read them in:
+            stats: Optional[ReadStats] = kicad.stats_begin(file_name)
+            cache: Optional[ComponentCache] = (
+                kicad.cache if formats.file_cacheable(file_name) else None)
+            records: Optional[Iterable[ComponentRecord]] = None
+            start: float = time.perf_counter()
+            if cache is not None:
+                records = cache.lookup(file_name)
+            if records is None:
+                file_format: Optional[formats.FileFormat] = formats.file_format_find(file_name)
+                if stats is not None:
+                    stats.add(FILE_IO, time.perf_counter() - start)
+                    start = time.perf_counter()
+                if file_format is not None:
+                    records = formats.file_format_records_read(file_format, file_name,
+                                                               kicad.net_workers)
+                    if cache is not None:
+                        # The cache needs all of the records; otherwise they are streamed
+                        # straight into *project*:
+                        records = list(records)
+                        if stats is not None:
+                            stats.add(PARSE, time.perf_counter() - start)
+                            start = time.perf_counter()
+                        cache.store(file_name, records)
+            # Streamed records are parsed (and timed) by *records_apply*(), so only the cache
+            # I/O is left to account for here:
+            if stats is not None and cache is not None:
+                stats.add(FILE_IO, time.perf_counter() - start)
+
+            success = kicad.file_records_apply(file_name, records, project, stats)
+            kicad.stats_end(stats)
 
         return success
 
+    # Kicad.file_read_direct():
+    def file_read_direct(self, file_name: str) -> bool:
+        """ Return *True* if *file_name* must be read by its own method and not by records. """
+        kicad: Kicad = self
+        return file_name.endswith(".cmp") or (file_name.endswith(".net") and
+                                              (kicad.footprints_update or kicad.net_incremental))
+
+    # Kicad.file_records_get():
+    def file_records_get(self, file_name: str) -> Optional[List[ComponentRecord]]:
+        """ Return all of the records of *file_name* (from *cache* when possible.)
+
+        *None* is returned if *file_name* is not in a format that can be read.
+        """
+        kicad: Kicad = self
+        cache: Optional[ComponentCache] = (
+            kicad.cache if formats.file_cacheable(file_name) else None)
+        records: Optional[List[ComponentRecord]] = (
+            None if cache is None else cache.lookup(file_name))
+        if records is None:
+            records = formats.file_records_read(file_name, kicad.net_workers)
+            if cache is not None and records is not None:
+                cache.store(file_name, records)
+        return records
+
+    # Kicad.file_records_apply():
+    def file_records_apply(self, file_name: str, records: Optional[Iterable[ComponentRecord]],
+                           project: bom.Project, stats: Optional[ReadStats] = None) -> bool:
+        """ Stuff the *records* read from *file_name* into *project*. """
+        kicad: Kicad = self
+        success: bool = False
+        if records is not None:
+            if file_name.endswith(".net"):
+                # Prevent accidental double of *project*:
+                assert len(project.all_pose_parts) == 0
+            count: int = kicad.records_apply(kicad.table_records(records, file_name),
+                                             project, stats)
+            success = count > 0 or file_name.endswith(".net")
+        return success
+
+    # Kicad.files_read():
+    @trace(1)
+    def files_read(self, file_names: List[str], project_factory: Callable[[str], bom.Project],
+                   workers: Optional[int] = None) -> List[bool]:
+        """ Read each file in *file_names* into the project that *project_factory* returns.
+
+        The files are parsed by a pool of *workers* processes (the CPU count by default.)
+        The records come back to this process and are stuffed into the projects in
+        *file_names* order, so the result is the same as calling *Kicad.file_read*()
+        on each file in turn.  The success of each file read is returned.  A file that can
+        not be read is not successful and its error is left in *read_errors*.
+        """
+        # Files that are not simply parsed (or are already cached) are not sent to the pool:
+        kicad: Kicad = self
+        cache: Optional[ComponentCache] = kicad.cache
+        records_table: Dict[int, List[ComponentRecord]] = dict()
+        pool_indices: List[int] = list()
+        index: int
+        file_name: str
+        for index, file_name in enumerate(file_names):
+            assert os.path.isfile(file_name), f"File '{file_name}' does not exist"
+            if kicad.file_read_direct(file_name):
+                continue
+            records: Optional[List[ComponentRecord]] = (
+                cache.lookup(file_name)
+                if cache is not None and formats.file_cacheable(file_name) else None)
+            if records is None:
+                pool_indices.append(index)
+            else:
+                records_table[index] = records
+
+        # Parse the remaining files in parallel.  A file parsed in this process can still be
+        # split up among *net_workers* processes (a worker process never splits its file up):
+        records_read: Callable[[str], Optional[List[ComponentRecord]]] = functools.partial(
+            formats.file_records_read, workers=kicad.net_workers)
+        futures: Dict[int, concurrent.futures.Future] = dict()
+        executor: Optional[concurrent.futures.ProcessPoolExecutor] = None
+        if workers != 1 and len(pool_indices) > 1:
+            import concurrent.futures
+            executor = concurrent.futures.ProcessPoolExecutor(max_workers=workers)
+            futures = {index: executor.submit(records_read, file_names[index])
+                       for index in pool_indices}
+
+        # Now visit each file in order and stuff its records into its project.  A file that
+        # fails does not stop the rest of the batch; its error is left in *read_errors*:
+        kicad.read_errors = dict()
+        successes: List[bool] = list()
+        future: Optional[concurrent.futures.Future]
+        try:
+            for index, file_name in enumerate(file_names):
+                project: bom.Project = project_factory(file_name)
+                success: bool = False
+                try:
+                    if kicad.file_read_direct(file_name):
+                        success = kicad.file_read(file_name, project)
+                    else:
+                        if kicad.connectivity_enabled and file_name.endswith(".net"):
+                            kicad.net_file_connectivity_read(file_name)
+                        stats: Optional[ReadStats] = kicad.stats_begin(file_name)
+                        records = records_table.pop(index, None)
+                        if records is None:
+                            future = futures.pop(index, None)
+                            records = (records_read(file_name) if future is None
+                                       else future.result())
+                            if cache is not None and records is not None and \
+                               formats.file_cacheable(file_name):
+                                start: float = time.perf_counter()
+                                cache.store(file_name, records)
+                                if stats is not None:
+                                    stats.add(FILE_IO, time.perf_counter() - start)
+                        success = kicad.file_records_apply(file_name, records, project, stats)
+                        kicad.stats_end(stats)
+                except Exception as error:
+                    kicad.read_errors[file_name] = str(error) or type(error).__name__
+                successes.append(success)
+        finally:
+            if executor is not None:
+                executor.shutdown()
+        return successes
+
     # Kicad.net_file_read():
     @trace(1)
     def net_file_read(self, net_file_name: str, project: bom.Project) -> bool:
         """ Read in net file for the project object.
         """
+        # Incremental reading is allowed to read into the same *project* again:
+        kicad: Kicad = self
+        if kicad.net_incremental:
+            return kicad.net_file_incremental_read(net_file_name, project)
+
         # Prevent accidental double of *project* (i.e. *self*):
-        # kicad = self
         pose_parts: List[bom.PosePart] = project.all_pose_parts
         assert len(pose_parts) == 0
 
+        # Footprint updating needs the entire S-expression tree in memory.  It is not
+        # indexed, so any index of *project* would go stale:
+        if kicad.footprints_update:
+            kicad.index_drop(project)
+            if kicad.footprints_patch:
+                return kicad.net_file_footprints_patch(net_file_name, project)
+            return kicad.net_file_footprints_update(net_file_name, project)
+
+        # Stream the components out of *net_file_name*.  Nothing else in the file is built:
+        stats: Optional[ReadStats] = kicad.stats_begin(net_file_name)
+        kicad.records_apply(
+            kicad.table_records(readers.net_file_records_read(net_file_name, kicad.net_workers),
+                                net_file_name),
+            project, stats)
+        kicad.stats_end(stats)
+        return True
+
+    # Kicad.net_file_incremental_read():
+    @trace(1)
+    def net_file_incremental_read(self, net_file_name: str, project: bom.Project) -> bool:
+        """ Read in net file for the project object, only applying what changed.
+
+        The components of each net file are remembered (by time stamp) in *net_snapshots*.
+        When the same net file is read into the same *project* again, only the components
+        that were added or changed (reference, value, or footprint) since the last read get
+        new pose parts.  If anything changed, the pose parts of *project* are put back in
+        file order, so *project* ends up the same as it would after a fresh read.
+        """
+        from bom_kicad_plugin import netscan
+        # Grab the previous *snapshot* for *net_file_name* (if any):
+        kicad: Kicad = self
+        tracing: str = tracing_get()
+        path: str = os.path.abspath(net_file_name)
+        snapshot: Optional[NetSnapshot] = kicad.net_snapshots.get(path)
+        previous_entries: Dict[str, Tuple[sexpression.NetComponent, bom.PosePart]] = dict()
+        if snapshot is not None and snapshot.project is project:
+            previous_entries = snapshot.entries
+        else:
+            # Prevent accidental double of *project*:
+            assert len(project.all_pose_parts) == 0
+
+        # Read in the current *components* keyed by time stamp.  A component without a time
+        # stamp (or with a duplicate one) is keyed by its reference instead:
+        components: Dict[str, sexpression.NetComponent] = dict()
+        component: sexpression.NetComponent
+        for component in netscan.components_scan(net_file_name):
+            key: str = component.tstamp
+            if key == "" or key in components:
+                key = "ref:" + component.reference
+            assert key not in components, (f"Duplicate reference '{component.reference}' "
+                                           f"in '{net_file_name}'")
+            components[key] = component
+
+        # Build the pose parts in file order.  The pose part of an unchanged component is
+        # reused and each distinct part name is only looked up once:
+        entries: Dict[str, Tuple[sexpression.NetComponent, bom.PosePart]] = dict()
+        project_parts: Dict[str, bom.ProjectPart] = dict()
+        pose_parts: List[bom.PosePart] = list()
+        added_count: int = 0
+        changed_count: int = 0
+        for key, component in components.items():
+            entry: Optional[Tuple[sexpression.NetComponent,
+                                  bom.PosePart]] = previous_entries.get(key)
+            if entry is None or entry[0] != component:
+                if entry is None:
+                    added_count += 1
+                else:
+                    changed_count += 1
+                part_name: str
+                comment: str
+                part_name, comment = part_name_split(component.value)
+                project_part: Optional[bom.ProjectPart] = project_parts.get(part_name)
+                if project_part is None:
+                    project_part = project.project_part_find(part_name)
+                    project_parts[part_name] = project_part
+                entry = (component, bom.PosePart(project, project_part,
+                                                 component.reference, comment))
+            entries[key] = entry
+            pose_parts.append(entry[1])
+        removed_count: int = len(previous_entries) - (len(entries) - added_count)
+        if tracing:
+            print(f"{tracing}'{net_file_name}': {added_count} added, "
+                  f"{removed_count} removed, {changed_count} changed")
+
+        # *bom.Project* can only append pose parts, so when anything changed the pose parts
+        # of the previous read are taken back out of *all_pose_parts* (the list that
+        # *bom.Project.pose_part_append*() appends to) and all of the pose parts of this
+        # read are appended again in file order.  Any other pose parts of *project* are
+        # left alone, so *project* ends up just as if *net_file_name* was read afresh:
+        if added_count or removed_count or changed_count:
+            if previous_entries:
+                previous_pose_parts: Set[int] = {id(previous_entry[1])
+                                                 for previous_entry in previous_entries.values()}
+                project.all_pose_parts[:] = [pose_part for pose_part in project.all_pose_parts
+                                             if id(pose_part) not in previous_pose_parts]
+            Kicad.pose_parts_append(project, pose_parts)
+
+            # The index of *project* is stale now, so it is built again from scratch:
+            kicad.index_drop(project)
+            index: Optional[PosePartIndex] = kicad.index_get(project)
+            if index is not None:
+                index.pose_parts_add([ComponentRecord(component.reference,
+                                                      *part_name_split(component.value),
+                                                      component.footprint)
+                                      for component, pose_part in entries.values()],
+                                     pose_parts)
+
+        kicad.net_snapshots[path] = NetSnapshot(project, entries)
+        return True
+
+    # Kicad.net_file_connectivity_read():
+    @trace(1)
+    def net_file_connectivity_read(self, net_file_name: str) -> "Connectivity":
+        """ Return the *Connectivity* of the nets of *net_file_name*.
+
+        The result is also left in *connectivities* under *net_file_name*.
+        """
+        from bom_kicad_plugin.connectivity import connectivity_read
+        kicad: Kicad = self
+        connectivity: Connectivity = connectivity_read(net_file_name)
+        kicad.connectivities[net_file_name] = connectivity
+        return connectivity
+
+    # Kicad.net_file_footprints_update():
+    @trace(1)
+    def net_file_footprints_update(self, net_file_name: str, project: bom.Project) -> bool:
+        """ Read in net file for the project object and update its footprints.
+        """
+        from bom_kicad_plugin import sexpression
         # Process *net_file_name* adding footprints as needed:
         success: bool = False
         # errors = 0
         tracing: str = tracing_get()
         net_file: TextIO
         with open(net_file_name, "r") as net_file:
-            # Read contents of *net_file_name* in as a string *net_text*:
-            net_text: str = net_file.read()
-            if tracing:
-                print(f"{tracing}Read in file '{net_file_name}'")
-
-            # Parse *net_text* into *net_se* (i.e. net S-expression):
-            net_se: List[Any] = sexpdata.loads(net_text)
-            # print("\nsexpedata.dumps=", sexpdata.dumps(net_se))
-            # print("")
-            # print("net_se=", net_se)
-            # print("")
-
-            # Visit each *component_se* in *net_se*:
-            net_file_changed = False
-            components_se: List[Any] = Kicad.se_find(net_se, "export", "components")
-
-            # Each component has the following form:
-            #
-            #        (comp
-            #          (ref SW123)
-            #          (footprint nickname:NAME)              # May not be present
-            #          (libsource ....)
-            #          (sheetpath ....)
-            #          (tstamp xxxxxxxx))
-            # print("components=", components_se)
-            component_index: int
-            component_se: List[Any]
-            for component_index, component_se in enumerate(components_se[1:]):
-                # print("component_se=", component_se)
-                # print("")
-
-                # Grab the *reference* from *component_se*:
-                reference_se: List[Any] = Kicad.se_find(component_se, "comp", "ref")
-                reference: Any = reference_se[1].value()
-                # print("reference_se=", reference_se)
-                # print("")
-
-                # Find *part_name_se* from *component_se*:
-                part_name_se: List[Any] = Kicad.se_find(component_se, "comp", "value")
-
-                # Suprisingly tedious, extract *part_name* as a string:
-                part_name: str = "??"
-                if isinstance(part_name_se[1], Symbol):
-                    part_name = part_name_se[1].value()
-                elif isinstance(part_name_se[1], int):
-                    part_name = str(part_name_se[1])
-                elif isinstance(part_name_se[1], float):
-                    part_name = str(part_name_se[1])
-                elif isinstance(part_name_se[1], str):
-                    part_name = part_name_se[1]
-                else:
-                    assert False, "strange part_name: {0}". \
-                      format(part_name_se[1])
-
-                # Strip *comment* out of *part_name* if it exists:
-                comment: str = ""
-                colon_index: int = part_name.find(':')
-                if colon_index >= 0:
-                    comment = part_name[colon_index + 1:]
-                    part_name = part_name[0:colon_index]
-
-                # Now see if we have a match for *part_name* in *database*:
-                project_part: bom.ProjectPart = project.project_part_find(part_name)
-
-                # We have a match; create the *pose_part*:
-                pose_part: bom.PosePart = bom.PosePart(project, project_part, reference, comment)
-                project.pose_part_append(pose_part)
-
-                # Ignore footprints for now:
-                if False:
-                    # Grab *kicad_footprint* from *project_part*:
-                    kicad_footprint = project_part.kicad_footprint
-                    assert isinstance(kicad_footprint, str)
-
-                    # Grab *footprint_se* from *component_se* (if it exists):
-                    footprint_se = Kicad.se_find(component_se, "comp", "footprint")
-                    # print("footprint_se=", footprint_se)
-                    # print("Part[{0}]:'{1}' '{2}' changed={3}".format(
-                    #    component_index, part_name, kicad_footprint, net_file_changed))
-
-                    # Either add or update the footprint:
-                    if footprint_se is None:
-                        # No footprint in the .net file; just add one:
-                        component_se.append(
-                          [Symbol("footprint"), Symbol("common:" + kicad_footprint)])
-                        print("Part {0}: Adding binding to footprint '{1}'".
-                              format(part_name, kicad_footprint))
-                        net_file_changed = True
-                    else:
-                        # We have a footprint in .net file:
-                        previous_footprint = footprint_se[1].value()
-                        previous_split = previous_footprint.split(':')
-                        current_split = kicad_footprint.split(':')
-                        assert len(previous_split) > 0
-                        assert len(current_split) > 0
-                        if len(current_split) == 2:
-                            # *kicad_footprint* has an explicit library,
-                            # so we can just use it and ignore
-                            # *previous_footprint*:
-                            new_footprint = kicad_footprint
-                        elif len(current_split) == 1 and len(previous_split) == 2:
-                            # *kicad_footprint* does not specify a library,
-                            # but the *previous_footprint* does.  We build
-                            # *new_foot_print* using the *previous_footprint*
-                            # library and the rest from *kicad_footprint*:
-                            new_footprint = \
-                              previous_split[0] + ":" + kicad_footprint
-                            # print("new_footprint='{0}'".format(new_footprint))
-                        elif len(current_split) == 1:
-                            new_footprint = "common:" + kicad_footprint
-                        else:
-                            assert False, ("previous_slit={0} current_split={1}".
-                                           format(previous_split, current_split))
-
-                        # Only do something if it changed:
-                        if previous_footprint != new_footprint:
-                            # Since they changed, update in place:
-                            # if isinstance(project_part, AliasPart):
-                            #        print("**AliasPart.footprint={0}".
-                            #          format(project_part.kicad_footprint))
-                            print("Part '{0}': Footprint changed from '{1}' to '{2}'".
-                                  format(part_name, previous_footprint, new_footprint))
-                            footprint_se[1] = Symbol(new_footprint)
-                            net_file_changed = True
-
-            success = True
-
-            # Write out updated *net_file_name* if *net_file_changed*:
-            if net_file_changed:
-                print("Updating '{0}' with new footprints".
-                      format(net_file_name))
-                with open(net_file_name, "w") as net_file:
-                    # sexpdata.dump(net_se, net_file)
-                    net_se_string = sexpdata.dumps(net_se)
-                    # sexpdata.dump(net_se, net_file)
-
-                    # Now use some regular expressions to improve formatting to be more like
-                    # what KiCad outputs:
-                    net_se_string = re.sub(" \\(design ",
-                                           "\n  (design ", net_se_string)
-
-                    # Sheet part of file:
-                    net_se_string = re.sub(" \\(sheet ",
-                                           "\n    (sheet ", net_se_string)
-                    net_se_string = re.sub(" \\(title_block ",
-                                           "\n      (title_block ", net_se_string)
-                    net_se_string = re.sub(" \\(title ",
-                                           "\n        (title ", net_se_string)
-                    net_se_string = re.sub(" \\(company ",
-                                           "\n        (company ", net_se_string)
-                    net_se_string = re.sub(" \\(rev ",
-                                           "\n        (rev ", net_se_string)
-                    net_se_string = re.sub(" \\(date ",
-                                           "\n        (date ", net_se_string)
-                    net_se_string = re.sub(" \\(source ",
-                                           "\n        (source ", net_se_string)
-                    net_se_string = re.sub(" \\(comment ",
-                                           "\n        (comment ", net_se_string)
-
-                # Components part of file:
-                net_se_string = re.sub(" \\(components ",
-                                       "\n  (components ", net_se_string)
-                net_se_string = re.sub(" \\(comp ",
-                                       "\n    (comp ", net_se_string)
-                net_se_string = re.sub(" \\(value ",
-                                       "\n      (value ", net_se_string)
-                net_se_string = re.sub(" \\(footprint ",
-                                       "\n      (footprint ", net_se_string)
-                net_se_string = re.sub(" \\(libsource ",
-                                       "\n      (libsource ", net_se_string)
-                net_se_string = re.sub(" \\(sheetpath ",
-                                       "\n      (sheetpath ", net_se_string)
-                net_se_string = re.sub(" \\(path ",
-                                       "\n      (path ", net_se_string)
-                net_se_string = re.sub(" \\(tstamp ",
-                                       "\n      (tstamp ", net_se_string)
-
-                # Library parts part of file
-                net_se_string = re.sub(" \\(libparts ",
-                                       "\n  (libparts ", net_se_string)
-                net_se_string = re.sub(" \\(libpart ",
-                                       "\n    (libpart ", net_se_string)
-                net_se_string = re.sub(" \\(description ",
-                                       "\n      (description ",  net_se_string)
-                net_se_string = re.sub(" \\(fields ",
-                                       "\n      (fields ",  net_se_string)
-                net_se_string = re.sub(" \\(field ",
-                                       "\n        (field ", net_se_string)
-                net_se_string = re.sub(" \\(pins ",
-                                       "\n      (pins ", net_se_string)
-                # net_se_string = re.sub(" \\(pin ",
-                #                        "\n        (pin ", net_se_string)
-
-                # Network portion of file:
-                net_se_string = re.sub(" \\(nets ", "\n  (nets ", net_se_string)
-                net_se_string = re.sub(" \\(net ",  "\n    (net ", net_se_string)
-                net_se_string = re.sub(" \\(node ", "\n      (node ", net_se_string)
-
-                # General substitutions:
-                # net_se_string = re.sub(" \\;", ";", net_se_string)
-                # net_se_string = re.sub(" \\.", ".", net_se_string)
-
-                net_file.write(net_se_string)
+            # Parse *net_file* into *net_se* (i.e. net S-expression):
+            net_se: sexpression.SENode = sexpression.tree_read(net_file)
+        if tracing:
+            print(f"{tracing}Read in file '{net_file_name}'")
+
+        # Visit each *component_se* in *net_se*:
+        net_file_changed = False
+        components_se: Optional[sexpression.SENode] = Kicad.se_find(net_se, "export",
+                                                                    "components")
+        assert components_se is not None, f"'{net_file_name}' has no components"
+
+        # Each component has the following form:
+        #
+        #        (comp
+        #          (ref SW123)
+        #          (footprint nickname:NAME)              # May not be present
+        #          (libsource ....)
+        #          (sheetpath ....)
+        #          (tstamp xxxxxxxx))
+        component_se: sexpression.SENode
+        for component_se in components_se.children("comp"):
+            # Grab the *reference* from *component_se*:
+            reference_se: Optional[sexpression.SENode] = Kicad.se_find(component_se,
+                                                                        "comp", "ref")
+            assert reference_se is not None and len(reference_se) > 1
+            reference_atom: Union[sexpression.SENode, str] = reference_se[1]
+            assert isinstance(reference_atom, str), f"strange reference: {reference_atom}"
+            reference: str = sexpression.atom_text(reference_atom)
+
+            # Find *part_name_se* from *component_se* and extract *part_name* as a string:
+            part_name_se: Optional[sexpression.SENode] = Kicad.se_find(component_se,
+                                                                        "comp", "value")
+            assert part_name_se is not None and len(part_name_se) > 1
+            assert isinstance(part_name_se[1], str), f"strange part_name: {part_name_se[1]}"
+            part_name: str = sexpression.atom_value_text(part_name_se[1])
+
+            # Strip *comment* out of *part_name* if it exists:
+            comment: str
+            part_name, comment = part_name_split(part_name)
+
+            # Now see if we have a match for *part_name* in *database*:
+            project_part: bom.ProjectPart = project.project_part_find(part_name)
+
+            # We have a match; create the *pose_part*:
+            pose_part: bom.PosePart = bom.PosePart(project, project_part, reference, comment)
+            project.pose_part_append(pose_part)
+
+            # Grab *kicad_footprint* from *project_part*:
+            kicad_footprint = project_part.kicad_footprint
+            assert isinstance(kicad_footprint, str)
+
+            # Grab *footprint_se* from *component_se* (if it exists):
+            footprint_se: Optional[sexpression.SENode] = Kicad.se_find(component_se,
+                                                                        "comp", "footprint")
+            # print("footprint_se=", footprint_se)
+            # print("Part[{0}]:'{1}' '{2}' changed={3}".format(
+            #    component_index, part_name, kicad_footprint, net_file_changed))
+
+            # Either add or update the footprint:
+            if footprint_se is None:
+                # No footprint in the .net file; just add one:
+                # Quote it if the reference is quoted (i.e. the way KiCad 6 would):
+                component_se.append(sexpression.SENode(
+                  ["footprint", sexpression.atom_token("common:" + kicad_footprint,
+                                                       reference_atom.startswith('"'))]))
+                print("Part {0}: Adding binding to footprint '{1}'".
+                      format(part_name, kicad_footprint))
+                net_file_changed = True
+            else:
+                # We have a footprint in .net file:
+                footprint_atom: Union[sexpression.SENode, str] = footprint_se[1]
+                assert isinstance(footprint_atom, str), f"strange footprint: {footprint_atom}"
+                previous_footprint = sexpression.atom_text(footprint_atom)
+                new_footprint = Kicad.footprint_new(previous_footprint, kicad_footprint)
+
+                # Only do something if it changed:
+                if previous_footprint != new_footprint:
+                    # Since they changed, update in place:
+                    # if isinstance(project_part, AliasPart):
+                    #        print("**AliasPart.footprint={0}".
+                    #          format(project_part.kicad_footprint))
+                    print("Part '{0}': Footprint changed from '{1}' to '{2}'".
+                          format(part_name, previous_footprint, new_footprint))
+                    footprint_se[1] = sexpression.atom_token(new_footprint,
+                                                             footprint_atom.startswith('"'))
+                    net_file_changed = True
+
+        success = True
+
+        # Write out updated *net_file_name* if *net_file_changed*:
+        if net_file_changed:
+            print("Updating '{0}' with new footprints".
+                  format(net_file_name))
+            sexpression.tree_file_write(net_se, net_file_name, sexpression.KICAD_NET_INDENTS)
 
         return success
 
+    # Kicad.net_file_footprints_patch():
+    @trace(1)
+    def net_file_footprints_patch(self, net_file_name: str, project: bom.Project) -> bool:
+        """ Read in net file for the project object and patch its footprints in place.
+
+        This does the same thing as *net_file_footprints_update*() except that only the
+        changed footprints are spliced into *net_file_name*; every other byte of the file
+        is copied through unchanged.
+        """
+        from bom_kicad_plugin import netscan, sexpression
+        # Each patch is the *start* and *end* byte offsets to replace and the new bytes:
+        patches: List[Tuple[int, int, bytes]] = list()
+        component_span: netscan.ComponentSpan
+        for component_span in netscan.component_spans_file_scan(net_file_name):
+            # Strip *comment* out of *part_name* if it exists:
+            component: sexpression.NetComponent = component_span.component
+            part_name: str
+            comment: str
+            part_name, comment = part_name_split(component.value)
+
+            # Now see if we have a match for *part_name* in *database*:
+            project_part: bom.ProjectPart = project.project_part_find(part_name)
+            pose_part: bom.PosePart = bom.PosePart(project, project_part,
+                                                   component.reference, comment)
+            project.pose_part_append(pose_part)
+            kicad_footprint = project_part.kicad_footprint
+            assert isinstance(kicad_footprint, str)
+
+            # Either add or update the footprint:
+            new_footprint: str
+            if component_span.footprint_start < 0:
+                # No footprint in the .net file; insert one before the `)`:
+                new_footprint = "common:" + kicad_footprint
+                print("Part {0}: Adding binding to footprint '{1}'".
+                      format(part_name, kicad_footprint))
+                indent: str = " " * sexpression.KICAD_NET_INDENTS["footprint"]
+                footprint_token: str = sexpression.atom_token(new_footprint,
+                                                              component_span.quoted)
+                footprint_text: str = f"\n{indent}(footprint {footprint_token})"
+                patches.append((component_span.close, component_span.close,
+                                footprint_text.encode(netscan.ENCODING)))
+            else:
+                previous_footprint: str = component.footprint
+                new_footprint = Kicad.footprint_new(previous_footprint, kicad_footprint)
+                if previous_footprint != new_footprint:
+                    print("Part '{0}': Footprint changed from '{1}' to '{2}'".
+                          format(part_name, previous_footprint, new_footprint))
+                    patches.append((component_span.footprint_start,
+                                    component_span.footprint_end,
+                                    sexpression.atom_token(new_footprint,
+                                                           component_span.quoted).
+                                    encode(netscan.ENCODING)))
+
+        # Splice *patches* into *net_file_name* if any footprints changed:
+        if patches:
+            print("Updating '{0}' with new footprints".format(net_file_name))
+            netscan.file_patch(net_file_name, patches)
+        return True
+
+    # Kicad.footprint_new():
+    @staticmethod
+    def footprint_new(previous_footprint: str, kicad_footprint: str) -> str:
+        """ Return the footprint that replaces *previous_footprint* for *kicad_footprint*. """
+        previous_split: List[str] = previous_footprint.split(':')
+        current_split: List[str] = kicad_footprint.split(':')
+        assert len(previous_split) > 0
+        assert len(current_split) > 0
+        new_footprint: str
+        if len(current_split) == 2:
+            # *kicad_footprint* has an explicit library,
+            # so we can just use it and ignore
+            # *previous_footprint*:
+            new_footprint = kicad_footprint
+        elif len(current_split) == 1 and len(previous_split) == 2:
+            # *kicad_footprint* does not specify a library,
+            # but the *previous_footprint* does.  We build
+            # *new_foot_print* using the *previous_footprint*
+            # library and the rest from *kicad_footprint*:
+            new_footprint = previous_split[0] + ":" + kicad_footprint
+        elif len(current_split) == 1:
+            new_footprint = "common:" + kicad_footprint
+        else:
+            assert False, ("previous_slit={0} current_split={1}".
+                           format(previous_split, current_split))
+        return new_footprint
+
+    # Kicad.index_get():
+    def index_get(self, project: bom.Project) -> "Optional[PosePartIndex]":
+        """ Return the *PosePartIndex* of *project* (or *None* if indexing is not enabled.)
+
+        The index is created the first time it is asked for, so that the same reference in
+        two projects never ends up in the same index.
+        """
+        kicad: Kicad = self
+        if not kicad.index_enabled:
+            return None
+        indexes: weakref.WeakKeyDictionary[bom.Project, PosePartIndex] = kicad.indexes
+        index: Optional[PosePartIndex] = indexes.get(project)
+        if index is None:
+            from bom_kicad_plugin.indexes import PosePartIndex
+            index = PosePartIndex()
+            indexes[project] = index
+        return index
+
+    # Kicad.index_drop():
+    def index_drop(self, project: bom.Project) -> None:
+        """ Forget the *PosePartIndex* of *project* because its pose parts changed. """
+        kicad: Kicad = self
+        kicad.indexes.pop(project, None)
+
+    # Kicad.records_apply():
+    @trace(1)
+    def records_apply(self, records: Iterable[ComponentRecord], project: bom.Project,
+                      stats: Optional[ReadStats] = None) -> int:
+        """ Create a *bom.PosePart* in *project* for each record and return the count. """
+        kicad: Kicad = self
+        if stats is not None:
+            return kicad.records_apply_measured(records, project, stats)
+
+        # *index* needs the records again once the pose parts are made:
+        index: Optional[PosePartIndex] = kicad.index_get(project)
+        if index is not None:
+            records = list(records)
+
+        # Each distinct part name is only looked up once per read:
+        project_parts: Dict[str, bom.ProjectPart] = dict()
+        pose_parts: List[bom.PosePart] = list()
+        pose_parts_append: Callable[[bom.PosePart], None] = pose_parts.append
+        record: ComponentRecord
+        for record in records:
+            # Lookup/create the *project_part* associated with the record part name:
+            part_name: str = record.part_name
+            project_part: Optional[bom.ProjectPart] = project_parts.get(part_name)
+            if project_part is None:
+                project_part = project.project_part_find(part_name)
+                project_parts[part_name] = project_part
+
+            # Create the *pose_part*:
+            pose_parts_append(bom.PosePart(project, project_part,
+                                           record.reference, record.comment))
+
+        # Stuff all of the *pose_parts* into *project* at once:
+        Kicad.pose_parts_append(project, pose_parts)
+        if index is not None:
+            index.pose_parts_add(records, pose_parts)
+        return len(pose_parts)
+
+    # Kicad.records_apply_measured():
+    def records_apply_measured(self, records: Iterable[ComponentRecord], project: bom.Project,
+                               stats: ReadStats) -> int:
+        """ Do what *Kicad.records_apply*() does while timing each step into *stats*. """
+        kicad: Kicad = self
+        index: Optional[PosePartIndex] = kicad.index_get(project)
+        indexed_records: List[ComponentRecord] = list()
+        perf_counter: Callable[[], float] = time.perf_counter
+        parse_seconds: float = 0.0
+        find_seconds: float = 0.0
+        find_count: int = 0
+        construct_seconds: float = 0.0
+        project_parts: Dict[str, bom.ProjectPart] = dict()
+        pose_parts: List[bom.PosePart] = list()
+        records_iterator: Iterator[ComponentRecord] = iter(records)
+        loop_start: float = perf_counter()
+        while True:
+            # Reading a record may well parse more of the file:
+            start: float = perf_counter()
+            record: Optional[ComponentRecord] = next(records_iterator, None)
+            end: float = perf_counter()
+            parse_seconds += end - start
+            if record is None:
+                break
+
+            # Lookup/create the *project_part* associated with the record part name:
+            part_name: str = record.part_name
+            project_part: Optional[bom.ProjectPart] = project_parts.get(part_name)
+            if project_part is None:
+                project_part = project.project_part_find(part_name)
+                project_parts[part_name] = project_part
+                start = perf_counter()
+                find_seconds += start - end
+                find_count += 1
+                end = start
+
+            # Create the *pose_part*:
+            pose_parts.append(bom.PosePart(project, project_part,
+                                           record.reference, record.comment))
+            if index is not None:
+                indexed_records.append(record)
+            construct_seconds += perf_counter() - end
+        count: int = len(pose_parts)
+
+        # Stuff all of the *pose_parts* into *project* at once:
+        start = perf_counter()
+        Kicad.pose_parts_append(project, pose_parts)
+        if index is not None:
+            index.pose_parts_add(indexed_records, pose_parts)
+        append_seconds: float = perf_counter() - start
+        loop_seconds: float = perf_counter() - loop_start
+
+        stats.add(PARSE, parse_seconds, count)
+        stats.add(PROJECT_PART_FIND, find_seconds, find_count)
+        stats.add(POSE_PART_CONSTRUCT, construct_seconds, count)
+        stats.add(POSE_PART_APPEND, append_seconds, count)
+        stats.add(COMPONENT_WALK, loop_seconds - parse_seconds - find_seconds -
+                  construct_seconds - append_seconds, count)
+        return count
+
+    # Kicad.pose_parts_append():
+    @staticmethod
+    def pose_parts_append(project: bom.Project, pose_parts: List[bom.PosePart]) -> None:
+        """ Append all of *pose_parts* to *project* in one batch. """
+        # Always go through *bom.Project.pose_part_append*() (it is free to do more than
+        # append to *all_pose_parts*), but only look the method up once:
+        pose_part_append: Callable[[bom.PosePart], None] = project.pose_part_append
+        pose_part: bom.PosePart
+        for pose_part in pose_parts:
+            pose_part_append(pose_part)
+
+    # Kicad.stats_begin():
+    def stats_begin(self, file_name: str) -> Optional[ReadStats]:
+        """ Return a new *ReadStats* for reading *file_name* if statistics are enabled. """
+        kicad: Kicad = self
+        return ReadStats(file_name) if kicad.stats_enabled else None
+
+    # Kicad.stats_end():
+    def stats_end(self, stats: Optional[ReadStats]) -> None:
+        """ Make *stats* the *read_stats* of the last read and pass it to *stats_hook*. """
+        kicad: Kicad = self
+        if stats is not None:
+            kicad.read_stats = stats
+            stats_hook: Optional[Callable[[ReadStats], None]] = kicad.stats_hook
+            if stats_hook is not None:
+                stats_hook(stats)
+
+    # Kicad.table_records():
+    def table_records(self, records: Iterable[ComponentRecord],
+                      file_name: str) -> Iterable[ComponentRecord]:
+        """ Return *records*, also appending them to *table* as they go by (if it is set.) """
+        kicad: Kicad = self
+        table: Optional[ComponentTable] = kicad.table
+        return records if table is None else table.records_append(records, file_name)
+
     # "se" stands for LISP "S Expression":
     @staticmethod
-    def se_find(se: List[Any], base_name: str, key_name: str) -> List[Any]:
+    def se_find(se: "sexpression.SENode", base_name: str,
+                key_name: str) -> Optional["sexpression.SENode"]:
         """ {}: Find *key_name* in *se* and return its value. """
 
         # *se* is a list of the form:
         #
         #        [base_name, [key1, value1], [key2, value2], ..., [keyN, valueN]]
         #
-        # This routine searches through the *[keyI, valueI]* pairs
-        # and returnts the *valueI* that corresponds to *key_name*.
+        # This routine returns the first *[keyI, valueI]* whose *keyI* matches *key_name*
+        # or *None* if there is no match.  *se* indexes its children by key the first time
+        # it is searched, so subsequent searches do not rescan it.
 
         # Do some sanity checking:
-        size: int = len(se)
-        assert size > 0
-        assert se[0] == Symbol(base_name)
+        assert len(se) > 0
+        assert se.name == base_name
 
-        result: List[Any] = list()
-        key_symbol: Symbol = Symbol(key_name)
-        index: int
-        for index in range(1, size):
-            sub_se: List[Any] = se[index]
-            if len(sub_se) > 0 and sub_se[0] == key_symbol:
-                result = sub_se
-                break
-        return result
+        return se.find(key_name)
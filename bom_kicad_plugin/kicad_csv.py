@@ -0,0 +1,106 @@
+# MIT License
+#
+# Copyright (c) 2019 Wayne C. Gramlich
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+# The reader for the BOM `.csv` files that the KiCad `bom_csv_grouped_by_value_with_fp.py`
+# BOM generator writes.  It is only imported (by
+# *readers.bom_csv_grouped_by_value_with_fp_records_read*()) the first time such a file
+# is read.
+
+from bom_manager.tracing import tracing_get
+from bom_kicad_plugin.records import ComponentRecord, Interner, part_name_split
+import csv
+import itertools
+from typing import Iterator, List, TextIO, Tuple
+
+
+# bom_csv_grouped_by_value_with_fp_records_read():
+def bom_csv_grouped_by_value_with_fp_records_read(csv_file_name: str
+                                                  ) -> Iterator[ComponentRecord]:
+    """ Return an iterator over the component records of a KiCad grouped BOM `.csv` file.
+
+    The file must have been generated by the `bom_csv_grouped_by_value_with_fp.py`
+    BOM generator.  The preamble and headers are checked before this function returns
+    and the component rows are read one at a time as the returned iterator is advanced.
+    """
+    csv_file: TextIO = open(csv_file_name)
+    try:
+        csv_rows: Iterator[List[str]] = csv.reader(csv_file, delimiter=",", quotechar='"')
+        preamble_rows: List[List[str]] = [next(csv_rows, [""]) for index in range(6)]
+        assert preamble_rows[0][0] == "Source:"
+        # source = preamble_rows[0][1]
+        assert preamble_rows[1][0] == "Date:"
+        # date = preamble_rows[1],[1]
+        assert preamble_rows[2][0] == "Tool:"
+        # tool = preamble_rows[2][1]
+        assert preamble_rows[3][0] == "Generator:"
+        generator: str = preamble_rows[3][1]
+        assert preamble_rows[4][0] == "Component Count:"
+        component_count: int = int(preamble_rows[4][1])
+        headers: Tuple[str, ...] = tuple(preamble_rows[5])
+        assert generator.endswith("bom_csv_grouped_by_value_with_fp.py"), (
+          f"File '{csv_file_name}' was generated using '{generator}' "
+          "which is not supported yet.  Use "
+          "'bom_csv_grouped_by_value_with_fp' generator instead.")
+        actual_headers: Tuple[str, ...] = headers[0:7]
+        desired_headers: Tuple[str, ...] = (
+            "Ref", "Qnty", "Value", "Cmp name", "Footprint", "Description", "Vendor")
+        index: int
+        for index, desired_header in enumerate(desired_headers):
+            assert desired_header == actual_headers[index], f"index={index}"
+        assert (actual_headers == desired_headers), (f"Got {actual_headers} "
+                                                     f"instead of {desired_headers}")
+    except BaseException:
+        csv_file.close()
+        raise
+    return bom_csv_grouped_by_value_with_fp_rows_records(
+        csv_file, itertools.islice(csv_rows, component_count))
+
+
+# bom_csv_grouped_by_value_with_fp_rows_records():
+def bom_csv_grouped_by_value_with_fp_rows_records(csv_file: TextIO, csv_rows: Iterator[List[str]]
+                                                  ) -> Iterator[ComponentRecord]:
+    """ Return an iterator over the component records of the KiCad grouped *csv_rows*.
+
+    *csv_file* is closed when *csv_rows* runs out.
+    """
+    tracing: str = tracing_get()
+    interner: Interner = Interner()
+    with csv_file:
+        index: int
+        row: List[str]
+        for index, row in enumerate(csv_rows):
+            # Unpack *row*:
+            references_text, quantity, part_name, component_name, footprint = row[:5]
+            if tracing:
+                print(f"{tracing}Row[{index}]: "
+                      f"{quantity}\t'{part_name}'\t{references_text}")
+
+            # Strip *comment* out of *part_name* if it exists:
+            comment: str
+            part_name, comment = part_name_split(part_name)
+            part_name = interner[part_name]
+            comment = interner[comment]
+            footprint = interner[footprint]
+
+            # Create one record for each (stripped) reference in *references_text*:
+            for reference in references_text.split(","):
+                yield ComponentRecord(reference.strip(), part_name, comment, footprint)
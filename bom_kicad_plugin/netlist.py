@@ -0,0 +1,124 @@
+# MIT License
+#
+# Copyright (c) 2019 Wayne C. Gramlich
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+# The reader for KiCad `.net` files.  It is only imported (by
+# *readers.net_file_records_read*()) the first time a net file is read.
+
+from bom_manager.tracing import tracing_get
+from bom_kicad_plugin import netscan, sexpression
+from bom_kicad_plugin.records import ComponentRecord, part_name_split
+import concurrent.futures
+import mmap
+import multiprocessing
+import os
+from typing import BinaryIO, Dict, Iterable, Iterator, List, Optional, Tuple
+
+# Each chunk of a net file that is read in parallel has at least this many bytes, since
+# smaller chunks cost more to send between processes than they save:
+CHUNK_SIZE_MINIMUM: int = 1 << 20
+
+
+# net_file_records_read():
+def net_file_records_read(net_file_name: str, workers: int = 1) -> Iterator[ComponentRecord]:
+    """ Return an iterator over the component records of a KiCad `.net` file.
+
+    When *workers* is more than 1, a large file is split into chunks (at `(comp`
+    boundaries) that are parsed by a pool of *workers* processes, and the records are
+    returned in file order.  If the file can not be split cleanly (or this is already a
+    worker process) it is just parsed in this process.
+    """
+    records: Optional[Iterable[ComponentRecord]] = None
+    if workers > 1 and multiprocessing.current_process().name == "MainProcess":
+        records = net_file_chunks_read(net_file_name, workers)
+    if records is None:
+        records = net_components_records(netscan.components_scan(net_file_name))
+    tracing: str = tracing_get()
+    record: ComponentRecord
+    for record in records:
+        if tracing:
+            print(f"{tracing}Component: '{record.reference}'\t'{record.part_name}'")
+        yield record
+
+
+# net_components_records():
+def net_components_records(components: Iterable[sexpression.NetComponent]
+                           ) -> Iterator[ComponentRecord]:
+    """ Return an iterator over the component record of each of *components*. """
+    # *netscan* shares the value strings, so each distinct value is only split once:
+    splits: Dict[str, Tuple[str, str]] = dict()
+    component: sexpression.NetComponent
+    for component in components:
+        # Strip *comment* out of *part_name* if it exists:
+        value: str = component.value
+        split: Optional[Tuple[str, str]] = splits.get(value)
+        if split is None:
+            split = part_name_split(value)
+            splits[value] = split
+        part_name: str
+        comment: str
+        part_name, comment = split
+        yield ComponentRecord(component.reference, part_name, comment, component.footprint)
+
+
+# net_file_chunks_read():
+def net_file_chunks_read(net_file_name: str,
+                         workers: int) -> Optional[Iterator[ComponentRecord]]:
+    """ Return the component records of *net_file_name* parsed in chunks by *workers*.
+
+    *None* is returned if the file is too small to split up or if any chunk boundary
+    turns out not to be between two components.
+    """
+    ranges: List[Tuple[int, int]] = list()
+    net_file: BinaryIO
+    with open(net_file_name, "rb") as net_file:
+        size: int = os.fstat(net_file.fileno()).st_size
+        count: int = min(workers, size // CHUNK_SIZE_MINIMUM)
+        if count > 1:
+            data: mmap.mmap
+            with mmap.mmap(net_file.fileno(), 0, access=mmap.ACCESS_READ) as data:
+                ranges = netscan.component_ranges_find(data, count)
+    if len(ranges) <= 1:
+        return None
+
+    # Each worker maps the file itself, so only the ranges and the records are sent
+    # between processes:
+    chunks: List[List[ComponentRecord]]
+    with concurrent.futures.ProcessPoolExecutor(max_workers=len(ranges)) as executor:
+        try:
+            chunks = list(executor.map(net_file_chunk_read, [net_file_name] * len(ranges),
+                                       *zip(*ranges)))
+        except AssertionError:
+            return None
+    return (record for chunk in chunks for record in chunk)
+
+
+# net_file_chunk_read():
+def net_file_chunk_read(net_file_name: str, start: int, end: int) -> List[ComponentRecord]:
+    """ Return the component records in the *start*/*end* byte range of *net_file_name*. """
+    net_file: BinaryIO
+    with open(net_file_name, "rb") as net_file:
+        data: mmap.mmap
+        with mmap.mmap(net_file.fileno(), 0, access=mmap.ACCESS_READ) as data:
+            component_spans: Iterator[netscan.ComponentSpan] = netscan.component_spans_scan(
+                data, start, end)
+            return list(net_components_records(component_span.component
+                                               for component_span in component_spans))
@@ -0,0 +1,287 @@
+# MIT License
+#
+# Copyright (c) 2019 Wayne C. Gramlich
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+# This module scans a KiCad `.net` file through a memory map.  The raw bytes are
+# tokenized in place and only the few tokens that are actually needed (the *ref*,
+# *value*, *footprint* and *tstamp* of each `(comp ...)`) are ever copied and decoded
+# into Python strings.  The file contents stay in the OS page cache rather than being
+# read into the Python heap.
+
+from bom_kicad_plugin import files
+from bom_kicad_plugin.sexpression import NetComponent, atom_text, atom_value_text
+import mmap
+import os
+import re
+from typing import (BinaryIO, Dict, Iterator, List, Match, NamedTuple, Optional, Pattern, Tuple,
+                    Union)
+
+# Only parentheses, strings and escaped characters are matched; plain atoms are skipped
+# over inside of the regular expression engine.  An opening parenthesis also matches the
+# list name if it is one of the few names that matter, along with the atom after it.
+# *token_pattern_compile*() builds such a pattern for a set of names.  The groups of a
+# match (i.e. *match.lastindex*) are:
+#
+#   *None*:  `(` of any other list
+#   1:       `(name` where *name* is one of NAMES
+#   2:       `(name value` where *value* is an atom or a string
+#   3:       `)`
+#   4:       a string (skipped)
+#   5:       an unterminated string
+#   6:       an escaped character outside of a string (skipped)
+NAME: int = 1
+NAME_VALUE: int = 2
+CLOSE: int = 3
+UNTERMINATED: int = 5
+STRING_PATTERN: bytes = rb'"[^"\\]*(?:\\.[^"\\]*)*"'
+ATOM_PATTERN: bytes = rb'[^\s()"\\]+(?:\\.[^\s()"\\]*)*'
+NAMES_PATTERN: bytes = rb"ref|value|footprint|tstamps?|comp|components|export"
+
+
+# token_pattern_compile():
+def token_pattern_compile(names_pattern: bytes) -> Pattern:
+    """ Return the token pattern (see above) for the list names in *names_pattern*. """
+    return re.compile(
+        rb'\((?:\s*(' + names_pattern + rb')(?=[\s()"])(?:\s+(' + STRING_PATTERN + rb"|" +
+        ATOM_PATTERN + rb'))?)?|(\))|(' + STRING_PATTERN + rb')|(")|(\\.)', re.DOTALL)
+
+
+BYTES_TOKEN_PATTERN: Pattern = token_pattern_compile(NAMES_PATTERN)
+
+# The `(comp ...)` entries that are extracted (the value is the *NetComponent* field):
+COMPONENT_KEYS: Dict[bytes, str] = {
+    b"ref": "ref", b"value": "value", b"footprint": "footprint",
+    b"tstamp": "tstamp", b"tstamps": "tstamp"}
+
+# A `(comp` at the start of a line (i.e. a place where the components can be split up):
+COMPONENT_START_PATTERN: Pattern = re.compile(rb"\n[ \t]*(\(comp)[\s(]")
+
+# The net file bytes can be anything that supports the buffer protocol; in practice
+# they are either a *bytes* or a memory map of the file:
+Buffer = Union[bytes, mmap.mmap]
+
+# The encoding used to decode tokens (the same as opening the file in text mode):
+ENCODING: str = "utf-8"
+
+
+# components_scan():
+def components_scan(net_file_name: str) -> Iterator[NetComponent]:
+    """ Return an iterator over each `(comp ...)` entry in the *net_file_name* file. """
+    net_file: BinaryIO
+    with open(net_file_name, "rb") as net_file:
+        assert os.fstat(net_file.fileno()).st_size > 0, f"'{net_file_name}' is empty"
+        data: mmap.mmap
+        with mmap.mmap(net_file.fileno(), 0, access=mmap.ACCESS_READ) as data:
+            yield from components_bytes_scan(data)
+
+
+# ComponentSpan:
+class ComponentSpan(NamedTuple):
+    """ A `(comp ...)` entry along with where its footprint is in the net file bytes.
+
+    *footprint_start* and *footprint_end* are the byte offsets of the `(footprint ...)`
+    value token (both are -1 if the component has no footprint) and *close* is the byte
+    offset of the `)` that ends the component (i.e. where a footprint can be inserted.)
+    *quoted* is set if the footprint token (or the reference token if there is no
+    footprint) is a quoted string, so that a new footprint can be quoted the same way.
+    """
+
+    component: NetComponent
+    footprint_start: int
+    footprint_end: int
+    close: int
+    quoted: bool
+
+
+# component_spans_file_scan():
+def component_spans_file_scan(net_file_name: str) -> Iterator["ComponentSpan"]:
+    """ Return an iterator over the *ComponentSpan* of each entry in *net_file_name*. """
+    net_file: BinaryIO
+    with open(net_file_name, "rb") as net_file:
+        assert os.fstat(net_file.fileno()).st_size > 0, f"'{net_file_name}' is empty"
+        data: mmap.mmap
+        with mmap.mmap(net_file.fileno(), 0, access=mmap.ACCESS_READ) as data:
+            yield from component_spans_scan(data)
+
+
+# file_patch():
+def file_patch(file_name: str, patches: List[Tuple[int, int, bytes]]) -> None:
+    """ Replace the byte ranges of *file_name* listed in *patches*.
+
+    Each patch is a `(start, end, replacement)` triple where *start* and *end* are byte
+    offsets (an insertion has *start* equal to *end*.)  *patches* must be sorted by
+    offset and must not overlap.  The bytes between the patches are copied straight out
+    of a memory map and *file_name* is replaced atomically (see *files.file_replace*().)
+    """
+    temporary_handle: int
+    temporary_file: BinaryIO
+    source_file: BinaryIO
+    with files.file_replace(file_name) as temporary_handle, \
+            os.fdopen(temporary_handle, "wb") as temporary_file, \
+            open(file_name, "rb") as source_file:
+        data: mmap.mmap
+        with mmap.mmap(source_file.fileno(), 0, access=mmap.ACCESS_READ) as data:
+            view: memoryview = memoryview(data)
+            try:
+                offset: int = 0
+                start: int
+                end: int
+                replacement: bytes
+                for start, end, replacement in patches:
+                    assert offset <= start <= end <= len(data), (
+                      f"Bad patch [{start}:{end}] of '{file_name}'")
+                    temporary_file.write(view[offset:start])
+                    temporary_file.write(replacement)
+                    offset = end
+                temporary_file.write(view[offset:])
+            finally:
+                view.release()
+
+
+# components_bytes_scan():
+def components_bytes_scan(data: Buffer) -> Iterator[NetComponent]:
+    """ Return an iterator over each `(comp ...)` entry in the net file bytes *data*.
+
+    Only the `(export ... (components ...))` section is visited; scanning stops as soon
+    as the components section ends.  *data* can be anything that supports the buffer
+    protocol (e.g. *bytes* or an *mmap*.)
+    """
+    component_span: ComponentSpan
+    for component_span in component_spans_scan(data):
+        yield component_span.component
+
+
+# component_spans_scan():
+def component_spans_scan(data: Buffer, start: int = 0, end: int = -1) -> Iterator[ComponentSpan]:
+    """ Return an iterator over the *ComponentSpan* of each `(comp ...)` entry in *data*.
+
+    This is the scanner behind *components_bytes_scan*() and it visits the same entries.
+    Only part of the components section can be scanned (see *component_ranges_find*()):
+    a non-zero *start* must be the offset of a `(comp` and a non-negative *end* must be
+    the offset of the `(comp` that follows the range.
+    """
+    # *depth* is the current list nesting.  Depth 1 is `(export`, depth 2 is `(components`,
+    # depth 3 is `(comp` and depth 4 is the `(ref`, `(value`, etc. inside of it.  A range
+    # that starts part way in starts inside of the components section:
+    depth: int = 0 if start == 0 else 2
+    # Values and footprints repeat a lot, so each distinct raw token is only decoded once
+    # and every component with it shares the same string:
+    values: Dict[bytes, str] = dict()
+    footprints: Dict[bytes, str] = dict()
+    in_components: bool = start != 0
+    in_component: bool = False
+    fields: Dict[str, bytes] = dict()
+    footprint_start: int = -1
+    footprint_end: int = -1
+    match: Match
+    for match in BYTES_TOKEN_PATTERN.finditer(data, start, len(data) if end < 0 else end):
+        kind: Optional[int] = match.lastindex
+        if kind is None or kind <= NAME_VALUE:
+            # An opening parenthesis:
+            depth += 1
+            if depth <= 3:
+                name: bytes = b"" if kind is None else match.group(NAME)
+                if depth == 1:
+                    assert name == b"export", "Net file does not start with '(export'"
+                elif depth == 2:
+                    in_components = name == b"components"
+                elif in_components:
+                    in_component = name == b"comp"
+                    fields = dict()
+                    footprint_start = footprint_end = -1
+            elif depth == 4 and kind == NAME_VALUE and in_component:
+                key: Optional[str] = COMPONENT_KEYS.get(match.group(NAME))
+                if key is not None and key not in fields:
+                    fields[key] = match.group(NAME_VALUE)
+                    if key == "footprint":
+                        footprint_start, footprint_end = match.span(NAME_VALUE)
+        elif kind == CLOSE:
+            if depth == 3 and in_component:
+                quoted: bool = fields.get("footprint", fields.get("ref", b"")).startswith(b'"')
+                yield ComponentSpan(component_build(fields, values, footprints),
+                                    footprint_start, footprint_end, match.start(CLOSE), quoted)
+                in_component = False
+            elif depth == 2 and in_components:
+                return
+            depth -= 1
+        elif kind == UNTERMINATED:
+            assert False, "Unterminated string in S-expression"
+    # A range that ends before the end of *data* must end between two components:
+    assert (depth, in_components) == ((0, False) if end < 0 else (2, True)), (
+      "Unexpected end of S-expression")
+
+
+# component_ranges_find():
+def component_ranges_find(data: Buffer, count: int) -> List[Tuple[int, int]]:
+    """ Split the components section of *data* into up to *count* byte ranges.
+
+    Each range is a `(start, end)` pair for *component_spans_scan*().  The ranges are in
+    file order and are split just before a `(comp` that starts a line, so each one holds
+    about the same number of components.  The first range also holds everything before the
+    components section and the last one (whose *end* is -1) runs to the end of *data*.
+    Nothing is checked here; a split that lands in the wrong place is caught when that
+    range is scanned.
+    """
+    ranges: List[Tuple[int, int]] = list()
+    first_match: Optional[Match] = COMPONENT_START_PATTERN.search(data)
+    if first_match is not None:
+        first: int = first_match.start(1)
+        last: int = data.rfind(b"(comp")
+        start: int = 0
+        index: int
+        for index in range(1, count):
+            match: Optional[Match] = COMPONENT_START_PATTERN.search(
+                data, max(first + (last - first) * index // count, start + 1))
+            if match is None or match.start(1) > last:
+                break
+            ranges.append((start, match.start(1)))
+            start = match.start(1)
+        ranges.append((start, -1))
+    return ranges
+
+
+# component_build():
+def component_build(fields: Dict[str, bytes], values: Dict[bytes, str],
+                    footprints: Dict[bytes, str]) -> NetComponent:
+    """ Return the *NetComponent* for the raw *fields* of a `(comp ...)` entry.
+
+    *values* and *footprints* map the raw tokens that have already been decoded to their
+    text and are updated with any new ones.
+    """
+    assert "ref" in fields, "Component has no (ref ...)"
+    reference: str = atom_text(fields["ref"].decode(ENCODING))
+    assert "value" in fields, f"Component '{reference}' has no (value ...)"
+    raw_value: bytes = fields["value"]
+    value: Optional[str] = values.get(raw_value)
+    if value is None:
+        value = atom_value_text(raw_value.decode(ENCODING))
+        values[raw_value] = value
+    footprint: str = ""
+    if "footprint" in fields:
+        raw_footprint: bytes = fields["footprint"]
+        footprint_text: Optional[str] = footprints.get(raw_footprint)
+        if footprint_text is None:
+            footprint_text = atom_text(raw_footprint.decode(ENCODING))
+            footprints[raw_footprint] = footprint_text
+        footprint = footprint_text
+    return NetComponent(reference, value, footprint,
+                        atom_text(fields["tstamp"].decode(ENCODING))
+                        if "tstamp" in fields else "")
@@ -0,0 +1,65 @@
+# MIT License
+#
+# Copyright (c) 2019 Wayne C. Gramlich
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+# The functions in this module extract *ComponentRecord*'s from the various KiCad
+# related files.  They do not touch any *bom.Project*, so they can also be run in
+# worker processes or have their results cached.
+#
+# Each reader lives in its own module (*altium_csv*, *kicad_csv*, *netlist* and
+# *schematic*) which is only imported the first time that kind of file is read.  That
+# keeps importing the plugin (i.e. *bom_manager* plugin discovery) cheap for the runs
+# that never read a file, or only read one kind of file.
+
+from bom_kicad_plugin.records import ComponentRecord
+from typing import Iterator
+
+
+# altium_csv_records_read():
+def altium_csv_records_read(csv_file_name: str) -> Iterator[ComponentRecord]:
+    """ Return an iterator over the component records of an Altium BOM `.csv` file. """
+    from bom_kicad_plugin import altium_csv
+    return altium_csv.altium_csv_records_read(csv_file_name)
+
+
+# bom_csv_grouped_by_value_with_fp_records_read():
+def bom_csv_grouped_by_value_with_fp_records_read(csv_file_name: str
+                                                  ) -> Iterator[ComponentRecord]:
+    """ Return an iterator over the component records of a KiCad grouped BOM `.csv` file. """
+    from bom_kicad_plugin import kicad_csv
+    return kicad_csv.bom_csv_grouped_by_value_with_fp_records_read(csv_file_name)
+
+
+# net_file_records_read():
+def net_file_records_read(net_file_name: str, workers: int = 1) -> Iterator[ComponentRecord]:
+    """ Return an iterator over the component records of a KiCad `.net` file.
+
+    A large file is parsed in chunks by *workers* processes when *workers* is more than 1.
+    """
+    from bom_kicad_plugin import netlist
+    return netlist.net_file_records_read(net_file_name, workers)
+
+
+# schematic_records_read():
+def schematic_records_read(schematic_file_name: str) -> Iterator[ComponentRecord]:
+    """ Return an iterator over the component records of a KiCad `.kicad_sch` file. """
+    from bom_kicad_plugin import schematic
+    return schematic.schematic_records_read(schematic_file_name)
@@ -0,0 +1,122 @@
+# MIT License
+#
+# Copyright (c) 2019 Wayne C. Gramlich
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+# The readers turn each file into a sequence of *ComponentRecord*'s which are then
+# applied to a *bom.Project* by *Kicad.records_apply*().  Records only contain strings,
+# so they are cheap to cache, to send between processes, and to compare.
+#
+# A large import can have millions of records, so a record is a slotted object (no
+# per-record dictionary) and the readers pass the part names, comments and footprints
+# through an *Interner* so that every record with the same value shares one string.
+# Pickling (i.e. sending records between processes) and *marshal* (the cache) both
+# preserve that sharing.
+
+import itertools
+from typing import Any, Iterator, Tuple
+
+
+# ComponentRecord:
+class ComponentRecord:
+    """ One placed component (i.e. one reference) as extracted from a KiCad file. """
+
+    __slots__ = ("reference", "part_name", "comment", "footprint")
+
+    # ComponentRecord.__init__():
+    def __init__(self, reference: str, part_name: str, comment: str, footprint: str) -> None:
+        # Load up *component_record* (i.e. *self*).  *footprint* is empty if the file does
+        # not specify one:
+        self.reference: str = reference
+        self.part_name: str = part_name
+        self.comment: str = comment
+        self.footprint: str = footprint
+
+    # ComponentRecord.__eq__():
+    def __eq__(self, other: Any) -> bool:
+        component_record: ComponentRecord = self
+        return (isinstance(other, ComponentRecord) and
+                tuple(component_record) == tuple(other))
+
+    # ComponentRecord.__hash__():
+    def __hash__(self) -> int:
+        component_record: ComponentRecord = self
+        return hash(tuple(component_record))
+
+    # ComponentRecord.__iter__():
+    def __iter__(self) -> Iterator[str]:
+        # Iterate over the fields in order, so `tuple(record)` works like it would for a tuple:
+        component_record: ComponentRecord = self
+        yield component_record.reference
+        yield component_record.part_name
+        yield component_record.comment
+        yield component_record.footprint
+
+    # ComponentRecord.__reduce__():
+    def __reduce__(self) -> Tuple[Any, Tuple[str, str, str, str]]:
+        # Pickle as a constructor call with a tuple of the fields (the smallest form):
+        component_record: ComponentRecord = self
+        return (ComponentRecord, (component_record.reference, component_record.part_name,
+                                  component_record.comment, component_record.footprint))
+
+    # ComponentRecord.__repr__():
+    def __repr__(self) -> str:
+        component_record: ComponentRecord = self
+        return (f"ComponentRecord(reference={component_record.reference!r}, "
+                f"part_name={component_record.part_name!r}, "
+                f"comment={component_record.comment!r}, "
+                f"footprint={component_record.footprint!r})")
+
+
+# Interner:
+class Interner(dict):
+    """ A table that maps each string to one shared copy of itself.
+
+    `interner[text]` returns the first string equal to *text* that was looked up, so
+    records with equal values share a single string.
+    """
+
+    # Interner.__missing__():
+    def __missing__(self, text: str) -> str:
+        interner: Interner = self
+        interner[text] = text
+        return text
+
+
+# part_name_split():
+def part_name_split(part_name: str) -> Tuple[str, str]:
+    """ Split *part_name* into a part name and a comment at the first colon. """
+    comment: str = ""
+    colon_index: int = part_name.find(':')
+    if colon_index >= 0:
+        comment = part_name[colon_index + 1:]
+        part_name = part_name[0:colon_index]
+    return part_name, comment
+
+
+# reference_key():
+def reference_key(reference: str) -> Tuple[Tuple[str, int], ...]:
+    """ Return a key that sorts *reference* naturally (i.e. `R2` before `R10`.)
+
+    Each run of text becomes `(text, -1)` and each run of digits becomes `("", number)`,
+    so the key pieces always compare with the same types.
+    """
+    return tuple(("", int("".join(characters))) if is_decimal else ("".join(characters), -1)
+                 for is_decimal, characters in itertools.groupby(reference, str.isdecimal))
@@ -0,0 +1,296 @@
+# MIT License
+#
+# Copyright (c) 2019 Wayne C. Gramlich
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+# This module reads the components straight out of a KiCad 6+ `.kicad_sch` schematic,
+# so no netlist has to be exported first.  The root schematic is parsed, then every
+# sheet file that it refers to, then every sheet file that those refer to, and so on.
+# All of the (distinct) sheet files of one hierarchy level are parsed in parallel by a
+# pool of worker processes.  Each worker only sends back a small *Schematic* summary
+# rather than the whole S-expression tree.
+#
+# A sheet file that is used by more than one sheet is only parsed once, but its symbols
+# get a different reference for each sheet instance.  The reference for an instance is
+# found in one of these places:
+#
+# * KiCad 6: the `(symbol_instances (path "/sheet/.../symbol" (reference "R1") ...))`
+#   list at the end of the root schematic.
+# * KiCad 7+: the `(instances (project "name" (path "/root/sheet/..." (reference "R1"))))`
+#   list inside of each symbol.
+# * Otherwise the `Reference` property of the symbol.
+#
+# The components are then filtered and sorted the same way KiCad does it when it exports
+# a netlist: power symbols (`#PWR01`, ...) and symbols that are not on the board are
+# skipped, each unit of a multi-unit symbol shows up only once, and the references are
+# sorted naturally.
+
+from bom_kicad_plugin.records import (ComponentRecord, Interner, part_name_split,
+                                      reference_key)
+from bom_kicad_plugin.sexpression import SENode, atom_text, atom_value_text, tree_read
+from bom_manager.tracing import tracing_get
+import concurrent.futures
+import multiprocessing
+import os
+from typing import Dict, Iterator, List, NamedTuple, Optional, TextIO, Tuple, Union
+
+# The property names of the sheet file name (KiCad 6 uses the first one):
+SHEET_FILE_PROPERTIES: Tuple[str, ...] = ("Sheet file", "Sheetfile")
+
+
+# SchematicSymbol:
+class SchematicSymbol(NamedTuple):
+    """ One placed symbol of a schematic sheet file. """
+
+    uuid: str
+    reference: str  # The `Reference` property
+    value: str  # The `Value` property already converted to text
+    footprint: str
+    on_board: bool
+    instances: Dict[str, str]  # KiCad 7+ instance path => reference
+
+
+# SchematicSheet:
+class SchematicSheet(NamedTuple):
+    """ One sheet symbol (i.e. a reference to another sheet file) of a schematic. """
+
+    uuid: str
+    file_name: str  # Absolute path of the sheet file
+
+
+# SchematicInstance:
+class SchematicInstance(NamedTuple):
+    """ A KiCad 6 `(symbol_instances ...)` entry; empty fields are not overridden. """
+
+    reference: str
+    value: str
+    footprint: str
+
+
+# Schematic:
+class Schematic(NamedTuple):
+    """ The parts of one `.kicad_sch` file that are needed to find its components. """
+
+    file_name: str
+    uuid: str
+    symbols: List[SchematicSymbol]
+    sheets: List[SchematicSheet]
+    symbol_instances: Dict[str, SchematicInstance]  # KiCad 6 (root only)
+
+
+# node_text():
+def node_text(se_node: Optional[SENode], index: int = 1) -> str:
+    """ Return the text of atom *index* of *se_node* (or an empty string if it is missing.) """
+    text: str = ""
+    if se_node is not None and index < len(se_node):
+        item: Union[SENode, str] = se_node[index]
+        if isinstance(item, str):
+            text = atom_text(item)
+    return text
+
+
+# properties_get():
+def properties_get(se_node: SENode) -> Dict[str, str]:
+    """ Return the `(property "Name" "value" ...)` tokens of *se_node* keyed by name. """
+    properties: Dict[str, str] = dict()
+    property_se: SENode
+    for property_se in se_node.children("property"):
+        if len(property_se) >= 3:
+            value: Union[SENode, str] = property_se[2]
+            if isinstance(value, str):
+                properties.setdefault(node_text(property_se), value)
+    return properties
+
+
+# symbol_parse():
+def symbol_parse(symbol_se: SENode) -> SchematicSymbol:
+    """ Return the *SchematicSymbol* for a placed `(symbol ...)` of a schematic. """
+    properties: Dict[str, str] = properties_get(symbol_se)
+    value_token: Optional[str] = properties.get("Value")
+
+    # Collect the KiCad 7+ per instance references from all of the projects:
+    instances: Dict[str, str] = dict()
+    instances_se: Optional[SENode] = symbol_se.find("instances")
+    if instances_se is not None:
+        project_se: SENode
+        for project_se in instances_se.children("project"):
+            path_se: SENode
+            for path_se in project_se.children("path"):
+                instances.setdefault(node_text(path_se),
+                                     node_text(path_se.find("reference")))
+
+    return SchematicSymbol(node_text(symbol_se.find("uuid")),
+                           atom_text(properties.get("Reference", '""')),
+                           "" if value_token is None else atom_value_text(value_token),
+                           atom_text(properties.get("Footprint", '""')),
+                           node_text(symbol_se.find("on_board")) != "no",
+                           instances)
+
+
+# schematic_file_parse():
+def schematic_file_parse(file_name: str) -> Schematic:
+    """ Parse the `.kicad_sch` file *file_name* into a *Schematic* summary. """
+    tracing: str = tracing_get()
+    if tracing:
+        print(f"{tracing}Parsing '{file_name}'")
+    schematic_file: TextIO
+    with open(file_name, encoding="utf-8") as schematic_file:
+        schematic_se: SENode = tree_read(schematic_file)
+    assert schematic_se.name == "kicad_sch", f"File '{file_name}' is not a KiCad schematic"
+
+    # Only the top level `(symbol ...)` lists are placed symbols (the ones inside of
+    # `(lib_symbols ...)` are library definitions):
+    symbols: List[SchematicSymbol] = [symbol_parse(symbol_se)
+                                      for symbol_se in schematic_se.children("symbol")]
+
+    # Sheet file names are relative to the directory of *file_name*:
+    directory: str = os.path.dirname(os.path.abspath(file_name))
+    sheets: List[SchematicSheet] = list()
+    sheet_se: SENode
+    for sheet_se in schematic_se.children("sheet"):
+        properties: Dict[str, str] = properties_get(sheet_se)
+        sheet_file_token: Optional[str] = None
+        name: str
+        for name in SHEET_FILE_PROPERTIES:
+            sheet_file_token = properties.get(name, sheet_file_token)
+        assert sheet_file_token is not None, f"Sheet without a file in '{file_name}'"
+        sheet_file_name: str = os.path.normpath(
+            os.path.join(directory, atom_text(sheet_file_token)))
+        sheets.append(SchematicSheet(node_text(sheet_se.find("uuid")), sheet_file_name))
+
+    # KiCad 6 stores all of the instance references at the end of the root schematic:
+    symbol_instances: Dict[str, SchematicInstance] = dict()
+    symbol_instances_se: Optional[SENode] = schematic_se.find("symbol_instances")
+    if symbol_instances_se is not None:
+        path_se: SENode
+        for path_se in symbol_instances_se.children("path"):
+            value_se: Optional[SENode] = path_se.find("value")
+            value_token: Union[SENode, str] = "" if value_se is None else value_se[1]
+            symbol_instances[node_text(path_se)] = SchematicInstance(
+                node_text(path_se.find("reference")),
+                atom_value_text(value_token) if isinstance(value_token, str) and value_token
+                else "",
+                node_text(path_se.find("footprint")))
+
+    return Schematic(os.path.abspath(file_name), node_text(schematic_se.find("uuid")),
+                     symbols, sheets, symbol_instances)
+
+
+# schematics_parse():
+def schematics_parse(root_file_name: str,
+                     workers: Optional[int] = None) -> Tuple[Schematic, Dict[str, Schematic]]:
+    """ Parse *root_file_name* and all of the sheet files below it.
+
+    The root *Schematic* is returned along with a table of all of the schematics keyed by
+    absolute file name.  Each level of the hierarchy is parsed by a pool of *workers*
+    processes (the CPU count by default.)  When called from a worker process (e.g.
+    from *Kicad.files_read*()) the sheet files are parsed one after another instead.
+    """
+    root: Schematic = schematic_file_parse(root_file_name)
+    schematics: Dict[str, Schematic] = {root.file_name: root}
+    level: List[Schematic] = [root]
+    serial: bool = workers == 1 or multiprocessing.current_process().name != "MainProcess"
+    executor: Optional[concurrent.futures.ProcessPoolExecutor] = None
+    try:
+        while level:
+            # Collect the sheet files of this *level* that have not been parsed yet:
+            file_names: List[str] = list()
+            schematic: Schematic
+            for schematic in level:
+                sheet: SchematicSheet
+                for sheet in schematic.sheets:
+                    if sheet.file_name not in schematics and sheet.file_name not in file_names:
+                        assert os.path.isfile(sheet.file_name), (
+                            f"Sheet file '{sheet.file_name}' does not exist")
+                        file_names.append(sheet.file_name)
+
+            # Parse them all (in parallel if there is more than one):
+            parsed: Iterator[Schematic]
+            if serial or len(file_names) <= 1:
+                parsed = map(schematic_file_parse, file_names)
+            else:
+                if executor is None:
+                    executor = concurrent.futures.ProcessPoolExecutor(max_workers=workers)
+                parsed = executor.map(schematic_file_parse, file_names)
+            level = list(parsed)
+            for schematic in level:
+                schematics[schematic.file_name] = schematic
+    finally:
+        if executor is not None:
+            executor.shutdown()
+    return root, schematics
+
+
+# schematic_records_read():
+def schematic_records_read(schematic_file_name: str,
+                           workers: Optional[int] = None) -> Iterator[ComponentRecord]:
+    """ Return an iterator over the component records of a KiCad `.kicad_sch` file.
+
+    *schematic_file_name* must be the root sheet of the design.  All of the sheet files
+    are parsed before the first record is returned.
+    """
+    root: Schematic
+    schematics: Dict[str, Schematic]
+    root, schematics = schematics_parse(schematic_file_name, workers)
+
+    # Visit every sheet instance and find the reference of each symbol in it.  The first
+    # symbol with a given reference wins (the other units of the symbol are skipped):
+    components: Dict[str, ComponentRecord] = dict()
+    interner: Interner = Interner()
+    pending: List[Tuple[Schematic, Tuple[str, ...], Tuple[str, ...]]] = [(root, (), ())]
+    while pending:
+        schematic: Schematic
+        sheet_path: Tuple[str, ...]  # The sheet UUID's below *root*
+        file_names: Tuple[str, ...]  # The sheet files above *schematic* (cycle detection)
+        schematic, sheet_path, file_names = pending.pop()
+        assert schematic.file_name not in file_names, (
+            f"Sheet file '{schematic.file_name}' contains itself")
+        instance_path: str = "/" + "/".join((root.uuid,) + sheet_path)
+        symbol: SchematicSymbol
+        for symbol in schematic.symbols:
+            reference: str = symbol.instances.get(instance_path, symbol.reference)
+            value: str = symbol.value
+            footprint: str = symbol.footprint
+            instance: Optional[SchematicInstance] = root.symbol_instances.get(
+                "/" + "/".join(sheet_path + (symbol.uuid,)))
+            if instance is not None:
+                reference = instance.reference or reference
+                value = instance.value or value
+                footprint = instance.footprint or footprint
+            if symbol.on_board and not reference.startswith("#") and \
+               reference not in components:
+                part_name: str
+                comment: str
+                part_name, comment = part_name_split(value)
+                components[reference] = ComponentRecord(
+                    reference, interner[part_name], interner[comment], interner[footprint])
+
+        # Push the sheets in reverse so that they are visited in file order:
+        sheet: SchematicSheet
+        for sheet in reversed(schematic.sheets):
+            pending.append((schematics[sheet.file_name], sheet_path + (sheet.uuid,),
+                            file_names + (schematic.file_name,)))
+
+    tracing: str = tracing_get()
+    record: ComponentRecord
+    for record in sorted(components.values(), key=lambda record: reference_key(record.reference)):
+        if tracing:
+            print(f"{tracing}Component: '{record.reference}'\t'{record.part_name}'")
+        yield record
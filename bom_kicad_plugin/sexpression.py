@@ -0,0 +1,359 @@
+# MIT License
+#
+# Copyright (c) 2019 Wayne C. Gramlich
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+# "se" stands for LISP "S Expression".  This module contains a small streaming
+# S-expression tokenizer and the tree of *SENode*'s that it is parsed into when a whole
+# file is needed (e.g. to update footprints or to read a schematic.)  The components of
+# a KiCad `.net` file are pulled out by *netscan* without building a tree.
+
+from bom_kicad_plugin import files
+import os
+import re
+from typing import (Dict, Iterator, List, Match, NamedTuple, Optional, Pattern, TextIO, Tuple,
+                    Union)
+
+# A token is one of "(", ")", a double quoted string (quotes included), or a bare atom.
+# A lone double quote only matches when a string is not terminated yet (i.e. it spans
+# a chunk boundary or the file is truncated):
+TOKEN_PATTERN: Pattern = re.compile(r'[()]|"(?:[^"\\]|\\.)*"|(?:[^\s()"\\]|\\.)+|"', re.DOTALL)
+
+# These are the same unescape tables that `sexpdata` uses for strings and symbols:
+STRING_UNESCAPES: Dict[str, str] = {
+    "\\\\": "\\", '\\"': '"', "\\b": "\b", "\\f": "\f", "\\n": "\n", "\\r": "\r", "\\t": "\t"}
+SYMBOL_UNESCAPES: Dict[str, str] = {
+    "\\" + character: character for character in "\\'`\"()[] ,?;#"}
+ESCAPE_PATTERN: Pattern = re.compile(r"\\.", re.DOTALL)
+STRING_ESCAPES: List[Tuple[str, str]] = [  # The backslash must come first
+    ("\\", "\\\\"), ('"', '\\"'), ("\n", "\\n"), ("\r", "\\r"), ("\t", "\\t")]
+
+# When KiCad writes a `.net` file, each of these lists starts on a new line indented by
+# the given number of spaces.  (A list is only moved to a new line when it is not the
+# first item of its parent and has something after its name.)
+KICAD_NET_INDENTS: Dict[str, int] = {
+    # Design part of file:
+    "design": 2,
+    "sheet": 4,
+    "title_block": 6,
+    "title": 8, "company": 8, "rev": 8, "date": 8, "source": 8, "comment": 8,
+    # Components part of file:
+    "components": 2,
+    "comp": 4,
+    "value": 6, "footprint": 6, "libsource": 6, "sheetpath": 6, "path": 6, "tstamp": 6,
+    # Library parts part of file:
+    "libparts": 2,
+    "libpart": 4,
+    "description": 6, "fields": 6, "pins": 6,
+    "field": 8,
+    # Network portion of file:
+    "nets": 2,
+    "net": 4,
+    "node": 6,
+}
+
+# Atoms that can be written without quotes:
+BARE_ATOM_PATTERN: Pattern = re.compile(r'[^\s()"\\;]+')
+
+
+# NetComponent:
+class NetComponent(NamedTuple):
+    """ The interesting fields of one `(comp ...)` entry of a KiCad `.net` file. """
+
+    reference: str
+    value: str
+    footprint: str  # Empty if the component has no footprint
+    tstamp: str     # Empty if the component has no time stamp
+
+
+# SENode:
+class SENode:
+    """ One parenthesized list of an S-expression.
+
+    The *items* of an *SENode* are either nested *SENode*'s or atom tokens exactly as they
+    appeared in the file (i.e. strings still have their quotes.)  The first item is
+    normally a bare atom that names the list (e.g. `comp`, `ref`, `footprint`.)  The
+    named children are indexed the first time *SENode.find*() is called, so repeated
+    lookups do not rescan *items*.
+    """
+
+    __slots__ = ("items", "key_table")
+
+    # SENode.__init__():
+    def __init__(self, items: List[Union["SENode", str]]) -> None:
+        # Load up *se_node* (i.e. *self*):
+        self.items: List[Union[SENode, str]] = items
+        self.key_table: Optional[Dict[str, SENode]] = None
+
+    # SENode.__getitem__():
+    def __getitem__(self, index: int) -> Union["SENode", str]:
+        se_node: SENode = self
+        return se_node.items[index]
+
+    # SENode.__len__():
+    def __len__(self) -> int:
+        se_node: SENode = self
+        return len(se_node.items)
+
+    # SENode.__setitem__():
+    def __setitem__(self, index: int, item: Union["SENode", str]) -> None:
+        # Replacing an item may replace an indexed child, so flush *key_table*:
+        se_node: SENode = self
+        se_node.items[index] = item
+        se_node.key_table = None
+
+    # SENode.__str__():
+    def __str__(self) -> str:
+        se_node: SENode = self
+        return tree_text(se_node)
+
+    # SENode.append():
+    def append(self, item: Union["SENode", str]) -> None:
+        """ Append *item* to the end of the *SENode* items. """
+        se_node: SENode = self
+        se_node.items.append(item)
+        key_table: Optional[Dict[str, SENode]] = se_node.key_table
+        if key_table is not None and isinstance(item, SENode):
+            name: str = item.name
+            if name and name not in key_table:
+                key_table[name] = item
+
+    # SENode.children():
+    def children(self, name: str) -> Iterator["SENode"]:
+        """ Return an iterator over all the child *SENode*'s named *name*. """
+        se_node: SENode = self
+        item: Union[SENode, str]
+        for item in se_node.items[1:]:
+            if isinstance(item, SENode) and item.name == name:
+                yield item
+
+    # SENode.find():
+    def find(self, name: str) -> Optional["SENode"]:
+        """ Return the first child *SENode* named *name* or *None* if there is none. """
+        se_node: SENode = self
+        key_table: Optional[Dict[str, SENode]] = se_node.key_table
+        if key_table is None:
+            key_table = dict()
+            item: Union[SENode, str]
+            for item in se_node.items[1:]:
+                if isinstance(item, SENode):
+                    item_name: str = item.name
+                    if item_name and item_name not in key_table:
+                        key_table[item_name] = item
+            se_node.key_table = key_table
+        return key_table.get(name)
+
+    # SENode.name():
+    @property
+    def name(self) -> str:
+        """ Return the name of the *SENode* (or an empty string if it does not have one.) """
+        se_node: SENode = self
+        items: List[Union[SENode, str]] = se_node.items
+        name: Union[SENode, str] = items[0] if items else ""
+        return name if isinstance(name, str) and not name.startswith('"') else ""
+
+
+# tokens_read():
+def tokens_read(text_file: TextIO, chunk_size: int = 1 << 16) -> Iterator[str]:
+    """ Return an iterator over the tokens in *text_file*.
+
+    The file is read *chunk_size* characters at a time, so only the current chunk
+    is kept in memory.
+    """
+    token_finditer = TOKEN_PATTERN.finditer
+    remainder: str = ""
+    at_end: bool = False
+    while not at_end:
+        chunk: str = text_file.read(chunk_size)
+        at_end = chunk == ""
+        buffer: str = remainder + chunk
+        remainder = ""
+        # The last token of *buffer* (along with anything after it that was not matched,
+        # such as a trailing backslash) may continue in the next chunk, so each token is
+        # held back in *last* until the next one is found:
+        last: Optional[Match] = None
+        match: Match
+        for match in token_finditer(buffer):
+            if last is not None:
+                yield last.group()
+            last = match
+            if match.group() == '"':
+                # An unterminated string runs to the end of *buffer*:
+                break
+        if not at_end:
+            remainder = buffer.lstrip() if last is None else buffer[last.start():]
+        elif last is not None:
+            token: str = last.group()
+            assert token != '"', "Unterminated string in S-expression"
+            yield token
+
+
+# atom_text():
+def atom_text(token: str) -> str:
+    """ Return the text of an atom *token* with any quotes and escapes removed. """
+    if token.startswith('"'):
+        token = token[1:-1]
+        if "\\" in token:
+            token = ESCAPE_PATTERN.sub(
+                lambda match: STRING_UNESCAPES.get(match.group(), match.group()), token)
+    elif "\\" in token:
+        token = ESCAPE_PATTERN.sub(
+            lambda match: SYMBOL_UNESCAPES.get(match.group(), match.group()), token)
+    return token
+
+
+# atom_token():
+def atom_token(text: str, quoted: bool = False) -> str:
+    """ Return *text* as an atom token, quoting it only if needed (or if *quoted*.)
+
+    KiCad 6 quotes every string it writes, so a token that replaces a quoted token
+    should be *quoted* to keep the file looking the way KiCad wrote it.
+    """
+    if not quoted and BARE_ATOM_PATTERN.fullmatch(text):
+        return text
+    raw: str
+    escaped: str
+    for raw, escaped in STRING_ESCAPES:
+        text = text.replace(raw, escaped)
+    return f'"{text}"'
+
+
+# atom_value_text():
+def atom_value_text(token: str) -> str:
+    """ Return the text of an atom *token* the way `str(sexpdata.loads(token))` would.
+
+    `sexpdata` converts bare atoms that look like numbers into *int* or *float*, so
+    a value like `0.10` comes back as `0.1`.  Component values have always gone through
+    that conversion, so it is preserved here.
+    """
+    if token.startswith('"'):
+        return atom_text(token)
+    assert token != "nil", f"strange part_name: {token}"
+    if token == "t":
+        return "True"
+    try:
+        return str(int(token))
+    except ValueError:
+        pass
+    try:
+        return str(float(token))
+    except ValueError:
+        pass
+    return atom_text(token)
+
+
+# tree_read():
+def tree_read(text_file: TextIO) -> SENode:
+    """ Parse the first S-expression in *text_file* into a tree of *SENode*'s. """
+    stack: List[SENode] = list()
+    token: str
+    for token in tokens_read(text_file):
+        if token == "(":
+            se_node: SENode = SENode(list())
+            if stack:
+                stack[-1].items.append(se_node)
+            stack.append(se_node)
+        elif token == ")":
+            assert stack, "Unbalanced ')' in S-expression"
+            se_node = stack.pop()
+            if not stack:
+                return se_node
+        else:
+            assert stack, f"Atom '{token}' is not in a list"
+            stack[-1].items.append(token)
+    assert False, "Unexpected end of S-expression"
+
+
+# tree_text():
+def tree_text(se_node: SENode) -> str:
+    """ Return *se_node* as S-expression text on a single line. """
+    chunks: List[str] = list()
+    chunks_append = chunks.append
+
+    # tree_text_append():
+    def tree_text_append(se_node: SENode) -> None:
+        chunks_append("(")
+        index: int
+        item: Union[SENode, str]
+        for index, item in enumerate(se_node.items):
+            if index > 0:
+                chunks_append(" ")
+            if isinstance(item, SENode):
+                tree_text_append(item)
+            else:
+                chunks_append(item)
+        chunks_append(")")
+
+    tree_text_append(se_node)
+    return "".join(chunks)
+
+
+# tree_write():
+def tree_write(se_node: SENode, text_file: TextIO, indents: Dict[str, int]) -> None:
+    """ Write *se_node* to *text_file* in one pass.
+
+    Every list whose name is in *indents* (and that is not the first item of its parent
+    and has something after its name) is started on a new line indented by the given
+    number of spaces.  Everything else is separated by a single space.
+    """
+    chunks: List[str] = list()
+    chunks_append = chunks.append
+    text_file_write = text_file.write
+
+    # tree_write_append():
+    def tree_write_append(se_node: SENode) -> None:
+        chunks_append("(")
+        index: int
+        item: Union[SENode, str]
+        for index, item in enumerate(se_node.items):
+            if isinstance(item, SENode):
+                if index > 0:
+                    indent: Optional[int] = indents.get(item.name)
+                    if indent is not None and len(item.items) > 1:
+                        chunks_append("\n" + " " * indent)
+                    else:
+                        chunks_append(" ")
+                tree_write_append(item)
+                if len(chunks) >= 4096:
+                    # Keep the pending output small:
+                    text_file_write("".join(chunks))
+                    chunks.clear()
+            else:
+                if index > 0:
+                    chunks_append(" ")
+                chunks_append(item)
+        chunks_append(")")
+
+    tree_write_append(se_node)
+    text_file_write("".join(chunks))
+
+
+# tree_file_write():
+def tree_file_write(se_node: SENode, file_name: str, indents: Dict[str, int]) -> None:
+    """ Replace *file_name* with *se_node* written out by *tree_write*().
+
+    The new contents are written to a temporary file in the same directory which then
+    replaces *file_name*, so *file_name* is never left partially written.
+    """
+    temporary_handle: int
+    temporary_file: TextIO
+    with files.file_replace(file_name) as temporary_handle, \
+            os.fdopen(temporary_handle, "w") as temporary_file:
+        tree_write(se_node, temporary_file, indents)
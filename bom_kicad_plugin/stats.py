@@ -0,0 +1,82 @@
+# MIT License
+#
+# Copyright (c) 2019 Wayne C. Gramlich
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+# A *ReadStats* object records where the time went while one file was read.  Each phase
+# has a total time (in seconds) and a count.  Statistics are only collected when
+# *Kicad.stats_enabled* is set, so the readers pay nothing for them otherwise.
+
+from typing import Any, Dict, List
+
+# The phases of a read:
+FILE_IO: str = "file_io"                        # Format sniffing and cache I/O
+PARSE: str = "parse"                            # Tokenizing/parsing into records
+COMPONENT_WALK: str = "component_walk"          # The record loop itself
+PROJECT_PART_FIND: str = "project_part_find"    # *bom.Project.project_part_find*() calls
+POSE_PART_CONSTRUCT: str = "pose_part_construct"  # *bom.PosePart*() construction
+POSE_PART_APPEND: str = "pose_part_append"      # *bom.Project.pose_part_append*() calls
+PHASES: List[str] = [FILE_IO, PARSE, COMPONENT_WALK, PROJECT_PART_FIND,
+                     POSE_PART_CONSTRUCT, POSE_PART_APPEND]
+
+
+# ReadStats:
+class ReadStats:
+
+    __slots__ = ("file_name", "seconds", "counts")
+
+    # ReadStats.__init__():
+    def __init__(self, file_name: str) -> None:
+        # Load up *read_stats* (i.e. *self*):
+        self.file_name: str = file_name
+        self.seconds: Dict[str, float] = {phase: 0.0 for phase in PHASES}
+        self.counts: Dict[str, int] = {phase: 0 for phase in PHASES}
+
+    # ReadStats.__str__():
+    def __str__(self) -> str:
+        read_stats: ReadStats = self
+        phases: str = ", ".join(f"{phase}={read_stats.seconds[phase]:.6f}s"
+                                f"/{read_stats.counts[phase]}" for phase in PHASES)
+        return f"ReadStats('{read_stats.file_name}', {phases})"
+
+    # ReadStats.add():
+    def add(self, phase: str, seconds: float, count: int = 1) -> None:
+        """ Add *seconds* and *count* to *phase*. """
+        read_stats: ReadStats = self
+        read_stats.seconds[phase] += seconds
+        read_stats.counts[phase] += count
+
+    # ReadStats.total_seconds():
+    def total_seconds(self) -> float:
+        """ Return the total time of all of the phases. """
+        read_stats: ReadStats = self
+        return sum(read_stats.seconds.values())
+
+    # ReadStats.metrics():
+    def metrics(self) -> Dict[str, Any]:
+        """ Return the statistics as a flat dictionary suitable for a metrics pipeline. """
+        read_stats: ReadStats = self
+        metrics: Dict[str, Any] = {"file_name": read_stats.file_name,
+                                   "total_seconds": read_stats.total_seconds()}
+        phase: str
+        for phase in PHASES:
+            metrics[f"{phase}_seconds"] = read_stats.seconds[phase]
+            metrics[f"{phase}_count"] = read_stats.counts[phase]
+        return metrics
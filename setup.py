@@ -50,6 +50,7 @@ setuptools.setup(
     description="BOM Manager plugin for accessing KiCAD files.",
     entry_points={
         "bom_manager_cad_get": ["cad_get=bom_kicad_plugin.kicad:cad_get"],
+        "console_scripts": ["bom_kicad_daemon=bom_kicad_plugin.daemon:main"],
     },
     include_package_data=True,
     install_requires=([] if is_test else [
@@ -0,0 +1,99 @@
+# MIT License
+#
+# Copyright (c) 2019 Wayne C. Gramlich
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+# Tests for the *ComponentCache*.
+
+from bom_kicad_plugin.cache import ComponentCache
+from bom_kicad_plugin.records import ComponentRecord
+import os
+from typing import List, NoReturn
+
+RECORDS: List[ComponentRecord] = [
+    ComponentRecord("R1", "10K", "1%", "Resistor_SMD:R_0603"),
+    ComponentRecord("C1", "0.1uF", "", ""),
+]
+
+
+# file_write():
+def file_write(file_name: str, text: str, mtime_ns: int) -> None:
+    """ Write *text* to *file_name* and give it the *mtime_ns* modification time. """
+    with open(file_name, "w") as text_file:
+        text_file.write(text)
+    os.utime(file_name, ns=(mtime_ns, mtime_ns))
+
+
+# test_round_trip():
+def test_round_trip(tmp_path) -> None:
+    """ Stored records come back until the file changes. """
+    file_name: str = str(tmp_path / "board.net")
+    file_write(file_name, "(export)", 1_000_000_000)
+    cache: ComponentCache = ComponentCache(str(tmp_path / "cache"))
+    assert cache.lookup(file_name) is None
+    cache.store(file_name, RECORDS)
+    assert cache.lookup(file_name) == RECORDS
+    assert (cache.hits, cache.misses) == (1, 1)
+
+    # A changed file is a miss (even with the same size and modification time):
+    file_write(file_name, "(EXPORT)", 1_000_000_000)
+    cache.digests.clear()
+    assert cache.lookup(file_name) is None
+
+
+# test_evict():
+def test_evict(tmp_path) -> None:
+    """ The least recently used entries are evicted once the cache is too big. """
+    cache_directory: str = str(tmp_path / "cache")
+    cache: ComponentCache = ComponentCache(cache_directory)
+    file_names: List[str] = list()
+    index: int
+    for index in range(4):
+        file_name: str = str(tmp_path / f"board{index}.net")
+        file_write(file_name, f"(export {index})", 1_000_000_000)
+        cache.store(file_name, RECORDS)
+        file_names.append(file_name)
+    entry_paths: List[str] = [cache.entry_path(file_name) for file_name in file_names]
+    entry_size: int = os.path.getsize(entry_paths[0])
+    for index, entry_path in enumerate(entry_paths):
+        os.utime(entry_path, ns=(index * 1_000_000_000, index * 1_000_000_000))
+
+    # Only room for two entries, so the two oldest ones go:
+    cache.maximum_size = 2 * entry_size
+    cache.evict()
+    assert [os.path.exists(entry_path) for entry_path in entry_paths] == [
+        False, False, True, True]
+    assert cache.lookup(file_names[3]) == RECORDS
+
+
+# test_store_failure():
+def test_store_failure(tmp_path, monkeypatch) -> None:
+    """ A failed store is ignored and does not leave its temporary file behind. """
+    file_name: str = str(tmp_path / "board.net")
+    file_write(file_name, "(export)", 1_000_000_000)
+    cache_directory: str = str(tmp_path / "cache")
+    cache: ComponentCache = ComponentCache(cache_directory)
+
+    # replace_fail():
+    def replace_fail(source: str, destination: str) -> NoReturn:
+        raise OSError("No space left on device")
+    monkeypatch.setattr(os, "replace", replace_fail)
+    cache.store(file_name, RECORDS)
+    assert os.listdir(cache_directory) == []
@@ -0,0 +1,82 @@
+# MIT License
+#
+# Copyright (c) 2019 Wayne C. Gramlich
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+# Tests for extracting the connectivity of a KiCad `.net` file.
+
+from bom_kicad_plugin import connectivity
+from bom_kicad_plugin.connectivity import Connectivity
+from typing import List, Tuple
+
+# The usual KiCad layout, with a KiCad 6 `pinfunction` and a net without any nodes:
+NETS_TEXT: str = (
+    '(export (version D)\n'
+    '  (components\n'
+    '    (comp (ref R1) (value 10K)))\n'
+    '  (nets\n'
+    '    (net (code 1) (name GND)\n'
+    '      (node (ref R1) (pin 2))\n'
+    '      (node (ref C1) (pin 1) (pinfunction "-")))\n'
+    '    (net (code 2) (name "/a b")\n'
+    '      (node (ref R1) (pin 1)))\n'
+    '    (net (code 3) (name "Net-(U1-Pad3)"))))\n')
+
+
+# nets_get():
+def nets_get(connectivity_: Connectivity) -> List[Tuple[str, List[List[str]]]]:
+    """ Return each net name with its [reference, pin] nodes. """
+    return [(net_name, connectivity_.net_nodes(net_name))
+            for net_name in connectivity_.net_names]
+
+
+# test_layouts_agree():
+def test_layouts_agree() -> None:
+    """ The same nets are found on one line, out of order and in the usual layout. """
+    expected = nets_get(connectivity.connectivity_bytes_scan(NETS_TEXT.encode()))
+    assert [net_name for net_name, nodes in expected] == ["GND", "/a b", "Net-(U1-Pad3)"]
+    assert expected[0][1] == [["R1", "2"], ["C1", "1"]]
+
+    # All on one line (i.e. `(nets` does not start a line):
+    one_line: bytes = " ".join(NETS_TEXT.split()).encode()
+    assert nets_get(connectivity.connectivity_bytes_scan(one_line)) == expected
+
+    # The pin before the reference (i.e. the fast scan misses the nodes):
+    swapped: bytes = NETS_TEXT.replace("(ref R1) (pin 1)", "(pin 1) (ref R1)").encode()
+    assert nets_get(connectivity.connectivity_bytes_scan(swapped)) == expected
+
+
+# test_no_nets():
+def test_no_nets() -> None:
+    """ A net file without a nets section (even a mention of one) has no nets. """
+    text: bytes = b'(export (version D) (components (comp (ref R1) (value "(nets"))))'
+    assert connectivity.connectivity_bytes_scan(text).net_names == []
+
+
+# test_bytes_count_windows():
+def test_bytes_count_windows(monkeypatch) -> None:
+    """ Counting a window at a time finds every occurrence exactly once. """
+    data: bytes = b"(node(node (nodes x(node" * 7
+    window_size: int
+    for window_size in range(1, 12):
+        monkeypatch.setattr(connectivity, "COUNT_WINDOW_SIZE", window_size)
+        start: int
+        for start in (0, 3, 10):
+            assert connectivity.bytes_count(data, b"(node", start) == data[start:].count(b"(node")
@@ -0,0 +1,109 @@
+# MIT License
+#
+# Copyright (c) 2019 Wayne C. Gramlich
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+# Tests for the streaming CSV readers.
+
+import pytest
+pytest.importorskip("bom_manager")
+
+from benchmarks import synthetic  # noqa: E402
+from bom_kicad_plugin.altium_csv import altium_csv_records_read  # noqa: E402
+from bom_kicad_plugin.kicad_csv import (  # noqa: E402
+    bom_csv_grouped_by_value_with_fp_records_read)
+from bom_kicad_plugin.records import ComponentRecord, part_name_split  # noqa: E402
+import csv  # noqa: E402
+from typing import List, TextIO  # noqa: E402
+
+
+# altium_csv_list_read():
+def altium_csv_list_read(csv_file_name: str) -> List[ComponentRecord]:
+    """ Return the records of an Altium file the way the reader did before streaming. """
+    csv_file: TextIO
+    with open(csv_file_name, encoding="iso-8859-1") as csv_file:
+        csv_rows: List[List[str]] = list(csv.reader(csv_file, delimiter=",", quotechar='"'))
+    return [ComponentRecord(designator.strip(), row[1], "", "")
+            for row in csv_rows[2:] for designator in row[3].split(",")]
+
+
+# bom_csv_grouped_list_read():
+def bom_csv_grouped_list_read(csv_file_name: str) -> List[ComponentRecord]:
+    """ Return the records of a KiCad grouped BOM the way the reader did before streaming. """
+    csv_file: TextIO
+    with open(csv_file_name) as csv_file:
+        csv_rows: List[List[str]] = list(csv.reader(csv_file, delimiter=",", quotechar='"'))
+    component_count: int = int(csv_rows[4][1])
+    records: List[ComponentRecord] = list()
+    row: List[str]
+    for row in csv_rows[6:6 + component_count]:
+        part_name: str
+        comment: str
+        part_name, comment = part_name_split(row[2])
+        records.extend(ComponentRecord(reference.strip(), part_name, comment, row[4])
+                       for reference in row[0].split(","))
+    return records
+
+
+# test_altium_csv_rows_match():
+@pytest.mark.parametrize("count", [1, 500])
+def test_altium_csv_rows_match(tmp_path, count: int) -> None:
+    """ The streamed Altium records are the same as the ones from reading all rows first. """
+    csv_file_name: str = str(tmp_path / "bom.csv")
+    synthetic.altium_csv_write(csv_file_name, count)
+    records: List[ComponentRecord] = list(altium_csv_records_read(csv_file_name))
+    assert records == altium_csv_list_read(csv_file_name) and len(records) == count
+
+
+# test_bom_csv_grouped_rows_match():
+@pytest.mark.parametrize("count", [1, 500])
+def test_bom_csv_grouped_rows_match(tmp_path, count: int) -> None:
+    """ The streamed grouped BOM records are the same as the ones from reading all rows. """
+    csv_file_name: str = str(tmp_path / "bom.csv")
+    synthetic.bom_csv_grouped_by_value_with_fp_write(csv_file_name, count)
+    records: List[ComponentRecord] = list(
+        bom_csv_grouped_by_value_with_fp_records_read(csv_file_name))
+    assert records == bom_csv_grouped_list_read(csv_file_name) and len(records) == count
+
+
+# test_bad_headers_fail_right_away():
+def test_bad_headers_fail_right_away(tmp_path) -> None:
+    """ A file with the wrong headers fails on the call rather than on the first record. """
+    csv_file_name: str = str(tmp_path / "altium.csv")
+    synthetic.altium_csv_write(csv_file_name, 10)
+    with open(csv_file_name, encoding="iso-8859-1") as csv_file:
+        text: str = csv_file.read()
+    with open(csv_file_name, "w", encoding="iso-8859-1") as csv_file:
+        csv_file.write(text.replace("Supplier Subtotal 1", "Subtotal", 1))
+    with pytest.raises(AssertionError, match="index=12"):
+        altium_csv_records_read(csv_file_name)
+
+    csv_file_name = str(tmp_path / "grouped.csv")
+    synthetic.bom_csv_grouped_by_value_with_fp_write(csv_file_name, 10)
+    with open(csv_file_name) as csv_file:
+        text = csv_file.read()
+    with open(csv_file_name, "w") as csv_file:
+        csv_file.write(text.replace('"Cmp name"', '"Component"', 1))
+    with pytest.raises(AssertionError, match="index=3"):
+        bom_csv_grouped_by_value_with_fp_records_read(csv_file_name)
+    with open(csv_file_name, "w") as csv_file:
+        csv_file.write(text.replace("bom_csv_grouped_by_value_with_fp.py", "bom2csv.py", 1))
+    with pytest.raises(AssertionError, match="which is not supported yet"):
+        bom_csv_grouped_by_value_with_fp_records_read(csv_file_name)
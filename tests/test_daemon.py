@@ -0,0 +1,187 @@
+# MIT License
+#
+# Copyright (c) 2019 Wayne C. Gramlich
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+# Tests for the watch daemon.
+
+import pytest
+pytest.importorskip("bom_manager")
+
+from benchmarks import synthetic  # noqa: E402
+from bom_kicad_plugin import daemon, netlist  # noqa: E402
+from bom_kicad_plugin.daemon import WatchDaemon, WatchedFile, daemon_query  # noqa: E402
+from bom_kicad_plugin.records import ComponentRecord  # noqa: E402
+import json  # noqa: E402
+import os  # noqa: E402
+import socket  # noqa: E402
+import sys  # noqa: E402
+import threading  # noqa: E402
+import time  # noqa: E402
+from typing import Any, List  # noqa: E402
+
+
+# test_refresh_error_recorded():
+def test_refresh_error_recorded(tmp_path) -> None:
+    """ A file that fails to parse records its error and keeps the previous records. """
+    net_file_name: str = str(tmp_path / "board.net")
+    synthetic.net_file_write(net_file_name, 20, 1)
+    # An Altium CSV file with a short header raises an *IndexError* in the reader:
+    csv_file_name: str = str(tmp_path / "short.csv")
+    with open(csv_file_name, "w") as csv_file:
+        csv_file.write("Line #,Name,Description,Designator\n")
+    watch_daemon: WatchDaemon = WatchDaemon([net_file_name, csv_file_name])
+    assert watch_daemon.poll() == [net_file_name]
+    csv_watched: WatchedFile = watch_daemon.watched_files[csv_file_name]
+    assert csv_watched.error != "" and csv_watched.records == []
+    assert len(watch_daemon.watched_files[net_file_name].records) == 20
+
+    # A broken rewrite of the net file keeps the old records and reports the error:
+    with open(net_file_name, "w") as net_file:
+        net_file.write("(export (components (comp (ref R1)")
+    os.utime(net_file_name, ns=(1, 1))
+    assert watch_daemon.poll() == []
+    net_watched: WatchedFile = watch_daemon.watched_files[net_file_name]
+    assert net_watched.error != "" and len(net_watched.records) == 20
+    status: dict = json.loads(watch_daemon.request_handle('{"command": "status"}'))
+    assert status["ok"] and all(entry["error"] for entry in status["files"])
+
+
+# test_file_needed():
+def test_file_needed(tmp_path) -> None:
+    """ A request without a "file" is only allowed when one file is watched. """
+    file_names: List[str] = [str(tmp_path / "a.net"), str(tmp_path / "b.net")]
+    file_name: str
+    for file_name in file_names:
+        synthetic.net_file_write(file_name, 5, 1)
+    watch_daemon: WatchDaemon = WatchDaemon(file_names)
+    watch_daemon.poll()
+    response: dict = json.loads(watch_daemon.request_handle('{"command": "parts"}'))
+    assert response == {"ok": False,
+                        "error": "Request needs a 'file' when several files are watched"}
+
+    watch_daemon = WatchDaemon(file_names[:1])
+    watch_daemon.poll()
+    response = json.loads(watch_daemon.request_handle('{"command": "parts"}'))
+    assert response["ok"] and response["file"] == file_names[0]
+
+
+# test_query_not_json():
+def test_query_not_json(monkeypatch, capsys) -> None:
+    """ A `--query` that is not JSON is a usage error rather than a traceback. """
+    monkeypatch.setattr(sys, "argv", ["daemon", "--socket", "unused.sock", "--query", "notjson"])
+    with pytest.raises(SystemExit) as exit_info:
+        daemon.main()
+    assert exit_info.value.code == 2
+    assert "--query is not valid JSON" in capsys.readouterr().err
+
+
+# test_polls_serialized():
+def test_polls_serialized(tmp_path, monkeypatch) -> None:
+    """ A "refresh" request and the poller never parse the same change twice. """
+    net_file_name: str = str(tmp_path / "board.net")
+    synthetic.net_file_write(net_file_name, 5, 1)
+    watch_daemon: WatchDaemon = WatchDaemon([net_file_name])
+    file_records_get = watch_daemon.kicad.file_records_get
+    parses: List[str] = list()
+
+    # file_records_get_slow():
+    def file_records_get_slow(file_name: str) -> Any:
+        parses.append(file_name)
+        time.sleep(0.2)
+        return file_records_get(file_name)
+    monkeypatch.setattr(watch_daemon.kicad, "file_records_get", file_records_get_slow)
+
+    poller: threading.Thread = threading.Thread(target=watch_daemon.poll)
+    poller.start()
+    response: dict = json.loads(watch_daemon.request_handle('{"command": "refresh"}'))
+    poller.join()
+    assert response["ok"] and parses == [net_file_name]
+
+
+# raw_query():
+def raw_query(socket_name: str, request_text: str) -> dict:
+    """ Send the *request_text* line to the daemon on *socket_name* and return the reply. """
+    client: socket.socket
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as client:
+        client.settimeout(10.0)
+        client.connect(socket_name)
+        client.sendall(request_text.encode("utf-8") + b"\n")
+        with client.makefile("rb") as reply_file:
+            return json.loads(reply_file.readline().decode("utf-8"))
+
+
+# test_socket_protocol():
+def test_socket_protocol(tmp_path) -> None:
+    """ Every command works over the socket of a running daemon. """
+    net_file_name: str = str(tmp_path / "board.net")
+    synthetic.net_file_write(net_file_name, 20, 1)
+    records: List[ComponentRecord] = list(netlist.net_file_records_read(net_file_name))
+    socket_name: str = str(tmp_path / "bom.sock")
+    watch_daemon: WatchDaemon = WatchDaemon([net_file_name], interval=60.0)
+    server: threading.Thread = threading.Thread(target=watch_daemon.serve, args=(socket_name,))
+    server.start()
+    try:
+        # Wait for the first poll to finish and the socket to show up:
+        deadline: float = time.monotonic() + 10.0
+        while watch_daemon.server is None and time.monotonic() < deadline:
+            time.sleep(0.01)
+        assert watch_daemon.server is not None, "Daemon did not start"
+
+        status: dict = daemon_query(socket_name, {"command": "status"})
+        assert status["ok"] and [(entry["file"], entry["components"], entry["error"])
+                                 for entry in status["files"]] == [(net_file_name, 20, "")]
+
+        components: dict = daemon_query(socket_name, {"command": "components",
+                                                      "file": net_file_name})
+        assert components == {"ok": True, "file": net_file_name,
+                              "components": [list(record) for record in records]}
+
+        record: ComponentRecord = records[3]
+        reference: dict = daemon_query(socket_name, {"command": "reference",
+                                                     "reference": record.reference})
+        assert reference == {"ok": True, "reference": record.reference,
+                             "files": {net_file_name: list(record)}}
+
+        part: dict = daemon_query(socket_name, {"command": "part",
+                                                "part_name": record.part_name})
+        assert part["ok"] and record.reference in part["files"][net_file_name]
+        parts: dict = daemon_query(socket_name, {"command": "parts"})
+        assert parts["ok"] and sum(parts["parts"].values()) == 20
+
+        # A changed file is picked up by a "refresh" (rather than the next poll):
+        synthetic.net_file_write(net_file_name, 30, 2)
+        os.utime(net_file_name, ns=(1, 1))
+        refresh: dict = daemon_query(socket_name, {"command": "refresh"})
+        assert refresh == {"ok": True, "refreshed": [net_file_name]}
+        status = daemon_query(socket_name, {"command": "status"})
+        assert status["files"][0]["components"] == 30 and status["files"][0]["reads"] == 2
+
+        # Bad requests get an error rather than closing the connection:
+        assert daemon_query(socket_name, {"command": "explode"}) == {
+            "ok": False, "error": "Unknown command 'explode'"}
+        assert raw_query(socket_name, "[1, 2]") == {
+            "ok": False, "error": "Request is not a JSON object"}
+        not_json: dict = raw_query(socket_name, "notjson")
+        assert not not_json["ok"] and not_json["error"]
+    finally:
+        watch_daemon.shutdown()
+        server.join(10.0)
+    assert not server.is_alive() and not os.path.exists(socket_name)
@@ -0,0 +1,70 @@
+# MIT License
+#
+# Copyright (c) 2019 Wayne C. Gramlich
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+# Tests for *file_replace*() and the files written with it.
+
+from bom_kicad_plugin import columnar, files
+from bom_kicad_plugin.records import ComponentRecord
+import os
+import pytest
+import stat
+
+
+# test_file_replace_new_mode():
+def test_file_replace_new_mode(tmp_path) -> None:
+    """ A new component table gets the permissions *open*() would have given it. """
+    table_name: str = str(tmp_path / "table.bin")
+    component_table: columnar.ComponentTable = columnar.ComponentTable()
+    component_table.records_extend([ComponentRecord("R1", "10K", "1%", "R_0603")], "a.net")
+    component_table.write(table_name)
+    assert stat.S_IMODE(os.stat(table_name).st_mode) == files.NEW_FILE_MODE
+
+    loaded_table: columnar.ComponentTable = columnar.table_load(table_name)
+    try:
+        assert loaded_table[0] == ComponentRecord("R1", "10K", "1%", "R_0603")
+    finally:
+        loaded_table.close()
+    assert os.listdir(str(tmp_path)) == ["table.bin"]
+
+
+# test_file_replace_keeps_mode():
+def test_file_replace_keeps_mode(tmp_path) -> None:
+    """ A replaced file keeps its permissions and a failed write leaves it untouched. """
+    file_name: str = str(tmp_path / "a.net")
+    with open(file_name, "w") as text_file:
+        text_file.write("old")
+    os.chmod(file_name, 0o640)
+
+    temporary_handle: int
+    with files.file_replace(file_name) as temporary_handle, \
+            os.fdopen(temporary_handle, "w") as text_file:
+        text_file.write("new")
+    assert stat.S_IMODE(os.stat(file_name).st_mode) == 0o640
+
+    with pytest.raises(ValueError):
+        with files.file_replace(file_name) as temporary_handle, \
+                os.fdopen(temporary_handle, "w") as text_file:
+            text_file.write("partial")
+            raise ValueError("write failed")
+    with open(file_name) as text_file:
+        assert text_file.read() == "new"
+    assert os.listdir(str(tmp_path)) == ["a.net"]
@@ -0,0 +1,96 @@
+# MIT License
+#
+# Copyright (c) 2019 Wayne C. Gramlich
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+# Tests for picking the reader of a file from its contents.
+
+import pytest
+pytest.importorskip("bom_manager")
+
+from benchmarks import synthetic  # noqa: E402
+from bom_manager import bom  # noqa: E402
+from bom_kicad_plugin import formats  # noqa: E402
+from bom_kicad_plugin.kicad import Kicad  # noqa: E402
+from typing import Callable, Optional  # noqa: E402
+
+# A root schematic with no symbols in it:
+EMPTY_SCHEMATIC: str = '(kicad_sch (version 20211123) (generator eeschema)\n  (uuid "root"))\n'
+
+
+# schematic_write():
+def schematic_write(file_name: str, count: int) -> None:
+    """ Write an empty schematic to *file_name* (*count* is ignored.) """
+    with open(file_name, "w") as schematic_file:
+        schematic_file.write(EMPTY_SCHEMATIC)
+
+
+# The name of each format along with a writer of a sample file in that format:
+SAMPLES = [
+    ("Altium BOM CSV", synthetic.altium_csv_write),
+    ("KiCad bom_csv_grouped_by_value_with_fp CSV",
+     synthetic.bom_csv_grouped_by_value_with_fp_write),
+    ("KiCad netlist", synthetic.net_file_write),
+    ("KiCad schematic", schematic_write),
+]
+
+
+# test_format_found_by_contents():
+@pytest.mark.parametrize("name,sample_write", SAMPLES, ids=[name for name, _ in SAMPLES])
+@pytest.mark.parametrize("suffix", [".txt", ".csv", ".net", ".kicad_sch"])
+def test_format_found_by_contents(tmp_path, name: str,
+                                  sample_write: Callable[[str, int], None],
+                                  suffix: str) -> None:
+    """ Each format is found from its contents whatever the suffix of the file is. """
+    file_name: str = str(tmp_path / f"sample{suffix}")
+    sample_write(file_name, 10)
+    file_format: Optional[formats.FileFormat] = formats.file_format_find(file_name)
+    assert file_format is not None and file_format.name == name
+
+
+# test_contents_beat_suffix():
+def test_contents_beat_suffix(tmp_path) -> None:
+    """ A netlist saved with a `.csv` suffix is read as a netlist. """
+    file_name: str = str(tmp_path / "board.csv")
+    synthetic.net_file_write(file_name, 25)
+    project: bom.Project = bom.Project()
+    assert Kicad().file_read(file_name, project)
+    assert len(project.all_pose_parts) == 25
+
+
+# test_no_format_matched():
+def test_no_format_matched(tmp_path) -> None:
+    """ A known suffix with unknown contents is an error; an unknown suffix is not read. """
+    file_name: str = str(tmp_path / "board.csv")
+    with open(file_name, "w") as text_file:
+        text_file.write("Part,Quantity\nR1,1\n")
+    message: str = (f"File '{file_name}' is not in any of the known formats "
+                    "('Altium BOM CSV', 'KiCad bom_csv_grouped_by_value_with_fp CSV')")
+    with pytest.raises(AssertionError) as error_info:
+        formats.file_format_find(file_name)
+    assert str(error_info.value) == message
+    with pytest.raises(AssertionError, match="is not in any of the known formats"):
+        Kicad().file_read(file_name, bom.Project())
+
+    file_name = str(tmp_path / "notes.txt")
+    with open(file_name, "w") as text_file:
+        text_file.write("Part,Quantity\nR1,1\n")
+    assert formats.file_format_find(file_name) is None
+    assert not Kicad().file_read(file_name, bom.Project())
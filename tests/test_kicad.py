@@ -0,0 +1,304 @@
+# MIT License
+#
+# Copyright (c) 2019 Wayne C. Gramlich
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+# Tests for reading files into projects through *Kicad*.
+
+import pytest
+pytest.importorskip("bom_manager")
+
+from benchmarks import synthetic  # noqa: E402
+from bom_manager import bom  # noqa: E402
+from bom_kicad_plugin import netlist  # noqa: E402
+from bom_kicad_plugin.indexes import PosePartIndex  # noqa: E402
+from bom_kicad_plugin.kicad import Kicad  # noqa: E402
+import gc  # noqa: E402
+import shutil  # noqa: E402
+from typing import Any, Dict, List, Optional, Tuple  # noqa: E402
+
+
+# pose_references():
+def pose_references(project: bom.Project) -> List[str]:
+    """ Return the references of the pose parts of *project* in order. """
+    return [pose_part.reference for pose_part in project.all_pose_parts]
+
+
+# test_file_read_chunked():
+def test_file_read_chunked(tmp_path, monkeypatch) -> None:
+    """ *file_read*() and *files_read*() split a net file up when *net_workers* is set. """
+    net_file_name: str = str(tmp_path / "board.net")
+    synthetic.net_file_write(net_file_name, 300, 1)
+    expected: List[str] = [record.reference
+                           for record in netlist.net_file_records_read(net_file_name)]
+
+    # Spy on the chunked reader and make the file big enough to split up:
+    calls: List[int] = list()
+    chunks_read = netlist.net_file_chunks_read
+
+    # net_file_chunks_read_spy():
+    def net_file_chunks_read_spy(file_name: str, workers: int) -> Optional[Any]:
+        calls.append(workers)
+        return chunks_read(file_name, workers)
+    monkeypatch.setattr(netlist, "net_file_chunks_read", net_file_chunks_read_spy)
+    monkeypatch.setattr(netlist, "CHUNK_SIZE_MINIMUM", 1000)
+
+    kicad: Kicad = Kicad()
+    kicad.net_workers = 3
+    project: bom.Project = bom.Project()
+    assert kicad.file_read(net_file_name, project)
+    assert calls == [3] and pose_references(project) == expected
+
+    projects: List[bom.Project] = list()
+
+    # project_create():
+    def project_create(file_name: str) -> bom.Project:
+        projects.append(bom.Project())
+        return projects[-1]
+    assert kicad.files_read([net_file_name], project_create) == [True]
+    assert calls == [3, 3] and pose_references(projects[0]) == expected
+
+
+# A KiCad 6 net file (every string quoted) and the same one the way KiCad 5 wrote it:
+KICAD6_NET: str = """(export (version "D")
+  (design
+    (source "/home/user/board.kicad_sch")
+    (tool "Eeschema 6.0.0"))
+  (components
+    (comp (ref "R1")
+      (value "10K:1%")
+      (footprint "Resistor_SMD:R_0603_1608Metric")
+      (tstamps "0a1b"))
+    (comp (ref "C1")
+      (value "0.1uF")
+      (tstamps "2c3d")))
+  (nets
+    (net (code "1") (name "GND")
+      (node (ref "C1") (pin "2")))))
+"""
+KICAD5_NET: str = KICAD6_NET.replace('"', "").replace("Eeschema 6.0.0", '"Eeschema 5.1.0"')
+
+
+# test_footprints_patch_matches_update():
+@pytest.mark.parametrize("net_text", [KICAD5_NET, KICAD6_NET], ids=["kicad5", "kicad6"])
+def test_footprints_patch_matches_update(tmp_path, monkeypatch, net_text: str) -> None:
+    """ Patching the footprints in place writes the same bytes as writing the tree back. """
+    from bom_kicad_plugin import sexpression
+
+    # Start from the file the way *tree_write*() lays it out:
+    original_name: str = str(tmp_path / "original.net")
+    with open(original_name, "w") as original_file:
+        original_file.write(net_text)
+    with open(original_name) as original_file:
+        net_se: sexpression.SENode = sexpression.tree_read(original_file)
+    sexpression.tree_file_write(net_se, original_name, sexpression.KICAD_NET_INDENTS)
+
+    # R1 gets a different footprint and C1 (which has none) gets one added:
+    footprints: Dict[str, str] = {"10K": "Resistor_SMD:R_0805_2012Metric", "0.1uF": "C_0402"}
+    monkeypatch.setattr(bom.ProjectPart, "kicad_footprint",
+                        property(lambda project_part: footprints[project_part.name]),
+                        raising=False)
+    net_bytes: Dict[bool, bytes] = dict()
+    footprints_patch: bool
+    for footprints_patch in (False, True):
+        net_file_name: str = str(tmp_path / f"patch{footprints_patch}.net")
+        shutil.copyfile(original_name, net_file_name)
+        kicad: Kicad = Kicad()
+        kicad.footprints_update = True
+        kicad.footprints_patch = footprints_patch
+        assert kicad.net_file_read(net_file_name, bom.Project())
+        with open(net_file_name, "rb") as net_file:
+            net_bytes[footprints_patch] = net_file.read()
+    assert net_bytes[True] == net_bytes[False]
+
+    # Footprints are only quoted in a file where KiCad quoted them:
+    quote: str = '"' if net_text is KICAD6_NET else ""
+    assert (f"(footprint {quote}Resistor_SMD:R_0805_2012Metric{quote})".encode()
+            in net_bytes[True])
+    assert f"(footprint {quote}common:C_0402{quote})".encode() in net_bytes[True]
+
+
+# test_index_per_project():
+def test_index_per_project(tmp_path) -> None:
+    """ Each project gets its own index, so the same reference never collides. """
+    file_names: List[str] = [str(tmp_path / "a.net"), str(tmp_path / "b.net")]
+    synthetic.net_file_write(file_names[0], 50, 1)
+    synthetic.net_file_write(file_names[1], 80, 2)
+
+    projects: List[bom.Project] = list()
+
+    # project_create():
+    def project_create(file_name: str) -> bom.Project:
+        projects.append(bom.Project())
+        return projects[-1]
+    kicad: Kicad = Kicad()
+    kicad.index_enabled = True
+    assert kicad.files_read(file_names, project_create) == [True, True]
+    assert len(kicad.indexes) == 2
+    # Both files start with the same reference (i.e. `C1`):
+    assert projects[0].all_pose_parts[0].reference == projects[1].all_pose_parts[0].reference
+
+    project: bom.Project
+    for project in projects:
+        index: Optional[PosePartIndex] = kicad.index_get(project)
+        assert index is not None and len(index) == len(project.all_pose_parts)
+        reference: str = project.all_pose_parts[0].reference
+        pose_part: Optional[bom.PosePart] = index.pose_part_find(reference)
+        assert pose_part is project.all_pose_parts[0] and pose_part.project is project
+
+    # Nothing is indexed unless it is enabled:
+    assert Kicad().index_get(projects[0]) is None
+
+
+# net_text():
+def net_text(components: List[Tuple[str, str, str]]) -> str:
+    """ Return a net file with the (reference, value, time stamp) *components*. """
+    return ("(export (version D)\n  (components" +
+            "".join(f"\n    (comp (ref {reference})\n      (value {value})\n"
+                    f"      (footprint Lib:{value})\n      (tstamp {tstamp}))"
+                    for reference, value, tstamp in components) +
+            ")\n  (nets))\n")
+
+
+# pose_parts_summary():
+def pose_parts_summary(project: bom.Project) -> List[Tuple[str, str, str]]:
+    """ Return the (reference, part name, comment) of each pose part of *project*. """
+    return [(pose_part.reference, pose_part.project_part.name, pose_part.comment)
+            for pose_part in project.all_pose_parts]
+
+
+# test_net_file_incremental_read():
+def test_net_file_incremental_read(tmp_path) -> None:
+    """ Reading an edited net file again leaves the project the same as a fresh read. """
+    net_file_name: str = str(tmp_path / "board.net")
+    kicad: Kicad = Kicad()
+    kicad.net_incremental = True
+    project: bom.Project = bom.Project()
+
+    # fresh_summary():
+    def fresh_summary() -> List[Tuple[str, str, str]]:
+        fresh_project: bom.Project = bom.Project()
+        assert Kicad().net_file_read(net_file_name, fresh_project)
+        return pose_parts_summary(fresh_project)
+
+    # The first read is a plain read:
+    with open(net_file_name, "w") as net_file:
+        net_file.write(net_text([("R1", "10K", "A1"), ("C1", "0.1uF", "A2"),
+                                 ("R2", "4.7K:1%", "A3")]))
+    assert kicad.net_file_read(net_file_name, project)
+    assert pose_parts_summary(project) == fresh_summary()
+    r2_pose_part: bom.PosePart = project.all_pose_parts[2]
+
+    # Change the value of R1, remove C1 and add D1:
+    with open(net_file_name, "w") as net_file:
+        net_file.write(net_text([("R1", "10K:5%", "A1"), ("R2", "4.7K:1%", "A3"),
+                                 ("D1", "LED", "A4")]))
+    assert kicad.net_file_read(net_file_name, project)
+    assert pose_parts_summary(project) == fresh_summary() == [
+        ("R1", "10K", "5%"), ("R2", "4.7K", "1%"), ("D1", "LED", "")]
+    assert project.all_pose_parts[1] is r2_pose_part
+
+    # Reading it again without changes leaves the pose parts alone:
+    pose_parts: List[bom.PosePart] = list(project.all_pose_parts)
+    assert kicad.net_file_read(net_file_name, project)
+    assert project.all_pose_parts == pose_parts
+    assert all(pose_part is previous_pose_part for pose_part, previous_pose_part
+               in zip(project.all_pose_parts, pose_parts))
+
+    # A different project starts over and must be empty:
+    with pytest.raises(AssertionError):
+        kicad.net_file_read(net_file_name, project_with_parts())
+
+
+# project_with_parts():
+def project_with_parts() -> bom.Project:
+    """ Return a project that already has a pose part in it. """
+    project: bom.Project = bom.Project()
+    project.pose_part_append(bom.PosePart(project, project.project_part_find("X"), "X1", ""))
+    return project
+
+
+# test_pose_parts_go_through_project():
+def test_pose_parts_go_through_project(tmp_path, monkeypatch) -> None:
+    """ Every pose part is added with *bom.Project.pose_part_append*(). """
+    net_file_name: str = str(tmp_path / "board.net")
+    synthetic.net_file_write(net_file_name, 30, 1)
+    appended: List[str] = list()
+    pose_part_append = bom.Project.pose_part_append
+
+    # pose_part_append_spy():
+    def pose_part_append_spy(project: bom.Project, pose_part: bom.PosePart) -> None:
+        appended.append(pose_part.reference)
+        pose_part_append(project, pose_part)
+    monkeypatch.setattr(bom.Project, "pose_part_append", pose_part_append_spy)
+    project: bom.Project = bom.Project()
+    assert Kicad().file_read(net_file_name, project)
+    assert appended == pose_references(project) and len(appended) == 30
+
+
+# test_files_read_bad_file():
+@pytest.mark.parametrize("workers", [1, 2])
+def test_files_read_bad_file(tmp_path, workers: int) -> None:
+    """ One file that can not be read does not stop the rest of the batch. """
+    file_names: List[str] = [str(tmp_path / name) for name in ("a.net", "bad.csv", "c.net")]
+    synthetic.net_file_write(file_names[0], 10, 1)
+    with open(file_names[1], "w") as bad_file:
+        bad_file.write("Part,Quantity\nR1,1\n")
+    synthetic.net_file_write(file_names[2], 20, 2)
+
+    projects: List[bom.Project] = list()
+
+    # project_create():
+    def project_create(file_name: str) -> bom.Project:
+        projects.append(bom.Project())
+        return projects[-1]
+    kicad: Kicad = Kicad()
+    assert kicad.files_read(file_names, project_create, workers) == [True, False, True]
+    assert [len(project.all_pose_parts) for project in projects] == [10, 0, 20]
+    assert list(kicad.read_errors) == [file_names[1]]
+    assert "is not in any of the known formats" in kicad.read_errors[file_names[1]]
+
+
+# test_index_follows_project():
+def test_index_follows_project(tmp_path) -> None:
+    """ An index goes away with its project and is rebuilt when a re-read changes it. """
+    net_file_name: str = str(tmp_path / "board.net")
+    with open(net_file_name, "w") as net_file:
+        net_file.write(net_text([("R1", "10K", "A1"), ("C1", "0.1uF", "A2")]))
+    kicad: Kicad = Kicad()
+    kicad.index_enabled = True
+    project: Optional[bom.Project] = bom.Project()
+    assert project is not None and kicad.file_read(net_file_name, project)
+    assert len(kicad.indexes) == 1
+    project = None
+    gc.collect()
+    assert len(kicad.indexes) == 0
+
+    # An incremental read that changes the project leaves an index of its pose parts:
+    kicad.net_incremental = True
+    project = bom.Project()
+    assert kicad.net_file_read(net_file_name, project)
+    with open(net_file_name, "w") as net_file:
+        net_file.write(net_text([("R1", "10K", "A1"), ("D1", "LED", "A3")]))
+    assert kicad.net_file_read(net_file_name, project)
+    index: Optional[PosePartIndex] = kicad.index_get(project)
+    assert index is not None and index.pose_part_find("C1") is None
+    assert index.pose_part_find("D1") is project.all_pose_parts[1]
+    assert index.part_references_find("LED") == ["D1"]
@@ -0,0 +1,119 @@
+# MIT License
+#
+# Copyright (c) 2019 Wayne C. Gramlich
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+# Tests that the different ways of reading a KiCad `.net` file agree.
+
+import pytest
+pytest.importorskip("bom_manager")
+
+from benchmarks import synthetic  # noqa: E402
+from bom_kicad_plugin import netlist, netscan, sexpression  # noqa: E402
+from bom_kicad_plugin.records import ComponentRecord, part_name_split  # noqa: E402
+from typing import List, Optional, TextIO  # noqa: E402
+
+# A hand written net file with the awkward cases in it: quoted values and footprints,
+# escapes, a missing footprint, a number-like value and components out of order:
+AWKWARD_NET: str = (
+    '(export (version D)\n'
+    '  (design (source "a b.sch"))\n'
+    '  (components\n'
+    '    (comp (ref R10)\n'
+    '      (value "4.7K:1% \\"thin\\"")\n'
+    '      (footprint "Resistor_SMD:R_0603")\n'
+    '      (tstamp 5C1A2B3D))\n'
+    '    (comp (ref C1)\n'
+    '      (value 0.10)\n'
+    '      (libsource (lib Device) (part C))\n'
+    '      (tstamp 5C1A2B3E))\n'
+    '    (comp (ref "J 2") (value Conn\\(4\\)) (footprint Conn:J\\ 1)))\n'
+    '  (nets\n'
+    '    (net (code 1) (name GND)\n'
+    '      (node (ref C1) (pin 2)))))\n')
+
+
+# tree_records_read():
+def tree_records_read(net_file_name: str) -> List[ComponentRecord]:
+    """ Return the records of *net_file_name* extracted from a full *SENode* tree. """
+    net_file: TextIO
+    with open(net_file_name) as net_file:
+        net_se: sexpression.SENode = sexpression.tree_read(net_file)
+    components_se: Optional[sexpression.SENode] = net_se.find("components")
+    assert components_se is not None
+    records: List[ComponentRecord] = list()
+    component_se: sexpression.SENode
+    for component_se in components_se.children("comp"):
+        fields: List[str] = list()
+        name: str
+        for name in ("ref", "value", "footprint"):
+            field_se: Optional[sexpression.SENode] = component_se.find(name)
+            atom: object = "" if field_se is None else field_se[1]
+            assert isinstance(atom, str)
+            fields.append(sexpression.atom_value_text(atom) if name == "value"
+                          else sexpression.atom_text(atom))
+        part_name: str
+        comment: str
+        part_name, comment = part_name_split(fields[1])
+        records.append(ComponentRecord(fields[0], part_name, comment, fields[2]))
+    return records
+
+
+# test_readers_agree():
+@pytest.mark.parametrize("count", [0, 1, 500])
+def test_readers_agree(tmp_path, monkeypatch, count: int) -> None:
+    """ The netscan, tree and chunked readers return the same records. """
+    net_file_name: str = str(tmp_path / "board.net")
+    if count == 0:
+        with open(net_file_name, "w") as net_file:
+            net_file.write(AWKWARD_NET)
+    else:
+        synthetic.net_file_write(net_file_name, count, 1)
+    expected: List[ComponentRecord] = tree_records_read(net_file_name)
+    assert list(netlist.net_file_records_read(net_file_name)) == expected
+
+    # Split the file up into chunks of as few as one component:
+    monkeypatch.setattr(netlist, "CHUNK_SIZE_MINIMUM", 1)
+    data: bytes
+    with open(net_file_name, "rb") as net_file:
+        data = net_file.read()
+    if count > 1:
+        assert len(netscan.component_ranges_find(data, count)) > count // 2
+    assert list(netlist.net_file_records_read(net_file_name, 4)) == expected
+
+
+# test_chunk_boundary_in_string():
+def test_chunk_boundary_in_string(tmp_path, monkeypatch) -> None:
+    """ A chunk boundary inside of a string is detected and the file is read serially. """
+    net_file_name: str = str(tmp_path / "board.net")
+    with open(net_file_name, "w") as net_file:
+        net_file.write(AWKWARD_NET.replace("(value 0.10)", '(value "X\n    (comp Y")'))
+    data: bytes
+    with open(net_file_name, "rb") as net_file:
+        data = net_file.read()
+    inner: int = data.index(b"(comp Y")
+    with pytest.raises(AssertionError):
+        list(netscan.component_spans_scan(data, 0, inner))
+    monkeypatch.setattr(netlist, "CHUNK_SIZE_MINIMUM", 1)
+    monkeypatch.setattr(netscan, "component_ranges_find",
+                        lambda data, count: [(0, inner), (inner, -1)])
+    assert netlist.net_file_chunks_read(net_file_name, 2) is None
+    assert [record.reference for record in netlist.net_file_records_read(net_file_name, 2)] == [
+        "R10", "C1", "J 2"]
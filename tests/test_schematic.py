@@ -0,0 +1,189 @@
+# MIT License
+#
+# Copyright (c) 2019 Wayne C. Gramlich
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+# Tests for reading the components straight out of KiCad 6+ `.kicad_sch` schematics.
+
+import pytest
+pytest.importorskip("bom_manager")
+
+from bom_kicad_plugin import schematic  # noqa: E402
+from bom_kicad_plugin.records import ComponentRecord  # noqa: E402
+from typing import List, Tuple  # noqa: E402
+
+# The UUID of every root schematic:
+ROOT_UUID: str = "00000000-0000-0000-0000-000000000000"
+
+
+# symbol_text():
+def symbol_text(uuid: str, reference: str, value: str, footprint: str = "",
+                extra: str = "") -> str:
+    """ Return a placed `(symbol ...)` with the given properties. """
+    return (f'  (symbol (lib_id "Device:X") (at 10 10 0) (unit 1)\n'
+            f'    (in_bom yes){extra}\n'
+            f'    (uuid {uuid})\n'
+            f'    (property "Reference" "{reference}" (id 0) (at 10 8 0))\n'
+            f'    (property "Value" "{value}" (id 1) (at 10 12 0))\n'
+            f'    (property "Footprint" "{footprint}" (id 2) (at 10 14 0)))\n')
+
+
+# sheet_text():
+def sheet_text(uuid: str, file_name: str, sheet_file_property: str = "Sheet file") -> str:
+    """ Return a `(sheet ...)` that uses *file_name*. """
+    return (f'  (sheet (at 50 50) (size 20 20)\n'
+            f'    (uuid {uuid})\n'
+            f'    (property "Sheet name" "{uuid}" (id 0) (at 50 49 0))\n'
+            f'    (property "{sheet_file_property}" "{file_name}" (id 1) (at 50 71 0)))\n')
+
+
+# schematic_text():
+def schematic_text(uuid: str, body: str) -> str:
+    """ Return a `.kicad_sch` file with *body* in it. """
+    return (f'(kicad_sch (version 20211123) (generator eeschema)\n'
+            f'  (uuid {uuid})\n'
+            f'  (paper "A4")\n'
+            f'  (lib_symbols\n'
+            f'    (symbol "Device:X" (in_bom yes) (on_board yes)\n'
+            f'      (property "Reference" "X" (id 0) (at 0 0 0))))\n'
+            f'{body})\n')
+
+
+# files_write():
+def files_write(tmp_path, files: List[Tuple[str, str]]) -> str:
+    """ Write the (file name, text) pairs of *files* and return the first file name. """
+    file_name: str
+    text: str
+    for file_name, text in files:
+        with open(str(tmp_path / file_name), "w") as schematic_file:
+            schematic_file.write(text)
+    return str(tmp_path / files[0][0])
+
+
+# kicad6_write():
+def kicad6_write(tmp_path) -> str:
+    """ Write a KiCad 6 design whose subsheet is used twice and return the root file. """
+    root: str = schematic_text(ROOT_UUID, (
+        symbol_text("r1", "R?", "10K:1%", "Resistor_SMD:R_0603") +
+        sheet_text("sheet-a", "sub.kicad_sch") +
+        sheet_text("sheet-b", "sub.kicad_sch") +
+        '  (symbol_instances\n'
+        '    (path "/r1" (reference "R1") (unit 1) (value "10K:1%")\n'
+        '      (footprint "Resistor_SMD:R_0603"))\n'
+        '    (path "/sheet-a/c" (reference "C1") (unit 1) (value "0.1uF") (footprint ""))\n'
+        '    (path "/sheet-b/c" (reference "C2") (unit 1) (value "0.1uF") (footprint ""))\n'
+        '    (path "/sheet-a/pwr" (reference "#PWR01") (unit 1) (value "GND"))\n'
+        '    (path "/sheet-b/pwr" (reference "#PWR02") (unit 1) (value "GND"))\n'
+        '    (path "/sheet-a/tp" (reference "TP1") (unit 1) (value "TestPoint"))\n'
+        '    (path "/sheet-b/tp" (reference "TP2") (unit 1) (value "TestPoint")))\n'))
+    sub: str = schematic_text("sub", (
+        symbol_text("c", "C?", "0.1uF", "Capacitor_SMD:C_0402") +
+        symbol_text("pwr", "#PWR?", "GND") +
+        symbol_text("tp", "TP?", "TestPoint", extra=" (on_board no)")))
+    return files_write(tmp_path, [("root.kicad_sch", root), ("sub.kicad_sch", sub)])
+
+
+# instances_text():
+def instances_text(*paths: Tuple[str, str]) -> str:
+    """ Return a KiCad 7+ `(instances ...)` list for the (path, reference) *paths*. """
+    return ('\n    (instances (project "demo"' +
+            "".join(f' (path "{path}" (reference "{reference}") (unit 1))'
+                    for path, reference in paths) + '))')
+
+
+# kicad7_write():
+def kicad7_write(tmp_path) -> str:
+    """ Write the same design as *kicad6_write*() the way KiCad 7 does it. """
+    sheet_a: str = f"/{ROOT_UUID}/sheet-a"
+    sheet_b: str = f"/{ROOT_UUID}/sheet-b"
+    root: str = schematic_text(ROOT_UUID, (
+        symbol_text("r1", "R1", "10K:1%", "Resistor_SMD:R_0603",
+                    instances_text((f"/{ROOT_UUID}", "R1"))) +
+        sheet_text("sheet-a", "sub.kicad_sch", "Sheetfile") +
+        sheet_text("sheet-b", "sub.kicad_sch", "Sheetfile")))
+    sub: str = schematic_text("sub", (
+        symbol_text("c", "C?", "0.1uF", "", instances_text((sheet_a, "C1"), (sheet_b, "C2"))) +
+        symbol_text("pwr", "#PWR?", "GND", "",
+                    instances_text((sheet_a, "#PWR01"), (sheet_b, "#PWR02"))) +
+        symbol_text("tp", "TP?", "TestPoint", "",
+                    " (on_board no)" + instances_text((sheet_a, "TP1"), (sheet_b, "TP2")))))
+    return files_write(tmp_path, [("root.kicad_sch", root), ("sub.kicad_sch", sub)])
+
+
+# test_schematic_records_read():
+@pytest.mark.parametrize("design_write", [kicad6_write, kicad7_write], ids=["kicad6", "kicad7"])
+def test_schematic_records_read(tmp_path, design_write) -> None:
+    """ A subsheet used twice gives two references; power and off board symbols are gone. """
+    root_file_name: str = design_write(tmp_path)
+    records: List[ComponentRecord] = list(schematic.schematic_records_read(root_file_name, 1))
+    # KiCad 6 takes the footprint from `(symbol_instances ...)` where it is empty:
+    footprint: str = "Capacitor_SMD:C_0402" if design_write is kicad6_write else ""
+    assert records == [
+        ComponentRecord("C1", "0.1uF", "", footprint),
+        ComponentRecord("C2", "0.1uF", "", footprint),
+        ComponentRecord("R1", "10K", "1%", "Resistor_SMD:R_0603"),
+    ]
+
+
+# test_multiple_units_and_sort_order():
+def test_multiple_units_and_sort_order(tmp_path) -> None:
+    """ Each unit of a multi-unit part shows up once and references sort naturally. """
+    root_file_name: str = files_write(tmp_path, [("root.kicad_sch", schematic_text(
+        ROOT_UUID, (symbol_text("u1a", "U1", "LM358") +
+                    symbol_text("r10", "R10", "1K") +
+                    symbol_text("u1b", "U1", "LM358") +
+                    symbol_text("r2", "R2", "2K") +
+                    symbol_text("r1", "R1", "3K") +
+                    symbol_text("u1c", "U1", "LM358"))))])
+    records: List[ComponentRecord] = list(schematic.schematic_records_read(root_file_name, 1))
+    assert [record.reference for record in records] == ["R1", "R2", "R10", "U1"]
+
+
+# test_recursive_sheet():
+def test_recursive_sheet(tmp_path) -> None:
+    """ A sheet file that contains itself is reported instead of looping forever. """
+    root_file_name: str = files_write(tmp_path, [
+        ("root.kicad_sch", schematic_text(ROOT_UUID, sheet_text("sheet-a", "a.kicad_sch"))),
+        ("a.kicad_sch", schematic_text("a", (symbol_text("r1", "R1", "1K") +
+                                             sheet_text("sheet-b", "a.kicad_sch"))))])
+    with pytest.raises(AssertionError, match="contains itself"):
+        list(schematic.schematic_records_read(root_file_name, 1))
+
+
+# test_missing_sheet():
+def test_missing_sheet(tmp_path) -> None:
+    """ A sheet file that does not exist is reported by name. """
+    root_file_name: str = files_write(tmp_path, [
+        ("root.kicad_sch", schematic_text(ROOT_UUID, sheet_text("sheet-a", "gone.kicad_sch")))])
+    with pytest.raises(AssertionError, match="gone.kicad_sch"):
+        list(schematic.schematic_records_read(root_file_name, 1))
+
+
+# test_parallel_levels():
+def test_parallel_levels(tmp_path) -> None:
+    """ Parsing each level in a pool of processes gives the same records. """
+    root_file_name: str = files_write(tmp_path, [
+        ("root.kicad_sch", schematic_text(ROOT_UUID, (sheet_text("sheet-a", "a.kicad_sch") +
+                                                      sheet_text("sheet-b", "b.kicad_sch")))),
+        ("a.kicad_sch", schematic_text("a", symbol_text("r1", "R1", "1K"))),
+        ("b.kicad_sch", schematic_text("b", symbol_text("r2", "R2", "2K")))])
+    assert (list(schematic.schematic_records_read(root_file_name, 2)) ==
+            list(schematic.schematic_records_read(root_file_name, 1)) ==
+            [ComponentRecord("R1", "1K", "", ""), ComponentRecord("R2", "2K", "", "")])
@@ -0,0 +1,66 @@
+# MIT License
+#
+# Copyright (c) 2019 Wayne C. Gramlich
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+# Tests for the *sexpression* tokenizer and tree reader/writer.
+
+from bom_kicad_plugin import sexpression
+import io
+import pytest
+from typing import List
+
+# Text with escapes, strings and nested lists in it, so that the chunk boundaries land
+# in every interesting place (including right after a backslash inside of an atom):
+TOKENS_TEXT: str = (
+    '(export (version D)\n'
+    '  (components\n'
+    '    (comp (ref R1) (value "10K:1% \\"thin\\"") (footprint Lib:R_0603)\n'
+    '      (libsource (lib a\\(b) (part c\\ d)) (tstamp 5C1A2B3D))\n'
+    '    (comp (ref "C 2") (value 0.10) (footprint "Lib:C \\\\ 0402"))))\n')
+
+
+# test_tokens_read_chunk_sizes():
+def test_tokens_read_chunk_sizes() -> None:
+    """ Every chunk size must produce the same tokens as reading the text in one chunk. """
+    expected: List[str] = list(sexpression.tokens_read(io.StringIO(TOKENS_TEXT),
+                                                       len(TOKENS_TEXT) + 1))
+    assert "a\\(b" in expected and "c\\ d" in expected
+    chunk_size: int
+    for chunk_size in range(1, len(TOKENS_TEXT) + 1):
+        tokens: List[str] = list(sexpression.tokens_read(io.StringIO(TOKENS_TEXT), chunk_size))
+        assert tokens == expected, f"chunk_size={chunk_size}"
+
+
+# test_tokens_read_unterminated():
+def test_tokens_read_unterminated() -> None:
+    """ An unterminated string is an error at any chunk size. """
+    chunk_size: int
+    for chunk_size in (1, 3, 1 << 16):
+        with pytest.raises(AssertionError):
+            list(sexpression.tokens_read(io.StringIO('(a "b c'), chunk_size))
+
+
+# test_tree_round_trip():
+def test_tree_round_trip() -> None:
+    """ Writing a tree out and reading it back gives the same tree. """
+    se_node: sexpression.SENode = sexpression.tree_read(io.StringIO(TOKENS_TEXT))
+    text: str = sexpression.tree_text(se_node)
+    assert sexpression.tree_text(sexpression.tree_read(io.StringIO(text))) == text
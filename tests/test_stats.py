@@ -0,0 +1,94 @@
+# MIT License
+#
+# Copyright (c) 2019 Wayne C. Gramlich
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+# Tests for the per-phase statistics of the *Kicad* reads.
+
+import pytest
+pytest.importorskip("bom_manager")
+
+from benchmarks import synthetic  # noqa: E402
+from bom_manager import bom  # noqa: E402
+from bom_kicad_plugin import netlist, stats  # noqa: E402
+from bom_kicad_plugin.cache import ComponentCache  # noqa: E402
+from bom_kicad_plugin.kicad import Kicad  # noqa: E402
+from bom_kicad_plugin.stats import ReadStats  # noqa: E402
+from typing import Dict, List  # noqa: E402
+
+# The number of components in each test file:
+COUNT: int = 40
+
+
+# stats_read():
+def stats_read(kicad: Kicad, file_name: str) -> Dict[str, int]:
+    """ Read *file_name* with statistics enabled and return the count of each phase. """
+    hooked: List[ReadStats] = list()
+    kicad.stats_enabled = True
+    kicad.stats_hook = hooked.append
+    assert kicad.file_read(file_name, bom.Project())
+    # The hook gets called once with the same statistics that are left in *read_stats*:
+    assert len(hooked) == 1 and hooked[0] is kicad.read_stats
+    assert hooked[0].file_name == file_name
+    assert all(seconds >= 0.0 for seconds in hooked[0].seconds.values())
+    return hooked[0].counts
+
+
+# test_streamed_read_counts():
+def test_streamed_read_counts(tmp_path) -> None:
+    """ A streamed read counts each component once per phase. """
+    net_file_name: str = str(tmp_path / "board.net")
+    synthetic.net_file_write(net_file_name, COUNT, 1)
+    part_names: int = len({record.part_name
+                           for record in netlist.net_file_records_read(net_file_name)})
+    assert stats_read(Kicad(), net_file_name) == {
+        stats.FILE_IO: 1,  # Finding the format
+        stats.PARSE: COUNT,
+        stats.COMPONENT_WALK: COUNT,
+        stats.PROJECT_PART_FIND: part_names,
+        stats.POSE_PART_CONSTRUCT: COUNT,
+        stats.POSE_PART_APPEND: COUNT,
+    }
+
+
+# test_cached_read_counts():
+def test_cached_read_counts(tmp_path) -> None:
+    """ A cache miss parses the whole file at once and a cache hit does not parse it. """
+    net_file_name: str = str(tmp_path / "board.net")
+    synthetic.net_file_write(net_file_name, COUNT, 1)
+    kicad: Kicad = Kicad()
+    kicad.cache = ComponentCache(str(tmp_path / "cache"))
+    miss: Dict[str, int] = stats_read(kicad, net_file_name)
+    assert (miss[stats.FILE_IO], miss[stats.PARSE]) == (2, 1 + COUNT)  # Find and store
+    hit: Dict[str, int] = stats_read(kicad, net_file_name)
+    assert (hit[stats.FILE_IO], hit[stats.PARSE]) == (1, COUNT)  # Lookup
+    assert hit[stats.POSE_PART_CONSTRUCT] == hit[stats.POSE_PART_APPEND] == COUNT
+
+
+# test_stats_disabled():
+def test_stats_disabled(tmp_path) -> None:
+    """ Nothing is collected or passed to the hook unless statistics are enabled. """
+    net_file_name: str = str(tmp_path / "board.net")
+    synthetic.net_file_write(net_file_name, COUNT, 1)
+    hooked: List[ReadStats] = list()
+    kicad: Kicad = Kicad()
+    kicad.stats_hook = hooked.append
+    assert kicad.file_read(net_file_name, bom.Project())
+    assert kicad.read_stats is None and hooked == []